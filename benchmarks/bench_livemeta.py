@@ -0,0 +1,171 @@
+"""Vergleicht die Extraktions-Engine (modules/livemeta.py) mit den alten Regex-Parsern.
+
+Aufruf aus dem Projekt-Root:
+    python benchmarks/bench_livemeta.py [--pad-kb 2048] [--runs 20]
+
+Die Fixtures in benchmarks/fixtures/ sind kompakt gehalten; vor die Marker wird
+beim Laden Füllmaterial (minifiziertes JS/JSON wie in den echten Bundles)
+eingefügt, damit die Seiten realistisch groß sind.
+
+Verglichen werden die Felder, die auch die alten Parser liefern; neuere Felder
+(z.B. is_upcoming/video_id bei YouTube) haben keine Referenz.
+
+Zusätzlich wird jede Fixture stückweise durch die Streaming-Scanner geschickt
+(verschiedene Chunk-Größen und -Versätze, wie sie iter_chunked liefern kann);
+das Ergebnis muss exakt dem Parse der ganzen Seite entsprechen.
+"""
+import os
+import re
+import sys
+import html
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Streaming-Check ohne Thread-Hops (das Ergebnis hängt nicht vom Executor ab)
+os.environ.setdefault("PARSE_EXECUTOR", "inline")
+
+from modules import livemeta  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURES = {
+    "twitch_live.html": "twitch",
+    "twitch_offline.html": "twitch",
+    "youtube_live.html": "youtube",
+    "youtube_offline.html": "youtube",
+}
+
+# ============================================================
+# ALTE PARSER (Stand vor der Engine, nur als Referenz)
+# ============================================================
+def legacy_parse_twitch_meta(html_text: str) -> dict:
+    meta = {"is_live": False, "avatar": None, "game": None, "title": None}
+
+    if re.search(r'"isLiveBroadcast"\s*:\s*false', html_text, re.IGNORECASE) or re.search(r'"isLive"\s*:\s*false', html_text, re.IGNORECASE):
+        meta["is_live"] = False
+    elif re.search(r'"isLiveBroadcast"\s*:\s*true', html_text, re.IGNORECASE) or re.search(r'"isLive"\s*:\s*true', html_text, re.IGNORECASE):
+        meta["is_live"] = True
+    else:
+        meta["is_live"] = False
+
+    m = re.search(r'"profileImageURL"\s*:\s*"([^"]+)"', html_text, re.IGNORECASE)
+    if m:
+        meta["avatar"] = m.group(1).replace("\\/", "/")
+
+    t = re.search(r'"title"\s*:\s*"([^"]+)"', html_text, re.IGNORECASE)
+    if t:
+        meta["title"] = html.unescape(t.group(1))
+
+    g = re.search(r'"gameName"\s*:\s*"([^"]+)"', html_text, re.IGNORECASE)
+    if g:
+        meta["game"] = html.unescape(g.group(1))
+
+    return meta
+
+def legacy_parse_yt_meta(html_text: str) -> dict:
+    meta = {"is_live": False, "title": None, "avatar": None}
+
+    if '"isLive":true' in html_text:
+        meta["is_live"] = True
+
+    t_match = re.search(r'<meta name="title" content="([^"]+)">', html_text)
+    if t_match:
+        meta["title"] = t_match.group(1)
+
+    a_match = re.search(r'"avatar":\{"thumbnails":\[\{"url":"([^"]+)"', html_text)
+    if a_match:
+        meta["avatar"] = a_match.group(1).replace("\\/", "/")
+
+    return meta
+
+PARSERS = {
+    "twitch": (legacy_parse_twitch_meta, livemeta.parse_twitch),
+    "youtube": (legacy_parse_yt_meta, livemeta.parse_yt),
+}
+
+def same_output(old: dict, new: dict) -> bool:
+    return all(new.get(key) == value for key, value in old.items())
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+def make_filler(size: int) -> str:
+    block = (
+        'function a(b){return b&&b.c?"x":"y"}var n={"k":"v","id":12345,"flag":false,"list":[1,2,3]};'
+        '<div class="tw-card" data-a-target="card">{"props":{"name":"Bundle","loaded":true}}</div>\n'
+    )
+    return (block * (size // len(block) + 1))[:size]
+
+def load_fixture(name: str, pad_kb: int) -> str:
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        text = f.read()
+    return text.replace("<!--FILLER-->", make_filler(pad_kb * 1024), 1)
+
+# (Chunk-Größe, Größe des ersten Chunks)
+CHUNK_PLANS = [(1000, 1000)] + [(4096, offset) for offset in range(256, 4097, 256)]
+
+def chunks(text: str, size: int, first: int):
+    yield text[:first]
+    for i in range(first, len(text), size):
+        yield text[i:i + size]
+
+async def stream_parse(provider: str, text: str, size: int, first: int) -> dict:
+    scanner = livemeta.MarkerScanner("twitch") if provider == "twitch" else livemeta.PlayerScanner()
+    for piece in chunks(text, size, first):
+        if await scanner.feed(piece):
+            break
+    else:
+        await scanner.feed("", final=True)
+    if provider == "twitch":
+        return livemeta.build_twitch_meta(scanner.found)
+    return livemeta.build_yt_meta(scanner.found, scanner.player)
+
+def stream_mismatches(provider: str, text: str) -> list[str]:
+    """Chunk-Pläne, bei denen der Streaming-Scan vom Parse der ganzen Seite abweicht."""
+    full = PARSERS[provider][1](text)
+    return [
+        f"{size}/{first}" for size, first in CHUNK_PLANS
+        if asyncio.run(stream_parse(provider, text, size, first)) != full
+    ]
+
+def bench(func, text: str, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pad-kb", type=int, default=2048, help="Füllmaterial vor den Markern (KB)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--stream-pad-kb", type=int, default=256, help="Füllmaterial für den Streaming-Check (KB)")
+    args = parser.parse_args()
+
+    failed = 0
+    print(f"{'Fixture':<22}{'Größe':>10}{'alt (ms)':>12}{'neu (ms)':>12}{'Faktor':>9}  Ausgabe")
+    for name, provider in FIXTURES.items():
+        text = load_fixture(name, args.pad_kb)
+        legacy, engine = PARSERS[provider]
+        same = same_output(legacy(text), engine(text))
+        failed += not same
+        t_old = bench(legacy, text, args.runs)
+        t_new = bench(engine, text, args.runs)
+        print(
+            f"{name:<22}{len(text) // 1024:>8}KB{t_old:>12.2f}{t_new:>12.2f}{t_old / t_new:>8.1f}x  "
+            f"{'gleich' if same else 'ABWEICHEND'}"
+        )
+        if not same:
+            print(f"  alt: {legacy(text)}\n  neu: {engine(text)}")
+
+    print(f"\nStreaming ({len(CHUNK_PLANS)} Chunk-Pläne je Fixture, Größe/erster Chunk)")
+    for name, provider in FIXTURES.items():
+        bad = stream_mismatches(provider, load_fixture(name, args.stream_pad_kb))
+        failed += bool(bad)
+        print(f"{name:<22}{'gleich' if not bad else 'ABWEICHEND bei ' + ', '.join(bad)}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,9 +11,7 @@ import time
 import html
 import asyncio
 import logging
-import sqlite3
 import traceback
-import aiohttp
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
@@ -32,8 +30,6 @@ logging.basicConfig(
 logger = logging.getLogger("shani-bot")
 
 BASE_DIR = os.path.dirname(__file__)
-DATA_DIR = os.path.join(BASE_DIR, "data")
-DB_PATH = os.path.join(DATA_DIR, "setcards.db")
 
 # --- ENV ---
 load_dotenv(dotenv_path=os.path.join(BASE_DIR, ".env"))
@@ -48,9 +44,6 @@ intents.members = True
 intents.message_content = True  # Erlaubt dem Bot Nachrichten zu lesen (für ! commands)
 bot = commands.Bot(command_prefix="!", intents=intents)
 
-# Global Session
-bot.http_session = None
-
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
     logger.error(f"APP_COMMAND_ERROR: {error}", exc_info=error)
@@ -65,51 +58,22 @@ async def on_app_command_error(interaction: discord.Interaction, error: app_comm
 # ============================================================
 # DATABASE HELPERS
 # ============================================================
-async def _db_run(func, *args):
-    return await asyncio.to_thread(func, *args)
-
-def _db_connect():
-    conn = sqlite3.connect(DB_PATH, timeout=10)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-async def get_guild_cfg(guild_id: int) -> dict:
-    def _get():
-        with _db_connect() as conn:
-            row = conn.execute("SELECT * FROM guild_settings WHERE guild_id = ?", (guild_id,)).fetchone()
-            return dict(row) if row else {}
-    return await _db_run(_get)
-
-async def update_guild_cfg(guild_id: int, **kwargs) -> None:
-    def _update():
-        with _db_connect() as conn:
-            # Check if exists
-            exists = conn.execute("SELECT 1 FROM guild_settings WHERE guild_id = ?", (guild_id,)).fetchone()
-            if not exists:
-                conn.execute("INSERT INTO guild_settings (guild_id) VALUES (?)", (guild_id,))
-            
-            if not kwargs:
-                return
-
-            keys = list(kwargs.keys())
-            values = list(kwargs.values())
-            set_clause = ", ".join([f"{k} = ?" for k in keys])
-            conn.execute(f"UPDATE guild_settings SET {set_clause} WHERE guild_id = ?", values + [guild_id])
-            conn.commit()
-    await _db_run(_update)
-
-async def clear_guild_cfg_fields(guild_id: int, fields: list) -> None:
-    def _clear():
-        with _db_connect() as conn:
-            set_clause = ", ".join([f"{f} = NULL" for f in fields])
-            conn.execute(f"UPDATE guild_settings SET {set_clause} WHERE guild_id = ?", (guild_id,))
-            conn.commit()
-    await _db_run(_clear)
-
-
-
-
-
+# Liegen in modules/storage.py, damit Bot und Cogs denselben Config-Cache nutzen.
+from modules.storage import (
+    get_guild_cfg, update_guild_cfg, clear_guild_cfg_fields,
+    peek_guild_cfg,
+    get_poller_state, peek_poller_state, set_poller_state, save_poller_state, reset_poller_state,
+    list_subscriptions, peek_subscriptions, peek_subscription, find_subscription,
+    add_subscription, update_subscription, remove_subscription, remove_subscriptions,
+    add_subscription_listener, remove_subscription_listener, MAX_SUBSCRIPTIONS_PER_GUILD,
+    record_live_start, load_live_history, save_channel_alias, load_channel_aliases,
+    preload_guild_cfgs, feature_guilds, guild_has_feature,
+    add_cfg_listener, remove_cfg_listener,
+    guild_cfg_cache_stats, write_behind_stats, subscription_stats, db_stats, close_db
+)
+from modules.webclient import host_stats, hedge_stats, close_http
+from modules.livemeta import fetch_stats, parse_stats, shutdown_parse_executor
+from modules.webhooks import start_webhook_server, stop_webhook_server, webhook_stats
 
 # ============================================================
 # MODULE LOADING
@@ -238,9 +202,13 @@ async def cleanup_empty_squads(guild: discord.Guild, category_id: int):
 # ============================================================
 @bot.event
 async def on_ready():
-    # Session anlegen
-    if not bot.http_session:
-        bot.http_session = aiohttp.ClientSession()
+    # Alle Guild-Configs einmalig laden (Cache + Feature-Index für Loops/Events)
+    if not getattr(bot, "_cfg_preloaded", False):
+        try:
+            await preload_guild_cfgs()
+            bot._cfg_preloaded = True
+        except Exception as e:
+            logger.error(f"Guild-Configs konnten nicht vorgeladen werden: {e}")
 
     # Module laden, bevor wir Commands syncen (damit /setcard dabei ist)
     try:
@@ -251,6 +219,12 @@ async def on_ready():
     except Exception as e:
         logger.error(f"Module konnten nicht geladen werden: {e}")
 
+    # Optionaler Webhook-Server (Push von Twitch/YouTube), erst wenn die Cogs lauschen
+    try:
+        await start_webhook_server()
+    except Exception as e:
+        logger.error(f"Webhook-Server konnte nicht starten: {e}")
+
     # ---- SYNC: Global-Commands in jede Guild kopieren + sofort guild-sync ----
     # (Wir löschen globale Registrierungen, um Dopplungen zu vermeiden)
     try:
@@ -298,6 +272,9 @@ async def on_member_update(before: discord.Member, after: discord.Member):
 # ============================================================
 @bot.event
 async def on_voice_state_update(member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+    if not guild_has_feature(member.guild.id, "autovoice"):
+        return
+
     cfg = await get_guild_cfg(member.guild.id)
     if not cfg:
         return
@@ -854,6 +831,7 @@ async def shani_status(interaction: discord.Interaction):
         grace = int(cfg.get("twitch_offline_grace_seconds", 300)) // 60
         tw_val = (
             f"• Kanal: **{cfg.get('twitch_channel')}**\n"
+            f"• Streamer gesamt: **{len(peek_subscriptions(interaction.guild_id, 'twitch'))}**\n"
             f"• Announce: {tw_ch.mention if tw_ch else '❌'}\n"
             f"• Ping: {role.mention if role else '—'}\n"
             f"• Stable: **{stable}** | Poll: **{poll}s** | Grace: **{grace}m**"
@@ -871,6 +849,7 @@ async def shani_status(interaction: discord.Interaction):
         ygrace = int(cfg.get("youtube_offline_grace_seconds", 600)) // 60
         yt_val = (
             f"• Kanal: **{cfg.get('youtube_channel')}**\n"
+            f"• Kanäle gesamt: **{len(peek_subscriptions(interaction.guild_id, 'youtube'))}**\n"
             f"• Announce: {yt_ch.mention if yt_ch else '❌'}\n"
             f"• Ping: {yrole.mention if yrole else '—'}\n"
             f"• Stable: **{ystable}** | Poll: **{ypoll}s** | Grace: **{ygrace}m**"
@@ -882,12 +861,195 @@ async def shani_status(interaction: discord.Interaction):
     embed.set_footer(text="Shani Bot Status")
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+@bot.tree.command(name="shani_metrics", description="Zeigt interne Laufzeit-Metriken des Bots.")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def shani_metrics(interaction: discord.Interaction):
+    embed = discord.Embed(
+        title="📊 Laufzeit-Metriken",
+        color=discord.Color.dark_teal(),
+        timestamp=datetime.now(timezone.utc)
+    )
+
+    # 🗄️ Guild-Config Cache
+    cs = guild_cfg_cache_stats()
+    embed.add_field(
+        name="🗄️ Config-Cache",
+        value=(
+            f"• Hits: **{cs['hits']}** | Misses: **{cs['misses']}**\n"
+            f"• Hit-Rate: **{cs['hit_rate'] * 100:.1f}%** | Einträge: **{cs['size']}**"
+        ),
+        inline=False
+    )
+
+    # 🧩 Feature-Index
+    features = ("twitch", "youtube", "autovoice", "setcards")
+    counts = {f: feature_guilds(f) for f in features}
+    embed.add_field(
+        name="🧩 Aktive Guilds",
+        value=" | ".join(f"{f}: **{len(c) if c is not None else '?'}**" for f, c in counts.items()),
+        inline=False
+    )
+
+    # 💾 DB-Worker
+    ds = db_stats()
+    wb = write_behind_stats()
+    embed.add_field(
+        name="💾 Datenbank",
+        value=(
+            f"• Jobs: **{ds['jobs']}** | Queue: **{ds['queue']}**\n"
+            f"• Abos: " + " | ".join(f"{p}: **{n}**" for p, n in sorted(subscription_stats().items())) + "\n"
+            f"• Poller-State: **{wb['states']}** Zeilen | **{wb['pending']}** ungespeichert\n"
+            f"• Write-Behind: **{wb['queued']}** Updates → **{wb['flushes']}** Flushes ({wb['rows']} Zeilen)"
+        ),
+        inline=False
+    )
+
+    # ⏱️ Poll-Scheduler
+    for cog_name, label in (("TwitchCog", "🟣 Twitch-Poller"), ("YoutubeCog", "🔴 YouTube-Poller")):
+        cog = bot.get_cog(cog_name)
+        if not cog:
+            continue
+        ps = cog.scheduler.stats()
+        fs = cog.fanout.stats()
+        cf = cog.confirm.stats()
+        ad = cog.adaptive.stats()
+        ng = cog.negative.stats()
+        status = getattr(cog, "status", None)
+        paused = sum(1 for sub in peek_subscriptions(provider=cog.scheduler.name) if sub.get("suspended_at"))
+        next_in = f"{ps['next_in']:.0f}s" if ps["next_in"] is not None else "—"
+        confirm = (
+            f"alle **{cf['interval']:.0f}s** | offen **{cf['pending']}** | bestätigt **{cf['confirmed']}** | geflackert **{cf['aborted']}** | "
+            f"Re-Probes **{cf['probes']}** | Ø **{cf['avg_confirm']:.0f}s** | gespart **{cf['saved_seconds'] / 60:.0f} min**"
+            if cf["enabled"] else "aus"
+        )
+        adaptive = (
+            f"**{ad['channels_learned']}** Kanäle gelernt ({ad['starts_recorded']} neue Starts) | max. **{ad['max_interval']}s** | "
+            f"gespart **{ad['saved_polls']:.0f}** Polls (**{ad['saved_pct']:.0f}%**)\n"
+            f"• Erkennung nach Start p50/p95/max: **{ad['latency_p50']:.0f}s / {ad['latency_p95']:.0f}s / {ad['latency_max']:.0f}s** ({ad['detections']} Starts)"
+            if ad["enabled"] else "aus"
+        )
+        extra = ""
+        if status:
+            st = status.stats()
+            extra += (
+                f"\n• Sammelabfrage ({st['provider']}): **{st['requests']}** Requests für **{st['channels']}** Kanäle "
+                f"(Ø **{st['avg_batch']:.1f}**) | vorab **{st['prefetched']}** / genutzt **{st['cache_hits']}** | "
+                f"HTML-Fallback **{st['fallbacks']}** | Fehler **{st['errors']}**"
+            )
+        exists = getattr(cog, "exists", None)
+        if exists:
+            ex = exists.stats()
+            extra += (
+                f"\n• Existenzprüfung (GQL): **{ex['checks']}** Abfragen | nicht gefunden **{ex['missing']}** | "
+                f"bestätigt **{ex['confirmed']}** Kanäle | Fehler **{ex['errors']}**"
+            )
+        warmup = getattr(cog, "warmup", None)
+        if warmup:
+            wu = warmup.stats()
+            extra += (
+                f"\n• Neustart: **{wu['restored']}** Live-Zustände übernommen | **{wu['staggered']}** Kanäle gestaffelt "
+                f"(spätestens nach **{wu['max_delay']:.0f}s**)"
+            )
+        planned = getattr(cog, "planned", None)
+        if planned:
+            pl = planned.stats()
+            extra += (
+                f"\n• Geplante Starts: **{pl['scheduled']}** ({pl['in_window']} im Fenster) | Polls im Fenster **{pl['window_polls']}** / "
+                f"davor **{pl['idle_polls']}** | verfallen **{pl['expired']}** | "
+                f"live nach Termin p50/max **{pl['latency_p50']:.0f}s / {pl['latency_max']:.0f}s** ({pl['detections']})"
+            )
+        handles = getattr(cog, "handles", None)
+        if handles:
+            hs = handles.stats()
+            extra += (
+                f"\n• Handles → Kanal-ID: **{hs['handles']}** bekannt ({hs['stale']} abgelaufen) | "
+                f"aufgelöst **{hs['resolved']}** | geändert **{hs['changed']}** | fehlgeschlagen **{hs['failures']}**"
+            )
+        embed.add_field(
+            name=label,
+            value=(
+                f"• Queue: **{ps['depth']}** | Läuft: **{ps['running']}** | Freie Slots: **{ps['slots_free']}** | Nächster in: **{next_in}**\n"
+                f"• Kanäle: **{fs['channels']}** für **{fs['subscribers']}** Abos | Polls: **{ps['runs']}** | Fehler: **{ps['errors']}**\n"
+                f"• Verspätung Ø/p95/max: **{ps['late_avg']:.2f}s / {ps['late_p95']:.2f}s / {ps['late_max']:.2f}s**\n"
+                f"• Bestätigung: {confirm}\n"
+                f"• Adaptiv: {adaptive}\n"
+                f"• Nicht gefunden: **{ng['not_found']}**× | im Backoff **{ng['backoff']}** | pausiert **{paused}** Abos ({ng['suspended']} seit Start)"
+                + extra
+            ),
+            inline=False
+        )
+
+    # 📥 Live-Seiten
+    fs = fetch_stats()
+    embed.add_field(
+        name="📥 Live-Seiten",
+        value=(
+            f"• Modus: **{fs['mode']}** | Abrufe: **{fs['fetches']}** | Fehler: **{fs['errors']}**\n"
+            f"• Ø gelesen: **{fs['avg_kb']:.0f} KB** | Früh beendet: **{fs['early_stops']}** | Limit erreicht: **{fs['cap_hits']}**\n"
+            f"• YouTube-Player-Response: **{fs['player_blobs']}**× dekodiert | Ø **{fs['player_avg_kb']:.0f} KB** | zu groß: **{fs['player_overflows']}**"
+        ),
+        inline=False
+    )
+
+    # 🧮 Parse-Executor
+    pst = parse_stats()
+    embed.add_field(
+        name="🧮 Parsen",
+        value=(
+            f"• Modus: **{pst['mode']}** ({pst['workers']} Worker) | Offen: **{pst['pending']}** (max. {pst['peak_pending']})\n"
+            f"• Parses: **{pst['parses']}** | Dauer Ø/p95/max: **{pst['avg_ms']:.1f} / {pst['p95_ms']:.1f} / {pst['max_ms']:.1f} ms** | Wartezeit Ø: **{pst['wait_avg_ms']:.1f} ms**"
+        ),
+        inline=False
+    )
+
+    # 📨 Webhooks
+    wh = webhook_stats()
+    if wh["running"]:
+        value = f"• Lauscht auf **{wh['address']}** | Kanäle mit Push: **{wh['covered']}**\n" + "\n".join(
+            f"• {provider}: **{s['accepted']}** angenommen | abgelehnt **{s['rejected']}** | doppelt **{s['duplicates']}** | "
+            f"unbekannt **{s['unknown']}** | bestätigt **{s['verified']}**"
+            for provider, s in wh["providers"].items()
+        )
+    else:
+        value = "• aus (nur Polling)"
+    embed.add_field(name="📨 Webhooks", value=value, inline=False)
+
+    # 🌐 HTTP pro Host (ein Feld pro Host, sonst wird das Feld zu lang)
+    hg = hedge_stats()
+    for host, s in sorted(host_stats().items()):
+        b = s["breaker"]
+        value = (
+            f"• **{s['requests']}** Requests | max. parallel **{s['peak']}** | gewartet **{s['waited']}** | {s['bytes'] / 1024 / 1024:.1f} MB\n"
+            f"• Header p50/p95/p99: **{s['latency_p50_ms']:.0f} / {s['latency_p95_ms']:.0f} / {s['latency_p99_ms']:.0f} ms**"
+            + (f" (ohne Hedge: {s['attempt_p50_ms']:.0f} / {s['attempt_p95_ms']:.0f} / {s['attempt_p99_ms']:.0f} ms)" if hg["enabled"] else "")
+            + f"\n• Fehler **{s['errors']}** | Timeouts **{s['timeouts']}** | Status≠200 **{s['bad_status']}**\n"
+            f"• Breaker **{b['state']}**" + (f" (noch {b['open_for']:.0f}s)" if b["state"] == "open" else "")
+            + f" | geöffnet **{b['opens']}**x | abgewiesen **{b['rejected']}** | Retry-After **{b['retry_after_used']}** | "
+            f"gedrosselt **{s['throttled']}**x ({s['throttled_seconds']:.0f}s)"
+        )
+        embed.add_field(name=f"🌐 {host}", value=value, inline=False)
+
+    # ⚡ Hedging
+    embed.add_field(
+        name="⚡ Hedging",
+        value=(
+            f"• ab p{hg['percentile']:g} | Budget **{hg['budget'] * 100:.0f}%** | Hedges **{hg['hedges']}** "
+            f"({hg['rate'] * 100:.1f}%) | davon gewonnen **{hg['hedge_wins']}** | Budget erschöpft **{hg['over_budget']}** | kein Host-Slot frei **{hg['no_slot']}**"
+            if hg["enabled"] else "• aus"
+        ),
+        inline=False
+    )
+
+    embed.set_footer(text="Shani Bot Metrics")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 # --- ERROR HANDLING ---
 @setup_autovoice.error
 @autovoice_status.error
 @autovoice_disable.error
 @shani_setup_roles.error
 @shani_status.error
+@shani_metrics.error
 async def perms_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
     if isinstance(error, app_commands.MissingPermissions):
         msg = "❌ Dafür brauchst du **Server verwalten**."
@@ -929,13 +1091,16 @@ async def _dbg_interaction(interaction: discord.Interaction):
 # ============================================================
 async def main():
     async with bot:
-        await bot.start(TOKEN)
+        try:
+            await bot.start(TOKEN)
+        finally:
+            await stop_webhook_server()
+            await close_http()
+            await close_db()
+            shutdown_parse_executor()
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         pass
-    finally:
-        if bot.http_session:
-            asyncio.run(bot.http_session.close())
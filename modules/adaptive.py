@@ -0,0 +1,122 @@
+# modules/adaptive.py
+import os
+import logging
+from collections import deque
+
+from modules.scheduler import percentile
+
+logger = logging.getLogger("shani-bot")
+
+# ============================================================
+# ADAPTIVES POLLING (gelernt aus den bisherigen Stream-Starts)
+# ============================================================
+# Rund um die typischen Startzeiten eines Kanals (gleiche Uhrzeit am gleichen
+# Wochentag) wird im normalen Takt gepollt, dazwischen seltener bis höchstens
+# ADAPTIVE_MAX_POLL_SECONDS. Während eines Streams gilt immer der normale Takt.
+ADAPTIVE_POLL = os.getenv("ADAPTIVE_POLL", "on").strip().lower() not in ("0", "off", "false", "no")
+ADAPTIVE_MAX_POLL_SECONDS = max(30, int(os.getenv("ADAPTIVE_MAX_POLL_SECONDS", "900")))
+ADAPTIVE_MIN_STARTS = 4          # weniger Historie -> fester Takt
+ADAPTIVE_WINDOW_MINUTES = 60     # so lange vor/nach einer typischen Startzeit normal pollen
+ADAPTIVE_RESTART_MINUTES = 30    # kürzere Offline-Phasen zählen nicht als neuer Stream
+LATENCY_SAMPLES = 500
+
+WEEK_MINUTES = 7 * 24 * 60
+
+def minute_of_week(ts: float) -> int:
+    return int(ts // 60) % WEEK_MINUTES
+
+class AdaptivePoller:
+    """Lernt die Startzeiten pro Kanal und leitet daraus das nächste Poll-Intervall ab."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._starts: dict[str, list[int]] = {}       # channel -> Minute der Woche je Start
+        self._last_poll: dict[str, float] = {}
+        self._last_live: dict[str, float] = {}
+        self._seen_offline: set[str] = set()
+        self._gaps: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.polls = 0
+        self.backoff_polls = 0
+        self.saved_polls = 0.0
+        self.starts_recorded = 0
+
+    # ---------- Historie ----------
+    def load(self, history: dict[str, list[float]]) -> None:
+        self._starts = {channel: sorted(minute_of_week(ts) for ts in starts) for channel, starts in history.items()}
+
+    def forget(self, channel: str) -> None:
+        """Kanal hat keine Abos mehr: gelernte Startzeiten aus dem Speicher werfen (DB-Historie bleibt)."""
+        self._starts.pop(channel, None)
+        self._last_poll.pop(channel, None)
+        self._last_live.pop(channel, None)
+        self._seen_offline.discard(channel)
+
+    def observe(self, channel: str, is_live: bool, now: float) -> bool:
+        """Verarbeitet ein Poll-Ergebnis. Gibt True zurück, wenn ein neuer Stream-Start erkannt wurde."""
+        previous = self._last_poll.get(channel)
+        self._last_poll[channel] = now
+        if not is_live:
+            self._seen_offline.add(channel)
+            return False
+
+        last_live = self._last_live.get(channel, 0.0)
+        self._last_live[channel] = now
+        # Nur echte Starts zählen: vorher offline gesehen und nicht bloß kurz weg gewesen
+        if channel not in self._seen_offline or now - last_live < ADAPTIVE_RESTART_MINUTES * 60:
+            return False
+        self._seen_offline.discard(channel)
+
+        # Der Start lag irgendwo zwischen dem letzten und diesem Poll
+        if previous is not None:
+            self._gaps.append(now - previous)
+        self._starts.setdefault(channel, []).append(minute_of_week(now))
+        self._starts[channel].sort()
+        self.starts_recorded += 1
+        return True
+
+    # ---------- Intervall ----------
+    def _seconds_until_window(self, channel: str, now: float) -> float | None:
+        starts = self._starts.get(channel)
+        if not starts or len(starts) < ADAPTIVE_MIN_STARTS:
+            return None
+        m = minute_of_week(now)
+        best = float("inf")
+        for start in starts:
+            if min((m - start) % WEEK_MINUTES, (start - m) % WEEK_MINUTES) <= ADAPTIVE_WINDOW_MINUTES:
+                return 0.0
+            best = min(best, (start - ADAPTIVE_WINDOW_MINUTES - m) % WEEK_MINUTES)
+        return best * 60 - (now % 60)
+
+    def next_interval(self, channel: str, base: float, now: float, live: bool) -> float:
+        """Poll-Intervall für channel: normaler Takt im Startfenster/live, sonst bis zum nächsten Fenster."""
+        self.polls += 1
+        if not ADAPTIVE_POLL or live:
+            return base
+        until = self._seconds_until_window(channel, now)
+        if until is None or until <= base:
+            return base
+        interval = min(float(ADAPTIVE_MAX_POLL_SECONDS), until)
+        if interval > base:
+            self.backoff_polls += 1
+            self.saved_polls += interval / base - 1
+        return max(base, interval)
+
+    # ---------- Metriken ----------
+    def stats(self) -> dict:
+        gaps = list(self._gaps)
+        learned = sum(1 for starts in self._starts.values() if len(starts) >= ADAPTIVE_MIN_STARTS)
+        total = self.polls + self.saved_polls
+        return {
+            "enabled": ADAPTIVE_POLL,
+            "max_interval": ADAPTIVE_MAX_POLL_SECONDS,
+            "channels_learned": learned,
+            "starts_recorded": self.starts_recorded,
+            "polls": self.polls,
+            "backoff_polls": self.backoff_polls,
+            "saved_polls": self.saved_polls,
+            "saved_pct": (self.saved_polls / total * 100) if total else 0.0,
+            "detections": len(gaps),
+            "latency_p50": percentile(gaps, 50),
+            "latency_p95": percentile(gaps, 95),
+            "latency_max": max(gaps) if gaps else 0.0,
+        }
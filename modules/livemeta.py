@@ -0,0 +1,513 @@
+# modules/livemeta.py
+import os
+import re
+import html
+import json
+import time
+import codecs
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+from modules import webclient
+from modules.scheduler import percentile
+
+logger = logging.getLogger("shani-bot")
+
+# ============================================================
+# STREAMING FETCH (nur bis alle Marker gefunden sind)
+# ============================================================
+# "stream" liest die Seite stückweise und bricht ab, sobald alle Marker da sind,
+# "full" lädt wie früher die komplette Seite und parst danach.
+LIVE_FETCH_MODE = os.getenv("LIVE_FETCH_MODE", "stream").strip().lower()
+LIVE_FETCH_MAX_BYTES = max(64 * 1024, int(os.getenv("LIVE_FETCH_MAX_BYTES", str(3 * 1024 * 1024))))
+LIVE_FETCH_CHUNK_BYTES = 64 * 1024
+# So viele Zeichen vom vorherigen Stück werden mitgescannt, damit Marker über
+# Chunk-Grenzen hinweg gefunden werden (muss länger als jeder Treffer sein).
+SCAN_OVERLAP_CHARS = 4096
+
+# ============================================================
+# EXTRAKTION (ein Durchlauf, ein kombiniertes Pattern)
+# ============================================================
+# Feld-Tabelle: (name, Pattern mit genau einer benannten Gruppe <name>, Pflichtfeld?[, Präfix])
+# Pflichtfelder bestimmen, wann die Suche (bzw. der Streaming-Fetch) abbrechen darf.
+# Ein optionales Präfix muss direkt vor dem Treffer stehen (billiger als ein Lookbehind).
+# Alle Patterns einer Tabelle beginnen mit demselben Literal ("), das vor die
+# Alternation gezogen wird; so kann re direkt zum nächsten Kandidaten springen.
+# Bei ignore_case=True sind die Patterns klein geschrieben und laufen über text.lower().
+TWITCH_FIELDS = [
+    ("live_broadcast", r'"islivebroadcast"\s*:\s*(?P<live_broadcast>true|false)', True),
+    ("is_live", r'"islive"\s*:\s*(?P<is_live>true|false)', False),
+    ("avatar", r'"profileimageurl"\s*:\s*"(?P<avatar>[^"]+)"', True),
+    ("title", r'"title"\s*:\s*"(?P<title>[^"]+)"', True),
+    ("game", r'"gamename"\s*:\s*"(?P<game>[^"]+)"', True),
+]
+
+# Live-Status kommt bei YouTube aus ytInitialPlayerResponse (siehe PlayerScanner),
+# die Tabelle liefert nur noch Kanal-Avatar und Seitentitel.
+YT_FIELDS = [
+    ("title", r'"title" content="(?P<title>[^"]+)">', False, "<meta name="),
+    ("avatar", r'"avatar":\{"thumbnails":\[\{"url":"(?P<avatar>[^"]+)"', True),
+]
+
+# Kanonische Kanal-ID auf einer YouTube-Kanalseite (steht früh im <head>)
+YT_ID_FIELDS = [
+    ("channel_id", r'<link rel="canonical" href="https://www\.youtube\.com/channel/(?P<channel_id>UC[\w-]{22})"', True),
+]
+
+_REGEX_SPECIAL = set("\\.^$*+?{}[]()|")
+
+def _literal_prefix(patterns: list[str]) -> str:
+    prefix = os.path.commonprefix(patterns)
+    for i, ch in enumerate(prefix):
+        if ch in _REGEX_SPECIAL:
+            return prefix[:i]
+    return prefix
+
+class ExtractionEngine:
+    """Sucht alle Felder einer Feld-Tabelle in einem einzigen Durchlauf über den Text.
+
+    Pro Feld zählt der erste Treffer im Dokument. single_pass=False sucht jedes Feld
+    einzeln: schneller, wenn jedes Muster mit einem langen Literal beginnt (re springt
+    dann per Substring-Suche), der gemeinsame Anfang aber nur '"' ist.
+    """
+
+    def __init__(self, fields: list[tuple], ignore_case: bool = False, single_pass: bool = True):
+        patterns = [field[1] for field in fields]
+        prefix = _literal_prefix(patterns)
+        combined = re.escape(prefix) + "(?:" + "|".join(p[len(prefix):] for p in patterns) + ")"
+        self.pattern = re.compile(combined)
+        self.ignore_case = ignore_case
+        # Fallback, falls lower() die Länge ändert (dann passen die Offsets nicht mehr)
+        self._pattern_i = re.compile(combined, re.IGNORECASE) if ignore_case else None
+        self.required = frozenset(field[0] for field in fields if field[2])
+        self.preceded_by = {field[0]: field[3] for field in fields if len(field) > 3}
+        self.single_pass = single_pass
+        # Einzelmuster samt Vorgänger-Literal (nur ohne ignore_case genutzt)
+        self.field_patterns = {
+            field[0]: re.compile(re.escape(field[3] if len(field) > 3 else "") + field[1]) for field in fields
+        }
+
+    def complete(self, found: dict[str, str]) -> bool:
+        return self.required.issubset(found)
+
+    def extract(self, text: str, found: dict[str, str] | None = None) -> dict[str, str]:
+        """Ergänzt found um die Felder aus text und bricht ab, sobald alle Pflichtfelder da sind."""
+        found = {} if found is None else found
+        if self.complete(found):
+            return found
+
+        if not self.single_pass and not self.ignore_case:
+            for name, pattern in self.field_patterns.items():
+                if name not in found:
+                    m = pattern.search(text)
+                    if m:
+                        found[name] = m.group(name)
+            return found
+
+        haystack, pattern = text, self.pattern
+        if self.ignore_case:
+            lowered = text.lower()
+            if len(lowered) == len(text):
+                haystack = lowered
+            else:
+                pattern = self._pattern_i
+
+        for m in pattern.finditer(haystack):
+            name = m.lastgroup
+            if name not in found:
+                before = self.preceded_by.get(name)
+                if before and (m.start() < len(before) or not haystack.startswith(before, m.start() - len(before))):
+                    continue
+                start, end = m.span(name)
+                found[name] = text[start:end]
+                if self.complete(found):
+                    break
+        return found
+
+TWITCH_ENGINE = ExtractionEngine(TWITCH_FIELDS, ignore_case=True)
+YT_ENGINE = ExtractionEngine(YT_FIELDS, single_pass=False)
+YT_ID_ENGINE = ExtractionEngine(YT_ID_FIELDS)
+# Über den Namen, damit auch ein Prozess-Pool die Engine findet (Engines sind nicht picklebar)
+ENGINES = {"twitch": TWITCH_ENGINE, "youtube": YT_ENGINE, "youtube_id": YT_ID_ENGINE}
+
+def extract_fields(engine: str, text: str, found: dict[str, str]) -> dict[str, str]:
+    return ENGINES[engine].extract(text, dict(found))
+
+# ============================================================
+# PARSE EXECUTOR (Parsen außerhalb des Event-Loops)
+# ============================================================
+# inline = im Event-Loop (wie früher), thread = Thread-Pool, process = Prozess-Pool.
+# Threads teilen sich das GIL, geben dem Loop aber regelmäßig Luft; echte
+# Parallelität gibt es nur mit process.
+PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "thread").strip().lower()
+PARSE_WORKERS = max(1, int(os.getenv("PARSE_WORKERS", "2")))
+PARSE_SAMPLES = 500
+
+_executor: Executor | None = None
+_parse_times: deque[float] = deque(maxlen=PARSE_SAMPLES)
+_parse_waits: deque[float] = deque(maxlen=PARSE_SAMPLES)
+_parse_stats = {"parses": 0, "pending": 0, "peak_pending": 0}
+
+def _get_executor() -> Executor | None:
+    global _executor
+    if PARSE_EXECUTOR == "inline":
+        return None
+    if _executor is None:
+        if PARSE_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="shani-parse")
+        logger.info(f"Parse-Executor gestartet: {PARSE_EXECUTOR} ({PARSE_WORKERS} Worker)")
+    return _executor
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+async def run_parse(func, *args):
+    """Führt func(*args) im Parse-Executor aus und misst Warte- und Parse-Zeit."""
+    executor = _get_executor()
+    submitted = time.perf_counter()
+    _parse_stats["pending"] += 1
+    _parse_stats["peak_pending"] = max(_parse_stats["peak_pending"], _parse_stats["pending"])
+    try:
+        if executor is None:
+            result, duration = _timed(func, *args)
+        else:
+            loop = asyncio.get_running_loop()
+            result, duration = await loop.run_in_executor(executor, _timed, func, *args)
+    finally:
+        _parse_stats["pending"] -= 1
+    _parse_stats["parses"] += 1
+    _parse_times.append(duration)
+    _parse_waits.append(max(0.0, time.perf_counter() - submitted - duration))
+    return result
+
+def shutdown_parse_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def parse_stats() -> dict:
+    times = list(_parse_times)
+    waits = list(_parse_waits)
+    return {
+        **_parse_stats,
+        "mode": PARSE_EXECUTOR,
+        "workers": PARSE_WORKERS if PARSE_EXECUTOR != "inline" else 0,
+        "avg_ms": (sum(times) / len(times) * 1000) if times else 0.0,
+        "p95_ms": percentile(times, 95) * 1000,
+        "max_ms": max(times) * 1000 if times else 0.0,
+        "wait_avg_ms": (sum(waits) / len(waits) * 1000) if waits else 0.0,
+    }
+
+_fetch_stats = {
+    "fetches": 0, "bytes": 0, "early_stops": 0, "cap_hits": 0, "errors": 0,
+    "player_blobs": 0, "player_chars": 0, "player_overflows": 0,
+}
+
+class StreamScanner(ABC):
+    """Sammelt die Netzwerk-Chunks (oft nur wenige KB) zu Fenstern von mindestens
+    LIVE_FETCH_CHUNK_BYTES Zeichen, damit pro Fenster nur ein run_parse nötig ist."""
+
+    def __init__(self):
+        self._tail = ""
+        self._pending: list[str] = []
+        self._pending_len = 0
+
+    @property
+    @abstractmethod
+    def done(self) -> bool:
+        ...
+
+    async def feed(self, text: str, final: bool = False) -> bool:
+        """Nimmt das nächste Stück Text an. Gibt True zurück, sobald das Ergebnis feststeht."""
+        self._pending.append(text)
+        self._pending_len += len(text)
+        if self._pending_len < LIVE_FETCH_CHUNK_BYTES and not final:
+            return False
+        new = "".join(self._pending)
+        self._pending, self._pending_len = [], 0
+        window = self._tail + new
+        await self._scan(window, len(self._tail))
+        self._tail = window[-SCAN_OVERLAP_CHARS:]
+        return self.done
+
+    @abstractmethod
+    async def _scan(self, window: str, new_from: int) -> None:
+        ...
+
+class MarkerScanner(StreamScanner):
+    """Füttert eine ExtractionEngine stückweise (für den Streaming-Fetch)."""
+
+    def __init__(self, engine: str):
+        super().__init__()
+        self.engine = engine
+        self.found: dict[str, str] = {}
+
+    @property
+    def done(self) -> bool:
+        return ENGINES[self.engine].complete(self.found)
+
+    async def _scan(self, window: str, new_from: int) -> None:
+        self.found = await run_parse(extract_fields, self.engine, window, self.found)
+
+def build_twitch_meta(found: dict[str, str]) -> dict:
+    """Meta-Dict für Twitch aus den gefundenen Feldern."""
+    flag = found.get("live_broadcast") or found.get("is_live") or "false"
+    meta = {"is_live": flag.lower() == "true", "avatar": None, "game": None, "title": None}
+    if found.get("avatar"):
+        meta["avatar"] = found["avatar"].replace("\\/", "/")
+    if found.get("title"):
+        meta["title"] = html.unescape(found["title"])
+    if found.get("game"):
+        meta["game"] = html.unescape(found["game"])
+    return meta
+
+def build_yt_meta(found: dict[str, str], player: dict | None) -> dict:
+    """Meta-Dict für YouTube aus Player-Response (Live-Status) und gefundenen Feldern."""
+    player = player or {}
+    meta = {
+        "is_live": bool(player.get("is_live")),
+        "is_upcoming": bool(player.get("is_upcoming")),
+        "scheduled_start": player.get("scheduled_start"),
+        "viewers": player.get("viewers"),
+        "video_id": player.get("video_id"),
+        "title": player.get("title") or (html.unescape(found["title"]) if found.get("title") else None),
+        "avatar": None,
+    }
+    if found.get("avatar"):
+        meta["avatar"] = found["avatar"].replace("\\/", "/")
+    if "chars" in player:
+        _fetch_stats["player_blobs"] += 1
+        _fetch_stats["player_chars"] += player["chars"]
+        _fetch_stats["player_overflows"] += int(player.get("overflow", False))
+    return meta
+
+# ============================================================
+# YOUTUBE PLAYER-RESPONSE (nur dieses JSON wird dekodiert)
+# ============================================================
+# Größer wird ytInitialPlayerResponse praktisch nie; darüber wird der Puffer
+# verworfen und nur noch grob nach "isLive":true gesucht.
+YT_PLAYER_MAX_CHARS = max(256 * 1024, int(os.getenv("YT_PLAYER_MAX_CHARS", str(2 * 1024 * 1024))))
+YT_PLAYER_START = re.compile(r"ytInitialPlayerResponse\s*=\s*\{")
+YT_PLAYER_NAME = "ytInitialPlayerResponse"
+_JSON_TOKENS = re.compile(r'[{}"\\]')
+
+def json_object_end(text: str, state: tuple[int, bool, bool], start: int = 0) -> tuple[int | None, tuple[int, bool, bool]]:
+    """Sucht das Ende eines JSON-Objekts, das bei text[start] (bzw. in einem früheren Stück) beginnt.
+
+    state = (Klammertiefe, in String, Escape offen) wird zwischen den Stücken weitergereicht.
+    Gibt (Index hinter der schließenden Klammer oder None, neuer state) zurück.
+    """
+    depth, in_string, escape = state
+    pos = start
+    if escape and pos < len(text):
+        pos += 1
+        escape = False
+    while True:
+        m = _JSON_TOKENS.search(text, pos)
+        if not m:
+            return None, (depth, in_string, escape)
+        ch, pos = m.group(), m.end()
+        if ch == "\\":
+            if in_string:
+                if pos >= len(text):
+                    return None, (depth, in_string, True)
+                pos += 1
+        elif ch == '"':
+            in_string = not in_string
+        elif not in_string:
+            depth += 1 if ch == "{" else -1
+            if depth == 0:
+                return pos, (0, False, False)
+
+def _scheduled_start(player: dict, broadcast: dict) -> float | None:
+    slate = (
+        (((player.get("playabilityStatus") or {}).get("liveStreamability") or {})
+         .get("liveStreamabilityRenderer") or {}).get("offlineSlate") or {}
+    ).get("liveStreamOfflineSlateRenderer") or {}
+    if str(slate.get("scheduledStartTime") or "").isdigit():
+        return float(slate["scheduledStartTime"])
+    try:
+        return datetime.fromisoformat(broadcast["startTimestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def parse_player_response(blob: str) -> dict:
+    """Live-Felder aus dem JSON von ytInitialPlayerResponse."""
+    try:
+        player = json.loads(blob)
+    except ValueError:
+        return player_flags(blob)
+    details = player.get("videoDetails") or {}
+    broadcast = ((player.get("microformat") or {}).get("playerMicroformatRenderer") or {}).get("liveBroadcastDetails") or {}
+    is_live = bool(details.get("isLive")) or bool(broadcast.get("isLiveNow"))
+    is_upcoming = bool(details.get("isUpcoming")) and not is_live
+    viewers = details.get("viewCount")
+    return {
+        "is_live": is_live,
+        "is_upcoming": is_upcoming,
+        "scheduled_start": _scheduled_start(player, broadcast) if is_upcoming else None,
+        # Bei laufenden Streams zählt viewCount die aktuellen Zuschauer
+        "viewers": int(viewers) if is_live and str(viewers or "").isdigit() else None,
+        "video_id": details.get("videoId"),
+        "title": details.get("title"),
+        "chars": len(blob),
+    }
+
+def player_flags(blob: str) -> dict:
+    """Notlösung für unlesbare oder zu große Player-Responses: nur die Flags."""
+    return {
+        "is_live": '"isLive":true' in blob,
+        "is_upcoming": '"isUpcoming":true' in blob,
+        "chars": len(blob),
+        "overflow": True,
+    }
+
+def find_player_start(text: str) -> re.Match | None:
+    """YT_PLAYER_START, aber erst per str.find zum Namen springen (deutlich schneller als search)."""
+    pos = text.find(YT_PLAYER_NAME)
+    while pos != -1:
+        m = YT_PLAYER_START.match(text, pos)
+        if m:
+            return m
+        pos = text.find(YT_PLAYER_NAME, pos + 1)
+    return None
+
+def scan_yt_page(html_text: str) -> tuple[dict[str, str], dict | None]:
+    """Kompletter Seitentext (LIVE_FETCH_MODE=full) -> (gefundene Felder, Player-Felder)."""
+    found = YT_ENGINE.extract(html_text)
+    m = find_player_start(html_text)
+    if not m:
+        return found, None
+    start = m.end() - 1
+    end, _ = json_object_end(html_text[:start + YT_PLAYER_MAX_CHARS], (0, False, False), start)
+    if end is None:
+        return found, player_flags(html_text[start:start + YT_PLAYER_MAX_CHARS])
+    return found, parse_player_response(html_text[start:end])
+
+def scan_yt_window(window: str, new_from: int, state: tuple | None,
+                   found: dict[str, str]) -> tuple[dict[str, str], tuple | None, int | None, int | None]:
+    """Ein Fenster des YouTube-Streamings in einem Executor-Aufruf: Felder suchen und
+    die Grenzen der Player-Response verfolgen. Gibt (found, state, start, end) zurück;
+    start = None heißt, die Player-Response hat noch nicht begonnen."""
+    found = YT_ENGINE.extract(window, dict(found))
+    if state is None:
+        m = find_player_start(window)
+        if not m:
+            return found, None, None, None
+        start, state = m.end() - 1, (0, False, False)
+    else:
+        start = new_from  # Überlappung gehört schon zum Puffer
+    end, state = json_object_end(window, state, start)
+    return found, state, start, end
+
+class PlayerScanner(StreamScanner):
+    """Streaming-Scanner für YouTube-Seiten: schneidet ytInitialPlayerResponse mit
+    begrenztem Puffer aus und sucht daneben nur Avatar/Titel.
+
+    Fertig ist er, sobald der Status feststeht: offline/VOD direkt nach der
+    Player-Response, live/geplant nach dem Avatar. Ohne Player-Response wird bis
+    zum Ende gelesen, denn sie kann auch hinter ytInitialData stehen.
+    """
+
+    def __init__(self, max_chars: int = YT_PLAYER_MAX_CHARS):
+        super().__init__()
+        self.max_chars = max_chars
+        self.found: dict[str, str] = {}
+        self.player: dict | None = None
+        self._state: tuple[int, bool, bool] | None = None  # None = Player-Response noch nicht gefunden
+        self._parts: list[str] = []
+        self._size = 0
+
+    @property
+    def done(self) -> bool:
+        if self.player is not None:
+            return not (self.player["is_live"] or self.player["is_upcoming"]) or "avatar" in self.found
+        return False
+
+    async def _scan(self, window: str, new_from: int) -> None:
+        if self.player is not None:
+            self.found = await run_parse(extract_fields, "youtube", window, self.found)
+            return
+        self.found, self._state, start, end = await run_parse(scan_yt_window, window, new_from, self._state, self.found)
+        if start is None:
+            return
+        piece = window[start:end]
+        self._parts.append(piece)
+        self._size += len(piece)
+        if end is not None:
+            blob, self._parts = "".join(self._parts), []
+            self.player = await run_parse(parse_player_response, blob)
+        elif self._size > self.max_chars:
+            blob, self._parts = "".join(self._parts), []
+            self.player = player_flags(blob)
+
+async def stream_scan(url: str, headers: dict, scanner: StreamScanner, max_bytes: int = LIVE_FETCH_MAX_BYTES) -> int:
+    """Liest url stückweise in den Scanner, bis alle Marker da sind oder max_bytes erreicht ist.
+
+    Gibt den HTTP-Status zurück; gescannt wird nur bei 200.
+    """
+    async with webclient.get(url, headers=headers) as resp:
+        _fetch_stats["fetches"] += 1
+        if resp.status != 200:
+            return resp.status
+        decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")(errors="replace")
+        read = 0
+        async for chunk in resp.content.iter_chunked(LIVE_FETCH_CHUNK_BYTES):
+            read += len(chunk)
+            if await scanner.feed(decoder.decode(chunk)):
+                _fetch_stats["early_stops"] += 1
+                # Rest der Seite nicht mehr lesen, Verbindung schließen
+                resp.close()
+                break
+            if read >= max_bytes:
+                _fetch_stats["cap_hits"] += 1
+                await scanner.feed("", final=True)  # Gepuffertes noch scannen
+                resp.close()
+                break
+        else:
+            await scanner.feed(decoder.decode(b"", final=True), final=True)
+        _fetch_stats["bytes"] += read
+    return 200
+
+# Antworten, die "diesen Kanal gibt es nicht" bedeuten
+NOT_FOUND_STATUSES = (404, 410)
+
+async def fetch_page(url: str, headers: dict) -> tuple[int, str | None]:
+    """Lädt eine Seite komplett (LIVE_FETCH_MODE=full). Gibt (Status, Text nur bei 200) zurück."""
+    async with webclient.get(url, headers=headers) as resp:
+        _fetch_stats["fetches"] += 1
+        if resp.status != 200:
+            return resp.status, None
+        text = await resp.text()
+        _fetch_stats["bytes"] += resp.content.total_bytes
+        return 200, text
+
+def not_found_meta() -> dict:
+    return {"is_live": False, "not_found": True}
+
+def parse_twitch(html_text: str) -> dict:
+    return build_twitch_meta(TWITCH_ENGINE.extract(html_text))
+
+def parse_yt(html_text: str) -> dict:
+    return build_yt_meta(*scan_yt_page(html_text))
+
+def count_error() -> None:
+    _fetch_stats["errors"] += 1
+
+def fetch_stats() -> dict:
+    fetches = _fetch_stats["fetches"]
+    return {
+        **_fetch_stats,
+        "mode": LIVE_FETCH_MODE,
+        "avg_kb": (_fetch_stats["bytes"] / fetches / 1024) if fetches else 0.0,
+        "player_avg_kb": (_fetch_stats["player_chars"] / _fetch_stats["player_blobs"] / 1024) if _fetch_stats["player_blobs"] else 0.0,
+    }
@@ -0,0 +1,288 @@
+# modules/migrations.py
+import time
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger("shani-bot")
+
+# ============================================================
+# SCHEMA MIGRATIONS
+# ============================================================
+# Jede Migration läuft genau einmal und wird in schema_version vermerkt.
+# Neue Migrationen nur hinten anhängen, bestehende nie ändern.
+
+def _columns(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone() is not None
+
+def _add_columns(conn: sqlite3.Connection, table: str, columns: list[tuple[str, str]]) -> None:
+    have = _columns(conn, table)
+    for col, col_type in columns:
+        if col not in have:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {col_type};")
+
+def _drop_columns(conn: sqlite3.Connection, table: str, columns: list[str]) -> None:
+    drop = [col for col in columns if col in _columns(conn, table)]
+    if not drop:
+        return
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        for col in drop:
+            conn.execute(f"ALTER TABLE {table} DROP COLUMN {col};")
+        return
+    # Älteres SQLite ohne DROP COLUMN: Tabelle ohne die Spalten neu aufbauen
+    keep = [r for r in conn.execute(f"PRAGMA table_info({table})").fetchall() if r[1] not in drop]
+    defs = []
+    for _, name, col_type, notnull, default, pk in keep:
+        col = f"{name} {col_type}".strip()
+        if pk:
+            col += " PRIMARY KEY"
+        if notnull:
+            col += " NOT NULL"
+        if default is not None:
+            col += f" DEFAULT {default}"
+        defs.append(col)
+    names = ", ".join(r[1] for r in keep)
+    conn.execute(f"CREATE TABLE {table}__new ({', '.join(defs)});")
+    conn.execute(f"INSERT INTO {table}__new ({names}) SELECT {names} FROM {table};")
+    conn.execute(f"DROP TABLE {table};")
+    conn.execute(f"ALTER TABLE {table}__new RENAME TO {table};")
+
+def _m001_base_tables(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            setcard_channel_id INTEGER,
+            create_channel_id INTEGER,
+            create_channel_3_id INTEGER,
+            create_channel_open_id INTEGER,
+            voice_category_id INTEGER,
+            twitch_enabled INTEGER DEFAULT 0,
+            twitch_channel TEXT,
+            twitch_announce_channel_id INTEGER,
+            twitch_ping_role_id INTEGER,
+            twitch_stable_checks INTEGER DEFAULT 2,
+            twitch_poll_seconds INTEGER DEFAULT 90,
+            twitch_offline_grace_seconds INTEGER DEFAULT 300,
+            twitch_last_live_message_id INTEGER,
+            twitch_last_check_ts REAL DEFAULT 0.0,
+            twitch_last_seen_live_ts REAL DEFAULT 0.0,
+            twitch_announced_this_stream INTEGER DEFAULT 0,
+            role_admin_id INTEGER,
+            role_mod_id INTEGER,
+            role_setcard_id INTEGER
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS setcards (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            embark_id TEXT NOT NULL,
+            orientation_json TEXT NOT NULL,
+            experience TEXT,
+            platform TEXT,
+            network TEXT,
+            age_group TEXT,
+            voice TEXT,
+            note TEXT,
+            setcard_message_id INTEGER,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        );
+    """)
+
+def _m002_bot_name_and_youtube(conn: sqlite3.Connection) -> None:
+    _add_columns(conn, "guild_settings", [
+        ("bot_custom_name", "TEXT DEFAULT 'Shani'"),
+        ("youtube_enabled", "INTEGER DEFAULT 0"),
+        ("youtube_channel", "TEXT"),
+        ("youtube_announce_channel_id", "INTEGER"),
+        ("youtube_ping_role_id", "INTEGER"),
+        ("youtube_last_live_message_id", "INTEGER"),
+        ("youtube_last_check_ts", "REAL DEFAULT 0.0"),
+        ("youtube_last_seen_live_ts", "REAL DEFAULT 0.0"),
+        ("youtube_announced_this_stream", "INTEGER DEFAULT 0"),
+        ("youtube_stable_checks", "INTEGER DEFAULT 2"),
+        ("youtube_poll_seconds", "INTEGER DEFAULT 300"),
+        ("youtube_offline_grace_seconds", "INTEGER DEFAULT 600"),
+    ])
+
+def _m003_subscriptions(conn: sqlite3.Connection) -> None:
+    # Mehrere Streamer pro Guild: ein Abo pro (guild, provider, channel).
+    # NULL in den Einstellungsspalten = Guild-Standard aus guild_settings verwenden.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            provider TEXT NOT NULL,
+            channel TEXT NOT NULL,
+            announce_channel_id INTEGER,
+            ping_role_id INTEGER,
+            stable_checks INTEGER,
+            poll_seconds INTEGER,
+            offline_grace_seconds INTEGER,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL,
+            UNIQUE (guild_id, provider, channel)
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_channel ON subscriptions (provider, channel);")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS subscription_state (
+            subscription_id INTEGER PRIMARY KEY,
+            last_check_ts REAL DEFAULT 0.0,
+            last_seen_live_ts REAL DEFAULT 0.0,
+            announced_this_stream INTEGER DEFAULT 0,
+            last_live_message_id INTEGER
+        ) WITHOUT ROWID;
+    """)
+
+    # Bisherigen Einzel-Kanal jeder Guild als Abo übernehmen, samt Poller-State
+    now = datetime.now(timezone.utc).isoformat()
+    for provider in ("twitch", "youtube"):
+        conn.execute(f"""
+            INSERT OR IGNORE INTO subscriptions (guild_id, provider, channel, created_at)
+            SELECT guild_id, '{provider}', {provider}_channel, ?
+            FROM guild_settings
+            WHERE {provider}_channel IS NOT NULL AND {provider}_channel != ''
+        """, (now,))
+    # Poller-Laufzeitdaten wandern in subscription_state, damit Poll-Ticks
+    # nicht mehr die breite guild_settings-Zeile neu schreiben
+    for provider in ("twitch", "youtube"):
+        conn.execute(f"""
+            INSERT OR IGNORE INTO subscription_state (
+                subscription_id, last_check_ts, last_seen_live_ts,
+                announced_this_stream, last_live_message_id
+            )
+            SELECT s.id,
+                COALESCE(g.{provider}_last_check_ts, 0.0),
+                COALESCE(g.{provider}_last_seen_live_ts, 0.0),
+                COALESCE(g.{provider}_announced_this_stream, 0),
+                g.{provider}_last_live_message_id
+            FROM subscriptions s
+            JOIN guild_settings g ON g.guild_id = s.guild_id
+            WHERE s.provider = '{provider}'
+        """)
+        _drop_columns(conn, "guild_settings", [
+            f"{provider}_last_check_ts",
+            f"{provider}_last_seen_live_ts",
+            f"{provider}_announced_this_stream",
+            f"{provider}_last_live_message_id",
+        ])
+
+def _m004_live_history(conn: sqlite3.Connection) -> None:
+    # Beobachtete Stream-Starts pro Kanal (für adaptives Polling)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS live_history (
+            provider TEXT NOT NULL,
+            channel TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            PRIMARY KEY (provider, channel, started_at)
+        ) WITHOUT ROWID;
+    """)
+
+def _m005_subscription_suspension(conn: sqlite3.Connection) -> None:
+    # Abos auf nicht existierende Kanäle werden automatisch pausiert
+    _add_columns(conn, "subscriptions", [
+        ("suspended_at", "REAL"),
+        ("suspend_reason", "TEXT"),
+    ])
+
+def _m006_channel_aliases(conn: sqlite3.Connection) -> None:
+    # Aufgelöste Schreibweisen eines Kanals (z.B. YouTube-@handle -> UC-ID)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS channel_aliases (
+            provider TEXT NOT NULL,
+            alias TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            resolved_at REAL NOT NULL,
+            PRIMARY KEY (provider, alias)
+        ) WITHOUT ROWID;
+    """)
+
+def _m007_scheduled_start(conn: sqlite3.Connection) -> None:
+    # Angekündigte Startzeit eines geplanten Streams (YouTube-Premieren/Streams)
+    _add_columns(conn, "subscription_state", [("scheduled_start", "REAL")])
+
+def _m008_live_state(conn: sqlite3.Connection) -> None:
+    # Live/Offline-Zustandsmaschine pro Abo, damit ein Neustart sie nicht zurücksetzt
+    _add_columns(conn, "subscription_state", [
+        ("live_state", "INTEGER DEFAULT 0"),
+        ("live_hits", "INTEGER DEFAULT 0"),
+        ("off_hits", "INTEGER DEFAULT 0"),
+        ("live_changed_ts", "REAL DEFAULT 0.0"),
+    ])
+
+MIGRATIONS: list[tuple[int, str, callable]] = [
+    (1, "base tables", _m001_base_tables),
+    (2, "bot_custom_name + youtube columns", _m002_bot_name_and_youtube),
+    (3, "subscriptions + subscription_state", _m003_subscriptions),
+    (4, "live_history table", _m004_live_history),
+    (5, "subscription suspension", _m005_subscription_suspension),
+    (6, "channel_aliases table", _m006_channel_aliases),
+    (7, "subscription_state.scheduled_start", _m007_scheduled_start),
+    (8, "subscription_state live state machine", _m008_live_state),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_migrate_lock = threading.Lock()
+
+def current_version(conn: sqlite3.Connection) -> int:
+    if not _table_exists(conn, "schema_version"):
+        return 0
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return int(row[0] or 0)
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Bringt das Schema auf LATEST_VERSION. Ohne offene Migrationen passiert keinerlei DDL."""
+    if current_version(conn) >= LATEST_VERSION:
+        return 0
+
+    with _migrate_lock:
+        old_isolation = conn.isolation_level
+        conn.isolation_level = None  # Transaktion selbst steuern
+        try:
+            # IMMEDIATE sperrt auch gegen einen zweiten Prozess auf derselben DB
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        applied_at TEXT NOT NULL,
+                        duration_ms REAL NOT NULL
+                    );
+                """)
+                version = current_version(conn)
+                applied = 0
+                total_start = time.perf_counter()
+                for number, name, func in MIGRATIONS:
+                    if number <= version:
+                        continue
+                    start = time.perf_counter()
+                    func(conn)
+                    duration_ms = (time.perf_counter() - start) * 1000
+                    conn.execute(
+                        "INSERT INTO schema_version (version, name, applied_at, duration_ms) VALUES (?, ?, ?, ?)",
+                        (number, name, datetime.now(timezone.utc).isoformat(), duration_ms),
+                    )
+                    logger.info(f"DB-Migration {number:03d} ({name}) in {duration_ms:.1f} ms")
+                    applied += 1
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.isolation_level = old_isolation
+
+    if applied:
+        total_ms = (time.perf_counter() - total_start) * 1000
+        logger.info(f"DB-Schema auf Version {LATEST_VERSION} ({applied} Migrationen, {total_ms:.1f} ms)")
+    return applied
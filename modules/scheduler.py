@@ -0,0 +1,441 @@
+# modules/scheduler.py
+import os
+import time
+import zlib
+import heapq
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Hashable
+
+logger = logging.getLogger("shani-bot")
+
+# ============================================================
+# POLL SCHEDULER (Min-Heap nach Fälligkeit)
+# ============================================================
+# Jitter beim Neu-Einplanen: +-5 % des Intervalls, höchstens 3 Sekunden
+POLL_JITTER_FRACTION = 0.05
+POLL_JITTER_MAX_SECONDS = 3.0
+LATENESS_SAMPLES = 500
+
+# Wie viele Polls (über alle Scheduler) gleichzeitig laufen dürfen
+POLL_MAX_CONCURRENCY = max(1, int(os.getenv("POLL_MAX_CONCURRENCY", "8")))
+_poll_slots = asyncio.Semaphore(POLL_MAX_CONCURRENCY)
+# Laufende Polls aller Scheduler (belegte Slots)
+_polls_running = 0
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+    return values[idx]
+
+def poll_jitter(interval: float) -> float:
+    span = min(interval * POLL_JITTER_FRACTION, POLL_JITTER_MAX_SECONDS)
+    return random.uniform(-span, span)
+
+class PollScheduler:
+    """Führt handler(key) aus, sobald der Termin eines Keys fällig ist.
+
+    Der Handler gibt die Sekunden bis zum nächsten Lauf zurück (None = nicht neu
+    einplanen). Im Leerlauf schläft der Scheduler bis zum frühesten Termin.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Hashable], Awaitable[float | None]], retry_delay: float = 60.0):
+        self.name = name
+        self.handler = handler
+        self.retry_delay = retry_delay
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._entries: dict[Hashable, tuple[float, int]] = {}  # key -> (due, seq) des gültigen Heap-Eintrags
+        self._active: set[Hashable] = set()
+        self._running: set[Hashable] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._seq = 0
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._lateness: deque[float] = deque(maxlen=LATENESS_SAMPLES)
+        self.runs = 0
+        self.errors = 0
+
+    # ---------- Planung ----------
+    def schedule(self, key: Hashable, delay: float, jitter: bool = False) -> None:
+        """Plant key in delay Sekunden ein (ersetzt einen bestehenden Termin)."""
+        if jitter:
+            delay += poll_jitter(delay)
+        due = time.monotonic() + max(0.0, delay)
+        self._seq += 1
+        self._entries[key] = (due, self._seq)
+        self._active.add(key)
+        heapq.heappush(self._heap, (due, self._seq, key))
+        if self._heap[0][1] == self._seq:
+            self._wake.set()
+
+    def cancel(self, key: Hashable) -> None:
+        # Heap-Eintrag bleibt liegen und wird beim Herausnehmen verworfen
+        self._entries.pop(key, None)
+        self._active.discard(key)
+
+    def is_scheduled(self, key: Hashable) -> bool:
+        return key in self._active
+
+    def due_in(self, key: Hashable) -> float | None:
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        return max(0.0, entry[0] - time.monotonic())
+
+    def keys(self) -> set[Hashable]:
+        return set(self._active)
+
+    # ---------- Lifecycle ----------
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    # ---------- Ablauf ----------
+    async def _sleep_until(self, due: float) -> None:
+        self._wake.clear()
+        timeout = due - time.monotonic()
+        if timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self) -> None:
+        global _polls_running
+        while True:
+            if not self._heap:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            due, seq, key = self._heap[0]
+            if self._entries.get(key, (None, None))[1] != seq:
+                heapq.heappop(self._heap)  # veralteter Eintrag
+                continue
+
+            now = time.monotonic()
+            if due > now:
+                await self._sleep_until(due)
+                continue
+
+            if key in self._running:
+                # Vorheriger Poll läuft noch -> kurz danach erneut versuchen
+                heapq.heappop(self._heap)
+                del self._entries[key]
+                self.schedule(key, 1.0)
+                continue
+
+            # Globales Limit: ist alles belegt, wartet der Scheduler hier (zählt als Verspätung)
+            await _poll_slots.acquire()
+            if self._entries.get(key, (None, None))[1] != seq:
+                _poll_slots.release()
+                continue
+
+            heapq.heappop(self._heap)
+            del self._entries[key]
+            self._lateness.append(time.monotonic() - due)
+
+            self._running.add(key)
+            _polls_running += 1
+            task = asyncio.create_task(self._dispatch(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, key: Hashable) -> None:
+        global _polls_running
+        try:
+            delay = await self.handler(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"[{self.name}] Poll für {key} fehlgeschlagen: {e}")
+            delay = self.retry_delay
+        finally:
+            self._running.discard(key)
+            _polls_running -= 1
+            _poll_slots.release()
+        self.runs += 1
+
+        if delay is None:
+            self._active.discard(key)
+        # Nur neu einplanen, wenn der Key nicht inzwischen entfernt/neu geplant wurde
+        elif key in self._active and key not in self._entries:
+            self.schedule(key, delay, jitter=True)
+
+    # ---------- Metriken ----------
+    def stats(self) -> dict:
+        lateness = list(self._lateness)
+        next_in = None
+        if self._entries:
+            next_in = max(0.0, min(d for d, _ in self._entries.values()) - time.monotonic())
+        return {
+            "depth": len(self._entries),
+            "running": len(self._running),
+            "slots_free": POLL_MAX_CONCURRENCY - _polls_running,
+            "runs": self.runs,
+            "errors": self.errors,
+            "next_in": next_in,
+            "late_avg": (sum(lateness) / len(lateness)) if lateness else 0.0,
+            "late_p95": percentile(lateness, 95),
+            "late_max": max(lateness) if lateness else 0.0,
+        }
+
+# ============================================================
+# FAN-OUT (ein Poll pro Kanal, viele Abonnenten)
+# ============================================================
+class ChannelFanout:
+    """Ordnet Abonnenten (z.B. Guild-IDs) ihrem normalisierten Kanal samt Poll-Intervall zu."""
+
+    def __init__(self):
+        self._by_channel: dict[str, set[Hashable]] = {}
+        self._subs: dict[Hashable, tuple[str, float]] = {}  # sub -> (channel, interval)
+
+    def subscribe(self, sub: Hashable, channel: str, interval: float) -> str | None:
+        """Trägt sub für channel ein. Gibt den vorherigen Kanal zurück, falls er sich geändert hat."""
+        old = self._subs.get(sub)
+        self._subs[sub] = (channel, interval)
+        self._by_channel.setdefault(channel, set()).add(sub)
+        if old and old[0] != channel:
+            self._discard(sub, old[0])
+            return old[0]
+        return None
+
+    def unsubscribe(self, sub: Hashable) -> str | None:
+        old = self._subs.pop(sub, None)
+        if not old:
+            return None
+        self._discard(sub, old[0])
+        return old[0]
+
+    def _discard(self, sub: Hashable, channel: str) -> None:
+        subs = self._by_channel.get(channel)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._by_channel[channel]
+
+    def subscribers(self, channel: str) -> set[Hashable]:
+        return set(self._by_channel.get(channel, ()))
+
+    def all_subscribers(self) -> set[Hashable]:
+        return set(self._subs)
+
+    def interval(self, sub: Hashable) -> float | None:
+        entry = self._subs.get(sub)
+        return entry[1] if entry else None
+
+    def channel_interval(self, channel: str) -> float | None:
+        """Kürzestes Intervall aller Abonnenten des Kanals."""
+        subs = self._by_channel.get(channel)
+        if not subs:
+            return None
+        return min(self._subs[s][1] for s in subs)
+
+    def stats(self) -> dict:
+        return {"channels": len(self._by_channel), "subscribers": len(self._subs)}
+
+# ============================================================
+# BESTÄTIGUNGS-BURST (schnelle Re-Probes nach einem Zustandswechsel)
+# ============================================================
+# Kippt der Live-Zustand, wird der Kanal bis zum Erreichen der Stable-Checks in
+# diesem Abstand erneut abgefragt statt erst nach dem vollen Poll-Intervall.
+# 0 = aus (Bestätigung im normalen Takt wie früher).
+LIVE_CONFIRM_SECONDS = max(0.0, float(os.getenv("LIVE_CONFIRM_SECONDS", "15")))
+
+class ConfirmTracker:
+    """Verfolgt offene Bestätigungen pro Abo und zählt, was die Bursts bringen."""
+
+    def __init__(self):
+        self._pending: dict[Hashable, tuple[float, float]] = {}  # sub -> (Start, Dauer im normalen Takt)
+        self._durations: deque[float] = deque(maxlen=LATENESS_SAMPLES)
+        self.started = 0
+        self.probes = 0
+        self.confirmed = 0
+        self.aborted = 0
+        self.saved_seconds = 0.0
+
+    def track(self, sub: Hashable, pending: bool, flipping: bool, now: float, normal_delay: float) -> None:
+        """pending = Schwelle noch nicht erreicht, flipping = Ergebnis weicht vom gemeldeten Zustand ab."""
+        if pending:
+            if sub not in self._pending:
+                self.started += 1
+                self._pending[sub] = (now, normal_delay)
+            return
+        entry = self._pending.pop(sub, None)
+        if entry is None:
+            return
+        if flipping:
+            # Schwelle erreicht -> Wechsel bestätigt
+            duration = now - entry[0]
+            self.confirmed += 1
+            self._durations.append(duration)
+            self.saved_seconds += max(0.0, entry[1] - duration)
+        else:
+            # Zurückgekippt -> war nur ein Flackern
+            self.aborted += 1
+
+    def forget(self, sub: Hashable) -> None:
+        self._pending.pop(sub, None)
+
+    def delay(self, poll_seconds: float) -> float:
+        return min(poll_seconds, LIVE_CONFIRM_SECONDS)
+
+    def stats(self) -> dict:
+        durations = list(self._durations)
+        return {
+            "enabled": LIVE_CONFIRM_SECONDS > 0,
+            "interval": LIVE_CONFIRM_SECONDS,
+            "pending": len(self._pending),
+            "started": self.started,
+            "probes": self.probes,
+            "confirmed": self.confirmed,
+            "aborted": self.aborted,
+            "avg_confirm": (sum(durations) / len(durations)) if durations else 0.0,
+            "saved_seconds": self.saved_seconds,
+        }
+
+# ============================================================
+# NEGATIVE CACHE (Kanal existiert nicht)
+# ============================================================
+# Nach so vielen "nicht gefunden" in Folge wird das Abo pausiert; bis dahin
+# verdoppelt sich der Abstand zwischen den Versuchen.
+NOT_FOUND_SUSPEND_AFTER = max(1, int(os.getenv("NOT_FOUND_SUSPEND_AFTER", "5")))
+NOT_FOUND_BACKOFF_MAX_SECONDS = 6 * 3600.0
+
+class NegativeCache:
+    """Zählt aufeinanderfolgende "nicht gefunden"-Ergebnisse pro Kanal."""
+
+    def __init__(self):
+        self._misses: dict[Hashable, int] = {}
+        self.not_found = 0
+        self.suspended = 0
+
+    def miss(self, key: Hashable) -> int:
+        self.not_found += 1
+        self._misses[key] = self._misses.get(key, 0) + 1
+        return self._misses[key]
+
+    def clear(self, key: Hashable) -> None:
+        self._misses.pop(key, None)
+
+    def backoff(self, key: Hashable, base: float) -> float:
+        return min(NOT_FOUND_BACKOFF_MAX_SECONDS, base * 2 ** self._misses.get(key, 0))
+
+    def stats(self) -> dict:
+        return {"backoff": len(self._misses), "not_found": self.not_found, "suspended": self.suspended}
+
+# ============================================================
+# GEPLANTE STARTS (angekündigte Streams/Premieren)
+# ============================================================
+# Bis kurz vor dem angekündigten Start selten pollen, im Fenster um den Start
+# herum dafür sehr häufig.
+SCHEDULE_WINDOW_BEFORE_SECONDS = max(0, int(os.getenv("SCHEDULE_WINDOW_BEFORE_SECONDS", "120")))
+SCHEDULE_WINDOW_AFTER_SECONDS = max(60, int(os.getenv("SCHEDULE_WINDOW_AFTER_SECONDS", "900")))
+SCHEDULE_FAST_POLL_SECONDS = max(5, int(os.getenv("SCHEDULE_FAST_POLL_SECONDS", "15")))
+# Höchstens so lange wird vor dem Fenster gewartet (Verschiebungen/früher Start)
+SCHEDULE_IDLE_POLL_SECONDS = max(60, int(os.getenv("SCHEDULE_IDLE_POLL_SECONDS", "1800")))
+
+class StartSchedule:
+    """Angekündigte Startzeiten pro Kanal und der daraus folgende Poll-Abstand."""
+
+    def __init__(self):
+        self._starts: dict[Hashable, float] = {}
+        self._latency: deque[float] = deque(maxlen=LATENESS_SAMPLES)
+        self.window_polls = 0
+        self.idle_polls = 0
+        self.expired = 0
+
+    def set(self, key: Hashable, start: float | None) -> None:
+        if start:
+            self._starts[key] = float(start)
+        else:
+            self._starts.pop(key, None)
+
+    def get(self, key: Hashable) -> float | None:
+        return self._starts.get(key)
+
+    def went_live(self, key: Hashable, now: float) -> None:
+        """Stream ist live: Abstand zur angekündigten Zeit merken, Termin erledigt."""
+        start = self._starts.pop(key, None)
+        if start is not None:
+            self._latency.append(max(0.0, now - start))
+
+    def next_interval(self, key: Hashable, base: float, now: float) -> float | None:
+        """Poll-Abstand wegen eines geplanten Starts, None = kein Termin (normaler Takt)."""
+        start = self._starts.get(key)
+        if start is None:
+            return None
+        if now > start + SCHEDULE_WINDOW_AFTER_SECONDS:
+            # Fenster vorbei, ohne dass es losging -> Termin verwerfen
+            self.expired += 1
+            del self._starts[key]
+            return None
+        window_start = start - SCHEDULE_WINDOW_BEFORE_SECONDS
+        if now >= window_start:
+            self.window_polls += 1
+            return min(base, SCHEDULE_FAST_POLL_SECONDS)
+        self.idle_polls += 1
+        return min(max(base, SCHEDULE_IDLE_POLL_SECONDS), window_start - now)
+
+    def stats(self) -> dict:
+        latency = list(self._latency)
+        now = time.time()
+        return {
+            "scheduled": len(self._starts),
+            "in_window": sum(1 for start in self._starts.values() if now >= start - SCHEDULE_WINDOW_BEFORE_SECONDS),
+            "window_polls": self.window_polls,
+            "idle_polls": self.idle_polls,
+            "expired": self.expired,
+            "detections": len(latency),
+            "latency_p50": percentile(latency, 50),
+            "latency_max": max(latency) if latency else 0.0,
+        }
+
+# ============================================================
+# NEUSTART (gestaffelter erster Poll)
+# ============================================================
+# Beim Start überfällige Kanäle werden über ihr Intervall verteilt, höchstens so weit
+# (0 = alle sofort pollen wie früher)
+STARTUP_STAGGER_MAX_SECONDS = max(0, int(os.getenv("STARTUP_STAGGER_MAX_SECONDS", "300")))
+
+def stagger_offset(key: Hashable, spread: float) -> float:
+    """Fester Versatz in [0, spread) pro Key (crc32, damit er über Neustarts gleich bleibt)."""
+    if spread <= 0:
+        return 0.0
+    return zlib.crc32(str(key).encode()) / 2**32 * spread
+
+class WarmupStagger:
+    """Verteilt die ersten Polls nach einem Neustart, statt alle im ersten Tick abzufeuern."""
+
+    def __init__(self):
+        self.active = False
+        self.restored = 0
+        self.max_delay = 0.0
+        # Ein Kanal wird pro Abo neu eingeplant, zählt aber nur einmal
+        self._staggered: set[Hashable] = set()
+
+    def delay(self, key: Hashable, delay: float, interval: float) -> float:
+        """Während des Warm-ups bekommen überfällige Keys ihren festen Versatz."""
+        if not self.active or delay > 0:
+            return delay
+        delay = stagger_offset(key, min(interval, STARTUP_STAGGER_MAX_SECONDS))
+        self._staggered.add(key)
+        self.max_delay = max(self.max_delay, delay)
+        return delay
+
+    def stats(self) -> dict:
+        return {"restored": self.restored, "staggered": len(self._staggered), "max_delay": self.max_delay}
@@ -1,5 +1,4 @@
 # modules/setcards.py
-import os
 import json
 import re
 import asyncio
@@ -10,119 +9,15 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 
+from modules.storage import _db_run, get_guild_cfg, update_guild_cfg
+
 # ============================================================
-# PATHS / DB
+# HELPERS
 # ============================================================
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # project root
-DATA_DIR = os.path.join(BASE_DIR, "data")
-DB_PATH = os.path.join(DATA_DIR, "setcards.db")
-
-os.makedirs(DATA_DIR, exist_ok=True)
-
+# Schema + Migrationen: modules/migrations.py (laufen beim ersten DB-Zugriff)
 def _iso_now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
-def _ensure_db_sync() -> None:
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA synchronous=NORMAL;")
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS guild_settings (
-                guild_id INTEGER PRIMARY KEY,
-                setcard_channel_id INTEGER,
-                create_channel_id INTEGER,
-                create_channel_3_id INTEGER,
-                create_channel_open_id INTEGER,
-                voice_category_id INTEGER,
-                twitch_enabled INTEGER DEFAULT 0,
-                twitch_channel TEXT,
-                twitch_announce_channel_id INTEGER,
-                twitch_ping_role_id INTEGER,
-                twitch_stable_checks INTEGER DEFAULT 2,
-                twitch_poll_seconds INTEGER DEFAULT 90,
-                twitch_offline_grace_seconds INTEGER DEFAULT 300,
-                twitch_last_live_message_id INTEGER,
-                twitch_last_check_ts REAL DEFAULT 0.0,
-                twitch_last_seen_live_ts REAL DEFAULT 0.0,
-                twitch_announced_this_stream INTEGER DEFAULT 0,
-                role_admin_id INTEGER,
-                role_mod_id INTEGER,
-                role_setcard_id INTEGER,
-                bot_custom_name TEXT DEFAULT 'Shani',
-                youtube_enabled INTEGER DEFAULT 0,
-                youtube_channel TEXT,
-                youtube_announce_channel_id INTEGER,
-                youtube_ping_role_id INTEGER,
-                youtube_last_live_message_id INTEGER,
-                youtube_last_check_ts REAL DEFAULT 0.0,
-                youtube_last_seen_live_ts REAL DEFAULT 0.0,
-                youtube_announced_this_stream INTEGER DEFAULT 0,
-                youtube_stable_checks INTEGER DEFAULT 2,
-                youtube_poll_seconds INTEGER DEFAULT 300,
-                youtube_offline_grace_seconds INTEGER DEFAULT 600
-            );
-        """)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS setcards (
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                embark_id TEXT NOT NULL,
-                orientation_json TEXT NOT NULL,
-                experience TEXT,
-                platform TEXT,
-                network TEXT,
-                age_group TEXT,
-                voice TEXT,
-                note TEXT,
-                setcard_message_id INTEGER,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                PRIMARY KEY (guild_id, user_id)
-            );
-        """)
-        
-        # Migration: Ensure bot_custom_name exists
-        try:
-            conn.execute("ALTER TABLE guild_settings ADD COLUMN bot_custom_name TEXT DEFAULT 'Shani';")
-        except sqlite3.OperationalError:
-            pass # Already exists
-            
-        # Migration: Ensure YouTube columns exist
-        youtube_columns = [
-            ("youtube_enabled", "INTEGER DEFAULT 0"),
-            ("youtube_channel", "TEXT"),
-            ("youtube_announce_channel_id", "INTEGER"),
-            ("youtube_ping_role_id", "INTEGER"),
-            ("youtube_last_live_message_id", "INTEGER"),
-            ("youtube_last_check_ts", "REAL DEFAULT 0.0"),
-            ("youtube_last_seen_live_ts", "REAL DEFAULT 0.0"),
-            ("youtube_announced_this_stream", "INTEGER DEFAULT 0"),
-            ("youtube_stable_checks", "INTEGER DEFAULT 2"),
-            ("youtube_poll_seconds", "INTEGER DEFAULT 300"),
-            ("youtube_offline_grace_seconds", "INTEGER DEFAULT 600")
-        ]
-        for col, col_type in youtube_columns:
-            try:
-                conn.execute(f"ALTER TABLE guild_settings ADD COLUMN {col} {col_type};")
-            except sqlite3.OperationalError:
-                pass # Already exists
-
-        conn.commit()
-    finally:
-        conn.close()
-
-_ensure_db_sync()
-_db_lock = asyncio.Lock()
-
-async def _db_run(func, *args):
-    return await asyncio.to_thread(func, *args)
-
-def _db_connect():
-    conn = sqlite3.connect(DB_PATH, timeout=10)
-    conn.row_factory = sqlite3.Row
-    return conn
-
 # ============================================================
 # SAFE TIMEOUT WRAPPER (Discord Calls)
 # ============================================================
@@ -170,39 +65,14 @@ def _json_loads(s: str):
 # ============================================================
 # DB: GUILD SETTINGS
 # ============================================================
-def _set_setcard_channel_sync(guild_id: int, channel_id: int) -> None:
-    conn = _db_connect()
-    try:
-        conn.execute(
-            "INSERT INTO guild_settings (guild_id, setcard_channel_id) VALUES (?, ?) "
-            "ON CONFLICT(guild_id) DO UPDATE SET setcard_channel_id=excluded.setcard_channel_id",
-            (int(guild_id), int(channel_id)),
-        )
-        conn.commit()
-    finally:
-        conn.close()
-
+# Laufen über den gemeinsamen Config-Cache in modules/storage.py
 async def set_setcard_channel(guild_id: int, channel_id: int) -> None:
-    async with _db_lock:
-        await _db_run(_set_setcard_channel_sync, guild_id, channel_id)
-
-def _get_setcard_channel_id_sync(guild_id: int) -> int | None:
-    conn = _db_connect()
-    try:
-        row = conn.execute(
-            "SELECT setcard_channel_id FROM guild_settings WHERE guild_id=?",
-            (int(guild_id),),
-        ).fetchone()
-        if not row:
-            return None
-        val = row["setcard_channel_id"]
-        return int(val) if val is not None else None
-    finally:
-        conn.close()
+    await update_guild_cfg(guild_id, setcard_channel_id=int(channel_id))
 
 async def get_setcard_channel_id(guild_id: int) -> int | None:
-    async with _db_lock:
-        return await _db_run(_get_setcard_channel_id_sync, guild_id)
+    cfg = await get_guild_cfg(guild_id)
+    val = cfg.get("setcard_channel_id")
+    return int(val) if val is not None else None
 
 # ============================================================
 # DB: SETCARDS
@@ -224,110 +94,88 @@ def _row_to_card(row: sqlite3.Row) -> dict:
         "updated_at": row["updated_at"],
     }
 
-def _get_card_sync(guild_id: int, user_id: int) -> dict | None:
-    conn = _db_connect()
-    try:
-        row = conn.execute(
-            "SELECT * FROM setcards WHERE guild_id=? AND user_id=?",
-            (int(guild_id), int(user_id)),
-        ).fetchone()
-        return _row_to_card(row) if row else None
-    finally:
-        conn.close()
+def _get_card_sync(conn: sqlite3.Connection, guild_id: int, user_id: int) -> dict | None:
+    row = conn.execute(
+        "SELECT * FROM setcards WHERE guild_id=? AND user_id=?",
+        (int(guild_id), int(user_id)),
+    ).fetchone()
+    return _row_to_card(row) if row else None
 
 async def get_card(guild_id: int, user_id: int) -> dict | None:
-    async with _db_lock:
-        return await _db_run(_get_card_sync, guild_id, user_id)
-
-def _upsert_card_sync(guild_id: int, user_id: int, card: dict) -> None:
-    conn = _db_connect()
-    try:
-        existing = conn.execute(
-            "SELECT created_at FROM setcards WHERE guild_id=? AND user_id=?",
-            (int(guild_id), int(user_id)),
-        ).fetchone()
-        created_at = existing["created_at"] if existing else (card.get("created_at") or _iso_now())
-        updated_at = card.get("updated_at") or _iso_now()
-
-        conn.execute(
-            """
-            INSERT INTO setcards (
-                guild_id, user_id, embark_id, orientation_json, experience, platform, network,
-                age_group, voice, note, setcard_message_id, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(guild_id, user_id) DO UPDATE SET
-                embark_id=excluded.embark_id,
-                orientation_json=excluded.orientation_json,
-                experience=excluded.experience,
-                platform=excluded.platform,
-                network=excluded.network,
-                age_group=excluded.age_group,
-                voice=excluded.voice,
-                note=excluded.note,
-                setcard_message_id=excluded.setcard_message_id,
-                updated_at=excluded.updated_at
-            """,
-            (
-                int(guild_id),
-                int(user_id),
-                (card.get("embark_id") or "").strip(),
-                _json_dumps(card.get("orientation") or []),
-                (card.get("experience") or "").strip(),
-                (card.get("platform") or "").strip(),
-                (card.get("network") or "").strip(),
-                (card.get("age_group") or "").strip(),
-                (card.get("voice") or "").strip(),
-                (card.get("note") or "").strip(),
-                int(card["setcard_message_id"]) if card.get("setcard_message_id") else None,
-                created_at,
-                updated_at,
-            ),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    return await _db_run(_get_card_sync, guild_id, user_id)
+
+def _upsert_card_sync(conn: sqlite3.Connection, guild_id: int, user_id: int, card: dict) -> None:
+    existing = conn.execute(
+        "SELECT created_at FROM setcards WHERE guild_id=? AND user_id=?",
+        (int(guild_id), int(user_id)),
+    ).fetchone()
+    created_at = existing["created_at"] if existing else (card.get("created_at") or _iso_now())
+    updated_at = card.get("updated_at") or _iso_now()
+
+    conn.execute(
+        """
+        INSERT INTO setcards (
+            guild_id, user_id, embark_id, orientation_json, experience, platform, network,
+            age_group, voice, note, setcard_message_id, created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(guild_id, user_id) DO UPDATE SET
+            embark_id=excluded.embark_id,
+            orientation_json=excluded.orientation_json,
+            experience=excluded.experience,
+            platform=excluded.platform,
+            network=excluded.network,
+            age_group=excluded.age_group,
+            voice=excluded.voice,
+            note=excluded.note,
+            setcard_message_id=excluded.setcard_message_id,
+            updated_at=excluded.updated_at
+        """,
+        (
+            int(guild_id),
+            int(user_id),
+            (card.get("embark_id") or "").strip(),
+            _json_dumps(card.get("orientation") or []),
+            (card.get("experience") or "").strip(),
+            (card.get("platform") or "").strip(),
+            (card.get("network") or "").strip(),
+            (card.get("age_group") or "").strip(),
+            (card.get("voice") or "").strip(),
+            (card.get("note") or "").strip(),
+            int(card["setcard_message_id"]) if card.get("setcard_message_id") else None,
+            created_at,
+            updated_at,
+        ),
+    )
 
 async def upsert_card(guild_id: int, user_id: int, card: dict) -> None:
-    async with _db_lock:
-        await _db_run(_upsert_card_sync, guild_id, user_id, card)
-
-def _delete_card_sync(guild_id: int, user_id: int) -> dict | None:
-    conn = _db_connect()
-    try:
-        row = conn.execute(
-            "SELECT * FROM setcards WHERE guild_id=? AND user_id=?",
-            (int(guild_id), int(user_id)),
-        ).fetchone()
-        if not row:
-            return None
-        card = _row_to_card(row)
-        conn.execute(
-            "DELETE FROM setcards WHERE guild_id=? AND user_id=?",
-            (int(guild_id), int(user_id)),
-        )
-        conn.commit()
-        return card
-    finally:
-        conn.close()
+    await _db_run(_upsert_card_sync, guild_id, user_id, card)
+
+def _delete_card_sync(conn: sqlite3.Connection, guild_id: int, user_id: int) -> dict | None:
+    row = conn.execute(
+        "SELECT * FROM setcards WHERE guild_id=? AND user_id=?",
+        (int(guild_id), int(user_id)),
+    ).fetchone()
+    if not row:
+        return None
+    card = _row_to_card(row)
+    conn.execute(
+        "DELETE FROM setcards WHERE guild_id=? AND user_id=?",
+        (int(guild_id), int(user_id)),
+    )
+    return card
 
 async def delete_card(guild_id: int, user_id: int) -> dict | None:
-    async with _db_lock:
-        return await _db_run(_delete_card_sync, guild_id, user_id)
+    return await _db_run(_delete_card_sync, guild_id, user_id)
 
-def _list_cards_in_guild_sync(guild_id: int) -> list[dict]:
-    conn = _db_connect()
-    try:
-        rows = conn.execute(
-            "SELECT * FROM setcards WHERE guild_id=? ORDER BY updated_at DESC",
-            (int(guild_id),),
-        ).fetchall()
-        return [_row_to_card(r) for r in rows]
-    finally:
-        conn.close()
+def _list_cards_in_guild_sync(conn: sqlite3.Connection, guild_id: int) -> list[dict]:
+    rows = conn.execute(
+        "SELECT * FROM setcards WHERE guild_id=? ORDER BY updated_at DESC",
+        (int(guild_id),),
+    ).fetchall()
+    return [_row_to_card(r) for r in rows]
 
 async def list_cards_in_guild(guild_id: int) -> list[dict]:
-    async with _db_lock:
-        return await _db_run(_list_cards_in_guild_sync, guild_id)
+    return await _db_run(_list_cards_in_guild_sync, guild_id)
 
 # ============================================================
 # EMBEDS + CHANNEL POSTING
@@ -0,0 +1,616 @@
+# modules/storage.py
+import os
+import time
+import queue
+import asyncio
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from modules import migrations
+
+logger = logging.getLogger("shani-bot")
+
+# ============================================================
+# PATHS / DB
+# ============================================================
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # project root
+DATA_DIR = os.path.join(BASE_DIR, "data")
+DB_PATH = os.path.join(DATA_DIR, "setcards.db")
+
+DB_QUEUE_WARN_SIZE = 200
+WRITE_BEHIND_FLUSH_SECONDS = 5.0
+
+# ============================================================
+# DB WORKER (eine Verbindung, ein Thread)
+# ============================================================
+class _DbWorker:
+    """Besitzt die einzige SQLite-Verbindung des Prozesses und arbeitet Jobs der Reihe nach ab.
+
+    Jeder Job läuft als eigene Transaktion (commit bei Erfolg, rollback bei Fehler).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self.jobs_done = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="shani-db", daemon=True)
+            self._thread.start()
+
+    def _open(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        migrations.migrate(conn)
+        return conn
+
+    def _run(self) -> None:
+        conn = self._open()
+        logger.info(f"DB-Worker gestartet ({self.path})")
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                func, args, fut, loop = item
+                try:
+                    with conn:
+                        result = func(conn, *args)
+                except BaseException as e:
+                    loop.call_soon_threadsafe(_resolve, fut, None, e)
+                else:
+                    loop.call_soon_threadsafe(_resolve, fut, result, None)
+                self.jobs_done += 1
+        finally:
+            conn.close()
+            logger.info("DB-Worker beendet")
+
+    async def run(self, func, *args):
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._queue.put((func, args, fut, loop))
+        depth = self._queue.qsize()
+        if depth >= DB_QUEUE_WARN_SIZE:
+            logger.warning(f"DB-Queue staut sich: {depth} Jobs offen")
+        return await fut
+
+    def close(self, timeout: float = 10.0) -> None:
+        if not self._thread or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+def _resolve(fut: asyncio.Future, result, error) -> None:
+    if fut.done():
+        return
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(result)
+
+_worker = _DbWorker(DB_PATH)
+
+async def _db_run(func, *args):
+    """Führt func(conn, *args) im DB-Thread aus."""
+    return await _worker.run(func, *args)
+
+async def close_db() -> None:
+    await stop_write_behind()
+    await asyncio.to_thread(_worker.close)
+
+def db_stats() -> dict:
+    return {"queue": _worker.queue_depth(), "jobs": _worker.jobs_done}
+
+# ============================================================
+# GUILD CONFIG CACHE (write-through)
+# ============================================================
+# guild_id -> komplette guild_settings-Zeile ({} = Guild hat noch keine Zeile)
+_cfg_cache: dict[int, dict] = {}
+# Wird bei jedem Schreibzugriff erhöht, damit ein parallel laufender
+# Lesezugriff keinen veralteten Stand mehr in den Cache schreibt.
+_cfg_gen: dict[int, int] = {}
+_cfg_stats = {"hits": 0, "misses": 0}
+
+def _bump_gen(guild_id: int) -> None:
+    _cfg_gen[guild_id] = _cfg_gen.get(guild_id, 0) + 1
+
+# Werden nach jeder Config-Änderung mit (guild_id, cfg) aufgerufen (z.B. Poll-Scheduler)
+_cfg_listeners: list = []
+
+def add_cfg_listener(callback) -> None:
+    if callback not in _cfg_listeners:
+        _cfg_listeners.append(callback)
+
+def remove_cfg_listener(callback) -> None:
+    if callback in _cfg_listeners:
+        _cfg_listeners.remove(callback)
+
+def _cache_store(guild_id: int, row: dict) -> None:
+    """Legt die frisch geschriebene Zeile in den Cache und pflegt den Feature-Index."""
+    _bump_gen(guild_id)
+    _cfg_cache[guild_id] = row
+    _reindex(guild_id)
+    for callback in list(_cfg_listeners):
+        try:
+            callback(guild_id, dict(row))
+        except Exception as e:
+            logger.error(f"Config-Listener {callback} fehlgeschlagen: {e}")
+
+def guild_cfg_cache_stats() -> dict:
+    hits = _cfg_stats["hits"]
+    misses = _cfg_stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "size": len(_cfg_cache),
+        "hit_rate": (hits / total) if total else 0.0,
+    }
+
+def invalidate_guild_cfg(guild_id: int | None = None) -> None:
+    global _cfg_preloaded
+    if guild_id is None:
+        for gid in list(_cfg_cache):
+            _bump_gen(gid)
+        _cfg_cache.clear()
+        _cfg_preloaded = False
+        for members in _feature_index.values():
+            members.clear()
+        return
+    _bump_gen(int(guild_id))
+    _cfg_cache.pop(int(guild_id), None)
+
+# ============================================================
+# FEATURE INDEX (welche Guild nutzt was)
+# ============================================================
+FEATURES = {
+    # Twitch/YouTube: Hauptschalter der Guild, die Kanäle selbst stehen in subscriptions
+    "twitch": lambda cfg: bool(cfg.get("twitch_enabled")),
+    "youtube": lambda cfg: bool(cfg.get("youtube_enabled")),
+    "autovoice": lambda cfg: bool(cfg.get("voice_category_id")),
+    "setcards": lambda cfg: bool(cfg.get("setcard_channel_id")),
+}
+_feature_index: dict[str, set[int]] = {name: set() for name in FEATURES}
+# Erst nach preload_guild_cfgs() ist der Index vollständig
+_cfg_preloaded = False
+
+def _reindex(guild_id: int) -> None:
+    cfg = _cfg_cache.get(guild_id) or {}
+    for name, check in FEATURES.items():
+        if check(cfg):
+            _feature_index[name].add(guild_id)
+        else:
+            _feature_index[name].discard(guild_id)
+
+def feature_guilds(feature: str) -> set[int] | None:
+    """Guild-IDs mit aktivem Feature, oder None solange noch nicht vorgeladen wurde."""
+    if not _cfg_preloaded:
+        return None
+    return set(_feature_index[feature])
+
+def guild_has_feature(guild_id: int, feature: str) -> bool:
+    # Vor dem Preload lieber "ja" sagen, der Aufrufer prüft dann die Config selbst
+    if not _cfg_preloaded:
+        return True
+    return int(guild_id) in _feature_index[feature]
+
+async def preload_guild_cfgs() -> int:
+    """Lädt alle guild_settings-, subscriptions- und subscription_state-Zeilen in den Speicher."""
+    global _cfg_preloaded, _subs_loaded
+    gens = dict(_cfg_gen)
+    start = time.perf_counter()
+
+    def _load(conn):
+        cfg_rows = [dict(r) for r in conn.execute("SELECT * FROM guild_settings").fetchall()]
+        sub_rows = [dict(r) for r in conn.execute("SELECT * FROM subscriptions").fetchall()]
+        state_rows = conn.execute(
+            f"SELECT subscription_id, {', '.join(POLLER_STATE_FIELDS)} FROM subscription_state"
+        ).fetchall()
+        return cfg_rows, sub_rows, [dict(r) for r in state_rows]
+    cfg_rows, sub_rows, state_rows = await _db_run(_load)
+
+    for row in cfg_rows:
+        gid = int(row["guild_id"])
+        # Was seit dem Start der Abfrage geschrieben wurde, ist aktueller
+        if _cfg_gen.get(gid, 0) != gens.get(gid, 0):
+            continue
+        _cfg_cache[gid] = row
+    for row in sub_rows:
+        _subs.setdefault(int(row["id"]), row)
+    _subs_loaded = True
+    for row in state_rows:
+        _state.setdefault(int(row.pop("subscription_id")), row)
+
+    for gid in list(_cfg_cache):
+        _reindex(gid)
+    _cfg_preloaded = True
+
+    counts = ", ".join(f"{name}={len(members)}" for name, members in _feature_index.items())
+    logger.info(
+        f"Guild-Configs vorgeladen: {len(cfg_rows)} Zeilen, {len(sub_rows)} Abos, {len(state_rows)} States "
+        f"in {(time.perf_counter() - start) * 1000:.1f} ms ({counts})"
+    )
+    return len(cfg_rows)
+
+# ============================================================
+# GUILD CONFIG API
+# ============================================================
+async def get_guild_cfg(guild_id: int) -> dict:
+    guild_id = int(guild_id)
+    cached = _cfg_cache.get(guild_id)
+    if cached is not None:
+        _cfg_stats["hits"] += 1
+        return dict(cached)
+
+    _cfg_stats["misses"] += 1
+    gen = _cfg_gen.get(guild_id, 0)
+
+    def _get(conn):
+        row = conn.execute("SELECT * FROM guild_settings WHERE guild_id = ?", (guild_id,)).fetchone()
+        return dict(row) if row else {}
+    cfg = await _db_run(_get)
+
+    if _cfg_gen.get(guild_id, 0) == gen:
+        _cfg_cache[guild_id] = cfg
+        _reindex(guild_id)
+    return dict(cfg)
+
+def peek_guild_cfg(guild_id: int) -> dict:
+    """Guild-Config nur aus dem Cache ({} falls nicht geladen), z.B. für synchrone Listener."""
+    return dict(_cfg_cache.get(int(guild_id)) or {})
+
+async def update_guild_cfg(guild_id: int, **kwargs) -> None:
+    guild_id = int(guild_id)
+
+    def _update(conn):
+        conn.execute("INSERT OR IGNORE INTO guild_settings (guild_id) VALUES (?)", (guild_id,))
+        if kwargs:
+            keys = list(kwargs.keys())
+            values = list(kwargs.values())
+            set_clause = ", ".join([f"{k} = ?" for k in keys])
+            conn.execute(f"UPDATE guild_settings SET {set_clause} WHERE guild_id = ?", values + [guild_id])
+        # Komplette Zeile zurückgeben (inkl. DB-Defaults), damit der Cache vollständig bleibt
+        return dict(conn.execute("SELECT * FROM guild_settings WHERE guild_id = ?", (guild_id,)).fetchone())
+    _cache_store(guild_id, await _db_run(_update))
+
+async def clear_guild_cfg_fields(guild_id: int, fields: list) -> None:
+    guild_id = int(guild_id)
+
+    def _clear(conn):
+        set_clause = ", ".join([f"{f} = NULL" for f in fields])
+        conn.execute(f"UPDATE guild_settings SET {set_clause} WHERE guild_id = ?", (guild_id,))
+        row = conn.execute("SELECT * FROM guild_settings WHERE guild_id = ?", (guild_id,)).fetchone()
+        return dict(row) if row else {}
+    _cache_store(guild_id, await _db_run(_clear))
+
+# ============================================================
+# SUBSCRIPTIONS (mehrere Streamer pro Guild)
+# ============================================================
+# Ein Abo = ein gefolgter Kanal (guild, provider, channel). Einstellungs-Spalten
+# mit NULL erben den Guild-Standard aus guild_settings. Alle Abos liegen im Speicher.
+SUBSCRIPTION_FIELDS = (
+    "announce_channel_id", "ping_role_id", "stable_checks",
+    "poll_seconds", "offline_grace_seconds", "enabled",
+    "suspended_at", "suspend_reason",
+)
+MAX_SUBSCRIPTIONS_PER_GUILD = 50  # pro Provider
+
+_subs: dict[int, dict] = {}
+_subs_loaded = False
+
+# Werden nach jeder Abo-Änderung mit (sub, removed) aufgerufen
+_sub_listeners: list = []
+
+def add_subscription_listener(callback) -> None:
+    if callback not in _sub_listeners:
+        _sub_listeners.append(callback)
+
+def remove_subscription_listener(callback) -> None:
+    if callback in _sub_listeners:
+        _sub_listeners.remove(callback)
+
+def _notify_sub(sub: dict, removed: bool) -> None:
+    for callback in list(_sub_listeners):
+        try:
+            callback(dict(sub), removed)
+        except Exception as e:
+            logger.error(f"Abo-Listener {callback} fehlgeschlagen: {e}")
+
+async def _ensure_subs_loaded() -> None:
+    global _subs_loaded
+    if _subs_loaded:
+        return
+
+    def _load(conn):
+        return [dict(r) for r in conn.execute("SELECT * FROM subscriptions").fetchall()]
+    for row in await _db_run(_load):
+        _subs.setdefault(int(row["id"]), row)
+    _subs_loaded = True
+
+def peek_subscriptions(guild_id: int | None = None, provider: str | None = None) -> list[dict]:
+    """Abos aus dem Speicher (vollständig erst nach preload_guild_cfgs)."""
+    return [
+        dict(sub) for sub in sorted(_subs.values(), key=lambda r: r["id"])
+        if (guild_id is None or sub["guild_id"] == int(guild_id))
+        and (provider is None or sub["provider"] == provider)
+    ]
+
+async def list_subscriptions(guild_id: int | None = None, provider: str | None = None) -> list[dict]:
+    await _ensure_subs_loaded()
+    return peek_subscriptions(guild_id, provider)
+
+def peek_subscription(sub_id: int) -> dict | None:
+    sub = _subs.get(int(sub_id))
+    return dict(sub) if sub else None
+
+async def find_subscription(guild_id: int, provider: str, channel: str) -> dict | None:
+    for sub in await list_subscriptions(guild_id, provider):
+        if sub["channel"] == channel:
+            return sub
+    return None
+
+async def add_subscription(guild_id: int, provider: str, channel: str, **fields) -> dict:
+    """Legt ein Abo an oder aktualisiert die Einstellungen eines bestehenden."""
+    guild_id = int(guild_id)
+    bad = set(fields) - set(SUBSCRIPTION_FIELDS)
+    if bad:
+        raise ValueError(f"Unbekannte Abo-Felder: {', '.join(sorted(bad))}")
+    await _ensure_subs_loaded()
+
+    def _add(conn):
+        conn.execute(
+            "INSERT OR IGNORE INTO subscriptions (guild_id, provider, channel, created_at) VALUES (?, ?, ?, ?)",
+            (guild_id, provider, channel, datetime.now(timezone.utc).isoformat()),
+        )
+        if fields:
+            set_clause = ", ".join(f"{k} = ?" for k in fields)
+            conn.execute(
+                f"UPDATE subscriptions SET {set_clause} WHERE guild_id = ? AND provider = ? AND channel = ?",
+                list(fields.values()) + [guild_id, provider, channel],
+            )
+        return dict(conn.execute(
+            "SELECT * FROM subscriptions WHERE guild_id = ? AND provider = ? AND channel = ?",
+            (guild_id, provider, channel),
+        ).fetchone())
+    sub = await _db_run(_add)
+    _subs[int(sub["id"])] = sub
+    _notify_sub(sub, removed=False)
+    return dict(sub)
+
+async def update_subscription(sub_id: int, **fields) -> dict | None:
+    sub = peek_subscription(sub_id)
+    if not sub:
+        return None
+    return await add_subscription(sub["guild_id"], sub["provider"], sub["channel"], **fields)
+
+async def remove_subscription(sub_id: int) -> bool:
+    sub_id = int(sub_id)
+    await _ensure_subs_loaded()
+
+    def _remove(conn):
+        conn.execute("DELETE FROM subscription_state WHERE subscription_id = ?", (sub_id,))
+        return conn.execute("DELETE FROM subscriptions WHERE id = ?", (sub_id,)).rowcount
+    removed = await _db_run(_remove)
+    sub = _subs.pop(sub_id, None)
+    _state.pop(sub_id, None)
+    _state_dirty.discard(sub_id)
+    if sub:
+        _notify_sub(sub, removed=True)
+    return bool(removed)
+
+async def remove_subscriptions(guild_id: int, provider: str) -> int:
+    subs = await list_subscriptions(guild_id, provider)
+    for sub in subs:
+        await remove_subscription(sub["id"])
+    return len(subs)
+
+def subscription_stats() -> dict:
+    counts: dict[str, int] = {}
+    for sub in _subs.values():
+        counts[sub["provider"]] = counts.get(sub["provider"], 0) + 1
+    return counts
+
+# ============================================================
+# LIVE-HISTORIE (Stream-Starts pro Kanal)
+# ============================================================
+LIVE_HISTORY_DAYS = 56
+
+async def record_live_start(provider: str, channel: str, started_at: float) -> None:
+    """Speichert einen Stream-Start und räumt Einträge älter als LIVE_HISTORY_DAYS weg."""
+    cutoff = started_at - LIVE_HISTORY_DAYS * 86400
+
+    def _record(conn):
+        conn.execute(
+            "INSERT OR IGNORE INTO live_history (provider, channel, started_at) VALUES (?, ?, ?)",
+            (provider, channel, float(started_at)),
+        )
+        conn.execute(
+            "DELETE FROM live_history WHERE provider = ? AND channel = ? AND started_at < ?",
+            (provider, channel, cutoff),
+        )
+    await _db_run(_record)
+
+async def load_live_history(provider: str) -> dict[str, list[float]]:
+    """Alle Stream-Starts eines Providers der letzten LIVE_HISTORY_DAYS Tage, nach Kanal."""
+    cutoff = time.time() - LIVE_HISTORY_DAYS * 86400
+
+    def _load(conn):
+        return conn.execute(
+            "SELECT channel, started_at FROM live_history WHERE provider = ? AND started_at >= ? ORDER BY started_at",
+            (provider, cutoff),
+        ).fetchall()
+    history: dict[str, list[float]] = {}
+    for channel, started_at in await _db_run(_load):
+        history.setdefault(channel, []).append(float(started_at))
+    return history
+
+# ============================================================
+# KANAL-ALIASE (z.B. YouTube-@handle -> UC-ID)
+# ============================================================
+async def save_channel_alias(provider: str, alias: str, channel_id: str, resolved_at: float) -> None:
+    def _save(conn):
+        conn.execute(
+            "INSERT INTO channel_aliases (provider, alias, channel_id, resolved_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(provider, alias) DO UPDATE SET channel_id=excluded.channel_id, resolved_at=excluded.resolved_at",
+            (provider, alias, channel_id, float(resolved_at)),
+        )
+    await _db_run(_save)
+
+async def load_channel_aliases(provider: str) -> dict[str, tuple[str, float]]:
+    """alias -> (channel_id, resolved_at) für einen Provider."""
+    def _load(conn):
+        return conn.execute(
+            "SELECT alias, channel_id, resolved_at FROM channel_aliases WHERE provider = ?", (provider,)
+        ).fetchall()
+    return {alias: (channel_id, float(resolved_at)) for alias, channel_id, resolved_at in await _db_run(_load)}
+
+# ============================================================
+# POLLER STATE (pro Abo, im Speicher gehalten)
+# ============================================================
+# Laufzeit-Felder der Live-Poller liegen in subscription_state (ein Eintrag pro Abo)
+# statt in guild_settings. Der Speicher ist maßgeblich; geänderte Zeilen werden
+# per Write-Behind alle WRITE_BEHIND_FLUSH_SECONDS in einer Transaktion geschrieben.
+POLLER_STATE_DEFAULTS = {
+    "last_check_ts": 0.0,
+    "last_seen_live_ts": 0.0,
+    "announced_this_stream": 0,
+    "last_live_message_id": None,
+    "scheduled_start": None,
+    "live_state": 0,
+    "live_hits": 0,
+    "off_hits": 0,
+    "live_changed_ts": 0.0,
+}
+POLLER_STATE_FIELDS = tuple(POLLER_STATE_DEFAULTS)
+
+_state: dict[int, dict] = {}
+_state_dirty: set[int] = set()
+_flush_task: asyncio.Task | None = None
+_flush_lock = asyncio.Lock()
+_wb_stats = {"queued": 0, "flushes": 0, "rows": 0}
+
+def _state_row(sub_id: int) -> tuple:
+    row = _state[sub_id]
+    return (sub_id,) + tuple(row[f] for f in POLLER_STATE_FIELDS)
+
+def _upsert_state_rows(conn: sqlite3.Connection, rows: list[tuple]) -> None:
+    cols = ", ".join(POLLER_STATE_FIELDS)
+    marks = ", ".join("?" for _ in POLLER_STATE_FIELDS)
+    updates = ", ".join(f"{f}=excluded.{f}" for f in POLLER_STATE_FIELDS)
+    # Nur für noch existierende Abos schreiben (ein Abo kann zwischenzeitlich gelöscht sein)
+    conn.executemany(
+        f"INSERT INTO subscription_state (subscription_id, {cols}) "
+        f"SELECT ?, {marks} WHERE EXISTS (SELECT 1 FROM subscriptions WHERE id = ?1) "
+        f"ON CONFLICT(subscription_id) DO UPDATE SET {updates}",
+        rows,
+    )
+
+async def get_poller_state(sub_id: int) -> dict:
+    sub_id = int(sub_id)
+    row = _state.get(sub_id)
+    if row is not None:
+        return dict(row)
+
+    def _get(conn):
+        r = conn.execute(
+            f"SELECT {', '.join(POLLER_STATE_FIELDS)} FROM subscription_state WHERE subscription_id = ?",
+            (sub_id,),
+        ).fetchone()
+        return dict(r) if r else dict(POLLER_STATE_DEFAULTS)
+    loaded = await _db_run(_get)
+    # Falls inzwischen jemand geschrieben hat, gilt der Speicherstand
+    row = _state.setdefault(sub_id, loaded)
+    return dict(row)
+
+def peek_poller_state(sub_id: int) -> dict:
+    """Poller-State ohne DB-Zugriff (Defaults, falls noch nicht geladen)."""
+    return dict(_state.get(int(sub_id)) or POLLER_STATE_DEFAULTS)
+
+def set_poller_state(sub_id: int, **fields) -> None:
+    """Ändert den Poller-State im Speicher; geschrieben wird verzögert (Write-Behind)."""
+    sub_id = int(sub_id)
+    _state.setdefault(sub_id, dict(POLLER_STATE_DEFAULTS)).update(fields)
+    _state_dirty.add(sub_id)
+    _wb_stats["queued"] += 1
+    _ensure_flush_task()
+
+async def save_poller_state(sub_id: int, **fields) -> None:
+    """Wie set_poller_state, schreibt aber sofort (für vom User ausgelöste Änderungen)."""
+    sub_id = int(sub_id)
+    _state.setdefault(sub_id, dict(POLLER_STATE_DEFAULTS)).update(fields)
+    _state_dirty.discard(sub_id)
+    await _db_run(_upsert_state_rows, [_state_row(sub_id)])
+
+async def reset_poller_state(sub_id: int) -> None:
+    _state[int(sub_id)] = dict(POLLER_STATE_DEFAULTS)
+    await save_poller_state(sub_id)
+
+def _ensure_flush_task() -> None:
+    global _flush_task
+    if _flush_task and not _flush_task.done():
+        return
+    _flush_task = asyncio.get_running_loop().create_task(_flush_loop())
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(WRITE_BEHIND_FLUSH_SECONDS)
+        try:
+            await flush_poller_state()
+        except Exception as e:
+            logger.error(f"Write-Behind Flush fehlgeschlagen: {e}")
+
+async def flush_poller_state() -> int:
+    """Schreibt alle geänderten State-Zeilen in einer Transaktion. Gibt die Anzahl Zeilen zurück."""
+    async with _flush_lock:
+        if not _state_dirty:
+            return 0
+        keys = list(_state_dirty)
+        _state_dirty.clear()
+        rows = [_state_row(k) for k in keys]
+        try:
+            await _db_run(_upsert_state_rows, rows)
+        except Exception:
+            _state_dirty.update(keys)
+            raise
+
+        _wb_stats["flushes"] += 1
+        _wb_stats["rows"] += len(rows)
+        return len(rows)
+
+async def stop_write_behind() -> None:
+    global _flush_task
+    if _flush_task and not _flush_task.done():
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+    _flush_task = None
+    try:
+        await flush_poller_state()
+    except Exception as e:
+        logger.error(f"Write-Behind Flush beim Beenden fehlgeschlagen: {e}")
+
+def write_behind_stats() -> dict:
+    return {
+        "pending": len(_state_dirty),
+        "states": len(_state),
+        **_wb_stats,
+    }
@@ -1,13 +1,21 @@
 import re
-import html
 import time
+import asyncio
 import logging
-import aiohttp
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
 from datetime import datetime, timezone
 
+from modules.scheduler import (
+    PollScheduler, ChannelFanout, ConfirmTracker, NegativeCache, WarmupStagger, LIVE_CONFIRM_SECONDS, NOT_FOUND_SUSPEND_AFTER,
+)
+from modules.adaptive import AdaptivePoller
+from modules.webhooks import add_push_listener, remove_push_listener, push_covered, WEBHOOK_FALLBACK_POLL_SECONDS
+from modules import webclient
+from modules import livemeta
+from modules.twitchstatus import make_status_batcher, twitch_exists, TWITCH_STATUS_PREFETCH_SECONDS
+
 logger = logging.getLogger("shani-bot")
 
 # ============================================================
@@ -15,8 +23,15 @@ logger = logging.getLogger("shani-bot")
 # ============================================================
 TWITCH_DEFAULT_POLL_SECONDS = 90
 TWITCH_OFFLINE_GRACE_SECONDS_DEFAULT = 300  # 5 Minuten
+STATUS_MAX_LINES = 20  # Streamer-Zeilen in /twitchlive_status
+STATUS_MAX_CHARS = 2000  # Discord-Limit pro Nachricht
+STATUS_MORE_RESERVE = 40  # Platz für die "… und N weitere"-Zeile
+
+def discord_len(text: str) -> int:
+    """Länge so, wie Discord sie zählt (UTF-16-Einheiten, Emojis zählen doppelt)."""
+    return len(text.encode("utf-16-le")) // 2
 
-# --- Twitch Runtime State ---
+# --- Twitch Runtime State (pro Abo-ID) ---
 twitch_live_state: dict[int, bool] = {}
 twitch_live_hits: dict[int, int] = {}
 twitch_off_hits: dict[int, int] = {}
@@ -39,44 +54,44 @@ def extract_twitch_channel(value: str) -> str:
     v = re.sub(r"[^a-zA-Z0-9_]", "", v)
     return v.lower()
 
-async def fetch_twitch_page(session: aiohttp.ClientSession, twitch_channel: str):
+TWITCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7",
+    "Referer": "https://www.google.com/"
+}
+
+async def fetch_twitch_meta(twitch_channel: str) -> dict | None:
+    """Holt die Live-Metadaten eines Kanals (None = Seite nicht erreichbar).
+
+    Existiert der Kanal nicht, enthält das Ergebnis not_found=True.
+    """
     url = f"https://www.twitch.tv/{twitch_channel}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept-Language": "de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7",
-        "Referer": "https://www.google.com/"
-    }
+    scanner = livemeta.MarkerScanner("twitch")
     try:
-        async with session.get(url, headers=headers, timeout=15) as resp:
-            if resp.status == 200:
-                return await resp.text()
-            return None
+        if livemeta.LIVE_FETCH_MODE == "full":
+            status, html_text = await livemeta.fetch_page(url, TWITCH_HEADERS)
+        else:
+            status, html_text = await livemeta.stream_scan(url, TWITCH_HEADERS, scanner), None
+    except webclient.HostUnavailable:
+        return None
     except Exception as e:
-        logger.error(f"fetch_twitch_page error for {twitch_channel}: {e}")
+        livemeta.count_error()
+        logger.error(f"fetch_twitch_meta error for {twitch_channel}: {e}")
         return None
 
-def parse_twitch_meta(html_text: str) -> dict:
-    meta = {"is_live": False, "avatar": None, "game": None, "title": None}
-
-    if re.search(r'"isLiveBroadcast"\s*:\s*false', html_text, re.IGNORECASE) or re.search(r'"isLive"\s*:\s*false', html_text, re.IGNORECASE):
-        meta["is_live"] = False
-    elif re.search(r'"isLiveBroadcast"\s*:\s*true', html_text, re.IGNORECASE) or re.search(r'"isLive"\s*:\s*true', html_text, re.IGNORECASE):
-        meta["is_live"] = True
+    if status in livemeta.NOT_FOUND_STATUSES:
+        return livemeta.not_found_meta()
+    if status != 200:
+        return None
+    if html_text is not None:
+        meta = await livemeta.run_parse(livemeta.parse_twitch, html_text)
     else:
-        meta["is_live"] = False
-
-    m = re.search(r'"profileImageURL"\s*:\s*"([^"]+)"', html_text, re.IGNORECASE)
-    if m:
-        meta["avatar"] = m.group(1).replace("\\/", "/")
-
-    t = re.search(r'"title"\s*:\s*"([^"]+)"', html_text, re.IGNORECASE)
-    if t:
-        meta["title"] = html.unescape(t.group(1))
-
-    g = re.search(r'"gameName"\s*:\s*"([^"]+)"', html_text, re.IGNORECASE)
-    if g:
-        meta["game"] = html.unescape(g.group(1))
-
+        meta = livemeta.build_twitch_meta(scanner.found)
+    # Twitch liefert auch für unbekannte Logins 200. Fehlende Kanal-Daten heißen nur
+    # "verdächtig"; als nicht gefunden zählt erst ein GQL-Ergebnis user: null.
+    if not meta["is_live"] and not meta["avatar"] and not meta["title"] and twitch_exists:
+        if await twitch_exists.login_missing(twitch_channel):
+            return livemeta.not_found_meta()
     return meta
 
 def build_watch_view(twitch_channel: str) -> discord.ui.View:
@@ -111,6 +126,64 @@ def build_offline_embed(twitch_channel: str, meta: dict) -> discord.Embed:
     e.set_footer(text="Raiders Cache • Twitch Alert")
     return e
 
+# ============================================================
+# ABOS (mehrere Streamer pro Guild)
+# ============================================================
+SUB_OVERRIDE_FIELDS = ("announce_channel_id", "ping_role_id", "stable_checks", "poll_seconds", "offline_grace_seconds")
+
+def effective_cfg(cfg: dict, sub: dict) -> dict:
+    """Guild-Config, überlagert mit den Werten eines Abos (NULL im Abo = Guild-Standard)."""
+    eff = dict(cfg)
+    eff["twitch_channel"] = sub["channel"]
+    for field in SUB_OVERRIDE_FIELDS:
+        if sub.get(field) is not None:
+            eff[f"twitch_{field}"] = sub[field]
+    return eff
+
+def sub_is_active(cfg: dict, sub: dict) -> bool:
+    return bool(
+        cfg.get("twitch_enabled") and sub.get("enabled") and not sub.get("suspended_at")
+        and effective_cfg(cfg, sub).get("twitch_announce_channel_id")
+    )
+
+def clear_runtime_state(sub_id: int) -> None:
+    twitch_live_state.pop(sub_id, None)
+    twitch_live_hits.pop(sub_id, None)
+    twitch_off_hits.pop(sub_id, None)
+
+def restore_runtime_state(sub_id: int, state: dict, max_age: float) -> bool:
+    """Übernimmt die gespeicherte Zustandsmaschine eines Abos (nach einem Neustart)."""
+    if sub_id in twitch_live_state:
+        return False
+    twitch_live_state[sub_id] = bool(state["live_state"])
+    # Angefangene Bestätigungen zählen nur, wenn der letzte Poll nicht zu lange her ist
+    fresh = time.time() - float(state["last_check_ts"] or 0.0) <= max_age
+    twitch_live_hits[sub_id] = int(state["live_hits"] or 0) if fresh else 0
+    twitch_off_hits[sub_id] = int(state["off_hits"] or 0) if fresh else 0
+    return True
+
+async def primary_subscription(guild_id: int, cfg: dict) -> dict | None:
+    """Das Abo des Haupt-Kanals aus guild_settings, sonst das älteste Abo."""
+    from bot import list_subscriptions
+    subs = await list_subscriptions(guild_id, "twitch")
+    for sub in subs:
+        if sub["channel"] == cfg.get("twitch_channel"):
+            return sub
+    return subs[0] if subs else None
+
+async def set_primary_channel(guild_id: int, channel: str) -> dict:
+    """Ersetzt den Haupt-Kanal der Guild (erbt alle Guild-Standards)."""
+    from bot import get_guild_cfg, update_guild_cfg, find_subscription, add_subscription, remove_subscription
+    cfg = await get_guild_cfg(guild_id)
+    old = cfg.get("twitch_channel")
+    if old and old != channel:
+        old_sub = await find_subscription(guild_id, "twitch", old)
+        if old_sub:
+            await remove_subscription(old_sub["id"])
+            clear_runtime_state(old_sub["id"])
+    await update_guild_cfg(guild_id, twitch_channel=channel)
+    return await add_subscription(guild_id, "twitch", channel, suspended_at=None, suspend_reason=None)
+
 async def resolve_announce_channel(guild: discord.Guild, cfg: dict) -> discord.TextChannel | None:
     ch_id = int(cfg.get("twitch_announce_channel_id", 0))
     ch = guild.get_channel(ch_id)
@@ -125,8 +198,7 @@ class TwitchChannelModal(discord.ui.Modal, title="Twitch Kanal festlegen"):
 
     async def on_submit(self, interaction: discord.Interaction):
         channel = extract_twitch_channel(self.twitch_input.value)
-        from bot import update_guild_cfg
-        await update_guild_cfg(interaction.guild_id, twitch_channel=channel)
+        await set_primary_channel(interaction.guild_id, channel)
         await interaction.response.send_message(f"✅ Twitch-Kanal auf **{channel}** gesetzt.", ephemeral=True)
 
 class TwitchSettingsModal(discord.ui.Modal, title="Twitch Feineinstellungen"):
@@ -179,8 +251,9 @@ class TwitchSetupView(discord.ui.View):
 
     @staticmethod
     async def build_setup_embed(guild: discord.Guild):
-        from bot import get_guild_cfg
+        from bot import get_guild_cfg, list_subscriptions
         cfg = await get_guild_cfg(guild.id)
+        subs = await list_subscriptions(guild.id, "twitch")
         
         embed = discord.Embed(
             title="🟣 Twitch-Live Setup",
@@ -201,6 +274,7 @@ class TwitchSetupView(discord.ui.View):
             status_text = (
                 f"✅ **Aktiviert**\n"
                 f"• Kanal: **{cfg.get('twitch_channel', '—')}**\n"
+                f"• Streamer gesamt: **{len(subs)}** (weitere per /setup_twitchlive2)\n"
                 f"• Announce: {ch.mention if ch else '❌'}\n"
                 f"• Ping: {role.mention if role else '—'}\n"
                 f"• Stable: **{stable}** | Poll: **{poll}s** | Grace: **{grace}m**"
@@ -255,80 +329,314 @@ class TwitchSetupView(discord.ui.View):
 class TwitchCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.twitch_loop.start()
+        # Ein Scheduler-Eintrag pro Twitch-Kanal, egal wie viele Abos ihm folgen
+        self.scheduler = PollScheduler("twitch", self.poll_channel, retry_delay=TWITCH_DEFAULT_POLL_SECONDS)
+        self.fanout = ChannelFanout()
+        self.confirm = ConfirmTracker()
+        self.adaptive = AdaptivePoller("twitch")
+        self.negative = NegativeCache()
+        self.warmup = WarmupStagger()
+        # Optional: Sammelabfrage statt einer HTML-Seite pro Kanal (None = nur HTML)
+        self.status = make_status_batcher(self._upcoming_channels)
+        self.exists = twitch_exists
+        self._bootstrap_task: asyncio.Task | None = None
+
+    async def cog_load(self):
+        from bot import add_cfg_listener, add_subscription_listener
+        add_cfg_listener(self._on_cfg_change)
+        add_subscription_listener(self._on_sub_change)
+        add_push_listener("twitch", self.on_push)
+        self._bootstrap_task = asyncio.create_task(self._bootstrap())
 
     def cog_unload(self):
-        self.twitch_loop.cancel()
+        from bot import remove_cfg_listener, remove_subscription_listener
+        remove_cfg_listener(self._on_cfg_change)
+        remove_subscription_listener(self._on_sub_change)
+        remove_push_listener("twitch", self.on_push)
+        if self._bootstrap_task:
+            self._bootstrap_task.cancel()
+        self.scheduler.stop()
+
+    async def _bootstrap(self):
+        await self.bot.wait_until_ready()
+        from bot import load_live_history
+        self.adaptive.load(await load_live_history("twitch"))
+        self.scheduler.start()
+        # Überfällige Kanäle beim ersten Einplanen über ihr Intervall verteilen
+        self.warmup.active = True
+        try:
+            await self.sync_schedule()
+        finally:
+            self.warmup.active = False
+
+    # ---------- Scheduling ----------
+    def _schedule_channel(self, channel: str) -> None:
+        """Plant den Kanal zum frühesten fälligen Poll seiner Abos ein."""
+        from bot import peek_poller_state
+        subs = self.fanout.subscribers(channel)
+        if not subs:
+            self.scheduler.cancel(channel)
+            return
+        now = time.time()
+        delay = min(
+            float(peek_poller_state(sub_id)["last_check_ts"] or 0.0) + self.fanout.interval(sub_id) - now
+            for sub_id in subs
+        )
+        delay = self.warmup.delay(channel, delay, self.fanout.channel_interval(channel))
+        self.scheduler.schedule(channel, max(0.0, delay))
+
+    def _upcoming_channels(self) -> list[str]:
+        """Eingeplante Kanäle, die innerhalb des Vorabruf-Fensters fällig werden (früheste zuerst)."""
+        upcoming = []
+        for channel in self.scheduler.keys():
+            due_in = self.scheduler.due_in(channel)
+            if due_in is not None and due_in <= TWITCH_STATUS_PREFETCH_SECONDS:
+                upcoming.append((due_in, channel))
+        return [channel for _, channel in sorted(upcoming)]
+
+    def reschedule(self, sub: dict, cfg: dict) -> None:
+        if sub_is_active(cfg, sub):
+            eff = effective_cfg(cfg, sub)
+            poll_seconds = int(eff.get("twitch_poll_seconds") or TWITCH_DEFAULT_POLL_SECONDS)
+            channel = extract_twitch_channel(sub["channel"])
+            old = self.fanout.subscribe(sub["id"], channel, poll_seconds)
+            self._schedule_channel(channel)
+        else:
+            old = self.fanout.unsubscribe(sub["id"])
+        if old:
+            self._schedule_channel(old)
 
-    @tasks.loop(seconds=30)
-    async def twitch_loop(self):
-        if not self.bot.http_session:
-            self.bot.http_session = aiohttp.ClientSession()
+    def _on_cfg_change(self, guild_id: int, cfg: dict) -> None:
+        from bot import peek_subscriptions
+        for sub in peek_subscriptions(guild_id, "twitch"):
+            self.reschedule(sub, cfg)
 
-        from bot import get_guild_cfg, update_guild_cfg
+    def _on_sub_change(self, sub: dict, removed: bool) -> None:
+        if sub["provider"] != "twitch":
+            return
+        if removed:
+            old = self.fanout.unsubscribe(sub["id"])
+            if old:
+                self._schedule_channel(old)
+            clear_runtime_state(sub["id"])
+            self.confirm.forget(sub["id"])
+            self._forget_channel(old or extract_twitch_channel(sub["channel"]))
+            return
+        from bot import peek_guild_cfg
+        self.reschedule(sub, peek_guild_cfg(sub["guild_id"]))
+
+    def _forget_channel(self, channel: str) -> None:
+        """Lernstand eines Kanals verwerfen, sobald ihm kein Abo (auch kein pausiertes) mehr folgt."""
+        from bot import peek_subscriptions
+        if not any(extract_twitch_channel(sub["channel"]) == channel for sub in peek_subscriptions(provider="twitch")):
+            self.adaptive.forget(channel)
+
+    async def sync_schedule(self) -> None:
+        """Gleicht die eingeplanten Kanäle mit allen Twitch-Abos ab."""
+        from bot import get_guild_cfg, get_poller_state, list_subscriptions
+
+        subs = await list_subscriptions(provider="twitch")
+        for sub_id in self.fanout.all_subscribers() - {sub["id"] for sub in subs}:
+            old = self.fanout.unsubscribe(sub_id)
+            if old:
+                self._schedule_channel(old)
+        for sub in subs:
+            state = await get_poller_state(sub["id"])
+            cfg = await get_guild_cfg(sub["guild_id"])
+            poll_seconds = int(effective_cfg(cfg, sub).get("twitch_poll_seconds") or TWITCH_DEFAULT_POLL_SECONDS)
+            if restore_runtime_state(sub["id"], state, 2 * poll_seconds):
+                self.warmup.restored += 1
+            self.reschedule(sub, cfg)
+
+    # ---------- Poll ----------
+    async def poll_channel(self, channel: str) -> float | None:
+        """Holt einen Kanal einmal und verteilt das Ergebnis an alle Abos dieses Kanals."""
+        from bot import set_poller_state
+
+        subs = self.fanout.subscribers(channel)
+        if not subs:
+            return None
+        poll_seconds = self.fanout.channel_interval(channel)
 
-        for guild in self.bot.guilds:
-            cfg = await get_guild_cfg(guild.id)
-            if not cfg.get("twitch_enabled"):
-                continue
-            if "twitch_channel" not in cfg or "twitch_announce_channel_id" not in cfg:
-                continue
+        now = time.time()
+        for sub_id in subs:
+            set_poller_state(sub_id, last_check_ts=now)
 
-            poll_seconds = int(cfg.get("twitch_poll_seconds", TWITCH_DEFAULT_POLL_SECONDS))
-            last_check = float(cfg.get("twitch_last_check_ts", 0.0))
-            now = time.time()
-            if (now - last_check) < poll_seconds:
+        try:
+            meta = await self.fetch_meta(channel)
+            if meta is None:
+                return poll_seconds
+        except Exception as e:
+            logger.error(f"[twitch:{channel}] Twitch fetch error: {e}")
+            return poll_seconds
+        if meta.get("not_found"):
+            return await self.channel_not_found(channel, subs, poll_seconds)
+        self.negative.clear(channel)
+        twitch_meta_cache[channel] = meta
+        await self._observe(channel, meta["is_live"], now)
+
+        confirming = await self.dispatch_meta(channel, subs, meta, now)
+        if confirming and LIVE_CONFIRM_SECONDS > 0:
+            # Zustand gekippt -> schnell nachprüfen statt ein volles Intervall zu warten
+            self.confirm.probes += 1
+            return self.confirm.delay(poll_seconds)
+        live = meta["is_live"] or any(twitch_live_state.get(sub_id) for sub_id in subs)
+        interval = self.adaptive.next_interval(channel, poll_seconds, now, live)
+        if not live and push_covered("twitch", channel):
+            # Start kommt per Push, Polling nur noch als Fallback
+            interval = max(interval, WEBHOOK_FALLBACK_POLL_SECONDS)
+        return interval
+
+    async def fetch_meta(self, channel: str) -> dict | None:
+        """Status über den Sammel-Provider, sonst (oder ohne Antwort) per HTML-Seite."""
+        if self.status:
+            meta = await self.status.get(channel)
+            if meta is not None:
+                return meta
+            self.status.fallbacks += 1
+        return await fetch_twitch_meta(channel)
+
+    async def channel_not_found(self, channel: str, subs: set[int], poll_seconds: float) -> float | None:
+        """Kanal existiert (nicht mehr): Abstand verdoppeln, nach NOT_FOUND_SUSPEND_AFTER Treffern pausieren."""
+        misses = self.negative.miss(channel)
+        if misses < NOT_FOUND_SUSPEND_AFTER:
+            logger.info(f"[twitch:{channel}] Kanal nicht gefunden ({misses}/{NOT_FOUND_SUSPEND_AFTER})")
+            return self.negative.backoff(channel, poll_seconds)
+
+        from bot import get_guild_cfg, peek_subscription, update_subscription
+        logger.warning(f"[twitch:{channel}] {misses}x nicht gefunden - Abos werden pausiert")
+        self.negative.clear(channel)
+        for sub_id in subs:
+            sub = peek_subscription(sub_id)
+            if not sub:
                 continue
-            
-            await update_guild_cfg(guild.id, twitch_last_check_ts=now)
-
-            stable = int(cfg.get("twitch_stable_checks", 2))
-            offline_grace = int(cfg.get("twitch_offline_grace_seconds", TWITCH_OFFLINE_GRACE_SECONDS_DEFAULT))
-
-            twitch_channel = cfg["twitch_channel"]
+            await update_subscription(sub_id, suspended_at=time.time(), suspend_reason="not_found")
+            self.negative.suspended += 1
+            guild = self.bot.get_guild(sub["guild_id"])
+            if guild:
+                cfg = await get_guild_cfg(sub["guild_id"])
+                await self.post_suspended(guild, effective_cfg(cfg, sub), misses)
+        return None
 
+    async def _observe(self, channel: str, is_live: bool, now: float) -> None:
+        from bot import record_live_start
+        if self.adaptive.observe(channel, is_live, now):
             try:
-                html_text = await fetch_twitch_page(self.bot.http_session, twitch_channel)
-                if html_text is None:
-                    continue
-                meta = parse_twitch_meta(html_text)
+                await record_live_start("twitch", channel, now)
             except Exception as e:
-                logger.error(f"[{guild.name}] Twitch fetch error: {e}")
-                continue
+                logger.error(f"[twitch:{channel}] Live-Historie konnte nicht gespeichert werden: {e}")
 
-            live_now = bool(meta.get("is_live", False))
-            prev_live = twitch_live_state.get(guild.id, False)
+    async def dispatch_meta(self, channel: str, subs: set[int], meta: dict, now: float, authoritative: bool = False) -> bool:
+        """Gibt ein Ergebnis an alle Abos des Kanals. True = mindestens ein Abo wartet auf Bestätigung."""
+        from bot import get_guild_cfg, peek_subscription
 
-            if live_now:
-                twitch_live_hits[guild.id] = twitch_live_hits.get(guild.id, 0) + 1
-                twitch_off_hits[guild.id] = 0
-            else:
-                twitch_off_hits[guild.id] = twitch_off_hits.get(guild.id, 0) + 1
-                twitch_live_hits[guild.id] = 0
-
-            if live_now:
-                await update_guild_cfg(guild.id, twitch_last_seen_live_ts=now)
-
-            announced = bool(cfg.get("twitch_announced_this_stream", False))
-            last_seen_live_ts = float(cfg.get("twitch_last_seen_live_ts", 0.0))
-
-            if (not announced) and (not prev_live) and live_now and twitch_live_hits[guild.id] >= stable:
-                twitch_live_state[guild.id] = True
-                await self.post_live(guild, cfg, meta)
-                await update_guild_cfg(guild.id, twitch_announced_this_stream=1)
+        confirming = False
+        for sub_id in subs:
+            sub = peek_subscription(sub_id)
+            if not sub:
                 continue
-
-            if announced and live_now:
-                twitch_live_state[guild.id] = True
-
-            if announced and prev_live and (not live_now) and twitch_off_hits[guild.id] >= stable:
-                offline_duration = now - last_seen_live_ts
-                if offline_duration >= offline_grace:
-                    twitch_live_state[guild.id] = False
-                    await self.edit_to_offline(guild, cfg, meta)
-                    await update_guild_cfg(guild.id, twitch_announced_this_stream=0)
-
-    async def post_live(self, guild: discord.Guild, cfg: dict, meta: dict) -> None:
+            guild = self.bot.get_guild(sub["guild_id"])
+            cfg = await get_guild_cfg(sub["guild_id"])
+            if not guild or not sub_is_active(cfg, sub):
+                continue
+            try:
+                confirming |= await self.apply_meta(guild, sub_id, effective_cfg(cfg, sub), meta, now, authoritative)
+            except Exception as e:
+                logger.error(f"[{guild.name}] Twitch update error ({channel}): {e}")
+        return confirming
+
+    async def on_push(self, login: str, is_live: bool | None) -> bool:
+        """EventSub-Push für einen Kanal. Gibt False zurück, wenn hier niemand dem Kanal folgt."""
+        channel = extract_twitch_channel(login)
+        subs = self.fanout.subscribers(channel)
+        if not subs:
+            return False
+        if is_live is None:
+            self.scheduler.schedule(channel, 0)
+            return True
+
+        now = time.time()
+        meta = None
+        if is_live:
+            # Titel/Spiel/Avatar stehen nicht im Event -> Seite einmal frisch holen
+            try:
+                meta = await self.fetch_meta(channel)
+            except Exception as e:
+                logger.warning(f"[twitch:{channel}] Meta zum Push nicht abrufbar: {e}")
+        if meta and meta.get("not_found"):
+            meta = None
+        meta = dict(meta or twitch_meta_cache.get(channel) or {})
+        meta["is_live"] = is_live
+        twitch_meta_cache[channel] = meta
+        await self._observe(channel, is_live, now)
+
+        # Signiertes Event -> ohne Stable-Checks übernehmen
+        await self.dispatch_meta(channel, subs, meta, now, authoritative=True)
+        self.scheduler.schedule(channel, self.fanout.channel_interval(channel), jitter=True)
+        return True
+
+    async def apply_meta(self, guild: discord.Guild, sub_id: int, cfg: dict, meta: dict, now: float,
+                         authoritative: bool = False) -> bool:
+        """Live/Offline-Zustandsmaschine eines Abos für ein Poll-Ergebnis.
+
+        Gibt True zurück, solange ein Zustandswechsel noch auf seine Stable-Checks wartet.
+        authoritative=True (Push-Event) erfüllt die Stable-Checks sofort.
+        """
+        from bot import get_poller_state, set_poller_state
+
+        state = await get_poller_state(sub_id)
+        stable = int(cfg.get("twitch_stable_checks", 2))
+        offline_grace = int(cfg.get("twitch_offline_grace_seconds", TWITCH_OFFLINE_GRACE_SECONDS_DEFAULT))
+
+        live_now = bool(meta.get("is_live", False))
+        prev_live = twitch_live_state.get(sub_id, False)
+
+        if live_now:
+            twitch_live_hits[sub_id] = twitch_live_hits.get(sub_id, 0) + 1
+            twitch_off_hits[sub_id] = 0
+        else:
+            twitch_off_hits[sub_id] = twitch_off_hits.get(sub_id, 0) + 1
+            twitch_live_hits[sub_id] = 0
+        if authoritative:
+            hits = twitch_live_hits if live_now else twitch_off_hits
+            hits[sub_id] = max(hits[sub_id], stable)
+
+        # Zähler mitschreiben, damit ein Neustart angefangene Bestätigungen nicht verliert
+        set_poller_state(sub_id, live_hits=twitch_live_hits[sub_id], off_hits=twitch_off_hits[sub_id])
+        if live_now:
+            set_poller_state(sub_id, last_seen_live_ts=now)
+
+        announced = bool(state["announced_this_stream"])
+        last_seen_live_ts = float(state["last_seen_live_ts"] or 0.0)
+
+        # Bestätigung: Ergebnis weicht vom gemeldeten Zustand ab, Schwelle noch nicht erreicht
+        going_live = (not announced) and (not prev_live) and live_now
+        going_off = announced and prev_live and (not live_now)
+        hits = twitch_live_hits[sub_id] if live_now else twitch_off_hits[sub_id]
+        pending = (going_live or going_off) and hits < stable
+        poll_seconds = int(cfg.get("twitch_poll_seconds") or TWITCH_DEFAULT_POLL_SECONDS)
+        self.confirm.track(sub_id, pending, going_live or going_off, now, (stable - 1) * poll_seconds)
+
+        if going_live and twitch_live_hits[sub_id] >= stable:
+            twitch_live_state[sub_id] = True
+            await self.post_live(guild, sub_id, cfg, meta)
+            set_poller_state(sub_id, announced_this_stream=1, live_state=1, live_changed_ts=now)
+            return False
+
+        if announced and live_now and not prev_live:
+            twitch_live_state[sub_id] = True
+            set_poller_state(sub_id, live_state=1)
+
+        if going_off and twitch_off_hits[sub_id] >= stable:
+            offline_duration = now - last_seen_live_ts
+            if offline_duration >= offline_grace:
+                twitch_live_state[sub_id] = False
+                await self.edit_to_offline(guild, sub_id, cfg, meta)
+                set_poller_state(sub_id, announced_this_stream=0, live_state=0, live_changed_ts=now)
+
+        return pending
+
+    async def post_live(self, guild: discord.Guild, sub_id: int, cfg: dict, meta: dict) -> None:
         text_channel = await resolve_announce_channel(guild, cfg)
         if not text_channel:
             return
@@ -347,15 +655,30 @@ class TwitchCog(commands.Cog):
             embed=build_live_embed(twitch_channel, meta),
             view=build_watch_view(twitch_channel)
         )
-        from bot import update_guild_cfg
-        await update_guild_cfg(guild.id, twitch_last_live_message_id=msg.id)
+        from bot import set_poller_state
+        set_poller_state(sub_id, last_live_message_id=msg.id)
 
-    async def edit_to_offline(self, guild: discord.Guild, cfg: dict, meta: dict) -> None:
+    async def post_suspended(self, guild: discord.Guild, cfg: dict, misses: int) -> None:
         text_channel = await resolve_announce_channel(guild, cfg)
         if not text_channel:
             return
+        try:
+            await text_channel.send(
+                f"⛔ Twitch-Kanal **{cfg['twitch_channel']}** wurde {misses}× in Folge nicht gefunden – "
+                f"Live-Alerts dafür sind pausiert.\n"
+                f"Namen prüfen und mit `/setup_twitchlive2` neu einrichten oder mit `/twitchlive_remove` entfernen."
+            )
+        except Exception as e:
+            logger.warning(f"[{guild.name}] Pausen-Hinweis fehlgeschlagen: {e}")
 
-        last_id = cfg.get("twitch_last_live_message_id")
+    async def edit_to_offline(self, guild: discord.Guild, sub_id: int, cfg: dict, meta: dict) -> None:
+        text_channel = await resolve_announce_channel(guild, cfg)
+        if not text_channel:
+            return
+
+        from bot import get_poller_state
+        state = await get_poller_state(sub_id)
+        last_id = state["last_live_message_id"]
         if not last_id:
             return
 
@@ -365,7 +688,7 @@ class TwitchCog(commands.Cog):
         except Exception as e:
             logger.warning(f"[{guild.name}] OFFLINE edit failed: {e}")
 
-    @app_commands.command(name="setup_twitchlive2", description="Twitch Live Alerts ohne API: genau 1 Live-Ping pro Stream.")
+    @app_commands.command(name="setup_twitchlive2", description="Twitch Live Alerts ohne API: genau 1 Live-Ping pro Stream. Mehrfach ausführen = mehrere Streamer.")
     @app_commands.checks.has_permissions(manage_guild=True)
     @app_commands.describe(
         twitch_channel_or_url="z.B. shordje ODER https://twitch.tv/shordje",
@@ -385,84 +708,140 @@ class TwitchCog(commands.Cog):
         poll_seconds: app_commands.Range[int, 30, 600] = 90,
         offline_grace_minutes: app_commands.Range[int, 0, 60] = 5
     ):
-        from bot import update_guild_cfg
-        await update_guild_cfg(
-            interaction.guild_id,
-            twitch_enabled=1,
-            twitch_channel=extract_twitch_channel(twitch_channel_or_url),
-            twitch_announce_channel_id=int(announce_channel.id),
-            twitch_ping_role_id=int(ping_role.id) if ping_role else None,
-            twitch_stable_checks=max(1, int(stable_checks)),
-            twitch_poll_seconds=max(30, int(poll_seconds)),
-            twitch_offline_grace_seconds=max(0, int(offline_grace_minutes) * 60),
-            twitch_last_live_message_id=None,
-            twitch_last_check_ts=0.0,
-            twitch_last_seen_live_ts=0.0,
-            twitch_announced_this_stream=0
+        from bot import (
+            get_guild_cfg, update_guild_cfg, reset_poller_state,
+            list_subscriptions, find_subscription, add_subscription, MAX_SUBSCRIPTIONS_PER_GUILD
         )
-
         gid = int(interaction.guild_id)
-        twitch_live_state[gid] = False
-        twitch_live_hits[gid] = 0
-        twitch_off_hits[gid] = 0
+        channel = extract_twitch_channel(twitch_channel_or_url)
+        cfg = await get_guild_cfg(gid)
+
+        existing = await find_subscription(gid, "twitch", channel)
+        if not existing and len(await list_subscriptions(gid, "twitch")) >= MAX_SUBSCRIPTIONS_PER_GUILD:
+            await interaction.response.send_message(
+                f"❌ Maximal **{MAX_SUBSCRIPTIONS_PER_GUILD}** Twitch-Streamer pro Server. Entferne erst einen mit /twitchlive_remove.",
+                ephemeral=True
+            )
+            return
+
+        settings = {
+            "announce_channel_id": int(announce_channel.id),
+            "ping_role_id": int(ping_role.id) if ping_role else None,
+            "stable_checks": max(1, int(stable_checks)),
+            "poll_seconds": max(30, int(poll_seconds)),
+            "offline_grace_seconds": max(0, int(offline_grace_minutes) * 60),
+        }
+        is_primary = not cfg.get("twitch_channel") or cfg.get("twitch_channel") == channel
+        if is_primary:
+            # Haupt-Kanal: Werte sind die Guild-Standards (wie bisher, auch im Setup-Panel änderbar)
+            await update_guild_cfg(gid, twitch_enabled=1, twitch_channel=channel, **{f"twitch_{k}": v for k, v in settings.items()})
+            sub = await add_subscription(gid, "twitch", channel, enabled=1, suspended_at=None, suspend_reason=None,
+                                         **{k: None for k in settings})
+        else:
+            await update_guild_cfg(gid, twitch_enabled=1)
+            sub = await add_subscription(gid, "twitch", channel, enabled=1, suspended_at=None, suspend_reason=None, **settings)
+
+        await reset_poller_state(sub["id"])
+        clear_runtime_state(sub["id"])
+        self.reschedule(sub, await get_guild_cfg(gid))
 
         await interaction.response.send_message(
-            "✅ Twitch Live-Alerts aktiviert (1 Live-Ping pro Stream).\n"
-            f"🟣 Twitch: **{extract_twitch_channel(twitch_channel_or_url)}**\n"
+            f"✅ Twitch Live-Alerts {'aktualisiert' if existing else 'aktiviert'} (1 Live-Ping pro Stream).\n"
+            f"🟣 Twitch: **{channel}**{' (Haupt-Kanal)' if is_primary else ''}\n"
             f"📢 Kanal: **#{announce_channel.name}**\n"
             f"{'🏷️ Ping: ' + ping_role.mention if ping_role else '🏷️ Ping: (keiner)'}\n"
             f"🔇 Stabil: **{stable_checks}** | ⏲️ Poll: **{poll_seconds}s** | 🧊 Offline-Grace: **{offline_grace_minutes} min**\n"
-            f"📌 OFFLINE: **LIVE-Post wird erst nach echtem Ende editiert**",
+            f"📌 OFFLINE: **LIVE-Post wird erst nach echtem Ende editiert**\n"
+            f"➕ Weitere Streamer: Befehl einfach mit einem anderen Kanal erneut ausführen.",
             ephemeral=True
         )
 
+    @app_commands.command(name="twitchlive_remove", description="Entfernt einen einzelnen Twitch-Streamer.")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @app_commands.describe(twitch_channel_or_url="z.B. shordje ODER https://twitch.tv/shordje")
+    async def twitchlive_remove(self, interaction: discord.Interaction, twitch_channel_or_url: str):
+        from bot import get_guild_cfg, clear_guild_cfg_fields, find_subscription, remove_subscription
+        gid = int(interaction.guild_id)
+        channel = extract_twitch_channel(twitch_channel_or_url)
+        sub = await find_subscription(gid, "twitch", channel)
+        if not sub:
+            await interaction.response.send_message(f"ℹ️ **{channel}** wird hier nicht verfolgt.", ephemeral=True)
+            return
+
+        await remove_subscription(sub["id"])
+        if (await get_guild_cfg(gid)).get("twitch_channel") == channel:
+            await clear_guild_cfg_fields(gid, ["twitch_channel"])
+        await interaction.response.send_message(f"🗑️ **{channel}** entfernt.", ephemeral=True)
+
     @app_commands.command(name="twitchlive_status", description="Zeigt Twitch-Konfiguration + aktuellen Status.")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def twitchlive_status(self, interaction: discord.Interaction):
-        from bot import get_guild_cfg
+        from bot import get_guild_cfg, get_poller_state, list_subscriptions
         cfg = await get_guild_cfg(interaction.guild_id)
-        if not cfg or not cfg.get("twitch_enabled"):
+        subs = await list_subscriptions(interaction.guild_id, "twitch")
+        if not cfg or not cfg.get("twitch_enabled") or not subs:
             await interaction.response.send_message("ℹ️ Twitch Live-Alerts sind nicht aktiviert.", ephemeral=True)
             return
 
-        announce_ch = interaction.guild.get_channel(int(cfg.get("twitch_announce_channel_id", 0)))
         role = interaction.guild.get_role(int(cfg["twitch_ping_role_id"])) if cfg.get("twitch_ping_role_id") else None
-
-        await interaction.response.send_message(
-            "✅ Twitch Status:\n"
-            f"🟣 Twitch: **{cfg.get('twitch_channel')}**\n"
-            f"📢 Kanal: **{('#' + announce_ch.name) if announce_ch else 'FEHLT (gelöscht?)'}**\n"
-            f"🏷️ Ping: **{role.name if role else '—'}**\n"
-            f"🔇 Stable: **{cfg.get('twitch_stable_checks', 2)}** | ⏲️ Poll: **{cfg.get('twitch_poll_seconds', 90)}s** | 🧊 Offline-Grace: **{int(cfg.get('twitch_offline_grace_seconds', 300))//60} min**\n"
-            f"🧾 Last message id: **{cfg.get('twitch_last_live_message_id') or '—'}**\n"
-            f"📣 Announced this stream: **{bool(cfg.get('twitch_announced_this_stream', False))}**\n"
-            f"🔴 Live-State (intern): **{'LIVE' if twitch_live_state.get(int(interaction.guild_id), False) else 'OFFLINE'}**",
-            ephemeral=True
+        header = (
+            f"✅ Twitch Status ({len(subs)} Streamer):\n"
+            f"🏷️ Standard-Ping: **{role.name if role else '—'}**\n"
+            f"🔇 Standard: Stable **{cfg.get('twitch_stable_checks', 2)}** | Poll **{cfg.get('twitch_poll_seconds', 90)}s** | Offline-Grace **{int(cfg.get('twitch_offline_grace_seconds', 300))//60} min**\n"
         )
+        # Zeilen nach Länge begrenzen, nicht nur nach Anzahl (sonst HTTP 400 über 2000 Zeichen)
+        budget = STATUS_MAX_CHARS - discord_len(header) - STATUS_MORE_RESERVE
+        lines = []
+        for sub in subs[:STATUS_MAX_LINES]:
+            eff = effective_cfg(cfg, sub)
+            state = await get_poller_state(sub["id"])
+            announce_ch = interaction.guild.get_channel(int(eff.get("twitch_announce_channel_id") or 0))
+            live = "🔴 LIVE" if twitch_live_state.get(sub["id"], False) else "⚫ OFFLINE"
+            if state["live_changed_ts"]:
+                live += f" seit <t:{int(state['live_changed_ts'])}:R>"
+            if sub.get("suspended_at"):
+                live = "⛔ PAUSIERT (Kanal nicht gefunden)"
+            line = (
+                f"🟣 **{sub['channel']}** → {('#' + announce_ch.name) if announce_ch else 'FEHLT (gelöscht?)'} | "
+                f"⏲️ {eff.get('twitch_poll_seconds', 90)}s | {live} | 📣 {bool(state['announced_this_stream'])}"
+            )
+            budget -= discord_len(line) + 1
+            if budget < 0:
+                break
+            lines.append(line)
+        if len(subs) > len(lines):
+            lines.append(f"… und **{len(subs) - len(lines)}** weitere")
+
+        await interaction.response.send_message(header + "\n".join(lines), ephemeral=True)
 
-    @app_commands.command(name="twitchlive_set_poll", description="Ändert die Abfragerate (Polling) für Twitch.")
+    @app_commands.command(name="twitchlive_set_poll", description="Ändert die Abfragerate (Polling) für alle Twitch-Streamer.")
     @app_commands.checks.has_permissions(manage_guild=True)
     @app_commands.describe(poll_seconds="Neue Abfragerate in Sekunden (min 30, empfohlen 90)")
     async def twitchlive_set_poll(self, interaction: discord.Interaction, poll_seconds: app_commands.Range[int, 30, 600] = 90):
-        from bot import get_guild_cfg, update_guild_cfg
+        from bot import get_guild_cfg, update_guild_cfg, list_subscriptions, update_subscription
         cfg = await get_guild_cfg(interaction.guild_id)
         if not cfg.get("twitch_enabled"):
             await interaction.response.send_message("ℹ️ Twitch Live-Alerts sind nicht aktiviert.", ephemeral=True)
             return
         await update_guild_cfg(interaction.guild_id, twitch_poll_seconds=int(poll_seconds))
+        for sub in await list_subscriptions(interaction.guild_id, "twitch"):
+            if sub.get("poll_seconds") is not None:
+                await update_subscription(sub["id"], poll_seconds=None)
         await interaction.response.send_message(f"✅ Polling-Rate gesetzt auf **{poll_seconds}s**.", ephemeral=True)
 
     @app_commands.command(name="twitchlive_test", description="Testet LIVE-Embed (funktioniert immer, auch wenn offline).")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def twitchlive_test(self, interaction: discord.Interaction):
-        from bot import get_guild_cfg, update_guild_cfg
+        from bot import get_guild_cfg, save_poller_state
         cfg = await get_guild_cfg(interaction.guild_id)
-        if not cfg.get("twitch_enabled"):
+        sub = await primary_subscription(interaction.guild_id, cfg)
+        if not cfg.get("twitch_enabled") or not sub:
             await interaction.response.send_message("ℹ️ Erst /setup_twitchlive2 ausführen.", ephemeral=True)
             return
 
         guild = interaction.guild
-        ch = await resolve_announce_channel(guild, cfg)
+        eff = effective_cfg(cfg, sub)
+        ch = await resolve_announce_channel(guild, eff)
         if not ch:
             await interaction.response.send_message("❌ Announce-Channel fehlt/ungültig.", ephemeral=True)
             return
@@ -470,10 +849,10 @@ class TwitchCog(commands.Cog):
         meta = {
             "title": "Test-Stream (nur Bot-Test)",
             "game": "ARC Raiders",
-            "avatar": (twitch_meta_cache.get(cfg["twitch_channel"], {}) or {}).get("avatar")
+            "avatar": (twitch_meta_cache.get(sub["channel"], {}) or {}).get("avatar")
         }
-        msg = await ch.send(embed=build_live_embed(cfg["twitch_channel"], meta), view=build_watch_view(cfg["twitch_channel"]))
-        await update_guild_cfg(guild.id, twitch_last_live_message_id=msg.id)
+        msg = await ch.send(embed=build_live_embed(sub["channel"], meta), view=build_watch_view(sub["channel"]))
+        await save_poller_state(sub["id"], last_live_message_id=msg.id)
         await interaction.response.send_message("🧪 Test gesendet (LIVE-Embed + Button).", ephemeral=True)
 
     @app_commands.command(name="twitchoffline_test", description="Testet OFFLINE-Edit (editiert den letzten LIVE-Post).")
@@ -481,34 +860,33 @@ class TwitchCog(commands.Cog):
     async def twitchoffline_test(self, interaction: discord.Interaction):
         from bot import get_guild_cfg
         cfg = await get_guild_cfg(interaction.guild_id)
-        if not cfg.get("twitch_enabled"):
+        sub = await primary_subscription(interaction.guild_id, cfg)
+        if not cfg.get("twitch_enabled") or not sub:
             await interaction.response.send_message("ℹ️ Erst /setup_twitchlive2 ausführen.", ephemeral=True)
             return
 
         guild = interaction.guild
-        meta = {"avatar": (twitch_meta_cache.get(cfg["twitch_channel"], {}) or {}).get("avatar")}
-        await self.edit_to_offline(guild, cfg, meta)
+        meta = {"avatar": (twitch_meta_cache.get(sub["channel"], {}) or {}).get("avatar")}
+        await self.edit_to_offline(guild, sub["id"], effective_cfg(cfg, sub), meta)
         await interaction.response.send_message("🧪 OFFLINE-Edit versucht (siehe #live).", ephemeral=True)
 
     @app_commands.command(name="twitchlive_disable", description="Deaktiviert Twitch Live-Alerts (Voice bleibt unangetastet!).")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def twitchlive_disable(self, interaction: discord.Interaction):
-        from bot import clear_guild_cfg_fields, update_guild_cfg
+        from bot import clear_guild_cfg_fields, update_guild_cfg, remove_subscriptions
         await clear_guild_cfg_fields(interaction.guild_id, [
             "twitch_enabled", "twitch_channel", "twitch_announce_channel_id", "twitch_ping_role_id",
-            "twitch_stable_checks", "twitch_poll_seconds", "twitch_offline_grace_seconds",
-            "twitch_last_live_message_id", "twitch_last_check_ts", "twitch_last_seen_live_ts",
-            "twitch_announced_this_stream"
+            "twitch_stable_checks", "twitch_poll_seconds", "twitch_offline_grace_seconds"
         ])
         await update_guild_cfg(interaction.guild_id, twitch_enabled=0)
-        
-        gid = int(interaction.guild_id)
-        twitch_live_state[gid] = False
-        twitch_live_hits[gid] = 0
-        twitch_off_hits[gid] = 0
-        await interaction.response.send_message("🛑 Twitch Live-Alerts wurden deaktiviert. (Auto-Voice bleibt aktiv)", ephemeral=True)
+        removed = await remove_subscriptions(interaction.guild_id, "twitch")
+        await interaction.response.send_message(
+            f"🛑 Twitch Live-Alerts wurden deaktiviert ({removed} Streamer entfernt). (Auto-Voice bleibt aktiv)",
+            ephemeral=True
+        )
 
     @setup_twitchlive2.error
+    @twitchlive_remove.error
     @twitchlive_status.error
     @twitchlive_set_poll.error
     @twitchlive_test.error
@@ -0,0 +1,261 @@
+# modules/twitchstatus.py
+import os
+import time
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from modules import webclient
+from modules.livemeta import not_found_meta
+
+logger = logging.getLogger("shani-bot")
+
+# ============================================================
+# TWITCH STATUS-PROVIDER (viele Kanäle pro Request)
+# ============================================================
+# html = jede Kanal-Seite einzeln scrapen (wie bisher), gql = Sammelabfrage
+TWITCH_STATUS_PROVIDER = os.getenv("TWITCH_STATUS_PROVIDER", "html").strip().lower()
+TWITCH_GQL_URL = os.getenv("TWITCH_GQL_URL", "https://gql.twitch.tv/gql")
+# Öffentliche Client-ID der Twitch-Webseite
+TWITCH_GQL_CLIENT_ID = os.getenv("TWITCH_GQL_CLIENT_ID", "kimne78kx3ncx6brgo4mv6wki5h1ko")
+# Kanäle, die in so vielen Sekunden ohnehin dran wären, fahren in einer Sammelabfrage mit
+TWITCH_STATUS_PREFETCH_SECONDS = max(0.0, float(os.getenv("TWITCH_STATUS_PREFETCH_SECONDS", "30")))
+# So lange wird auf weitere Anfragen gewartet, bevor eine Sammelabfrage rausgeht
+STATUS_BATCH_WINDOW_SECONDS = 0.25
+# HTML-Modus: Zeigt eine Kanalseite keinerlei Kanal-Daten, klärt eine einzelne
+# GQL-Abfrage, ob es den Login gibt (off = nie, dann pausiert nur 404/410)
+TWITCH_EXISTS_CHECK = os.getenv("TWITCH_EXISTS_CHECK", "gql").strip().lower() not in ("0", "off", "false", "no")
+# So lange gilt ein bestätigter Login als existent (keine erneute Abfrage)
+TWITCH_EXISTS_TTL_SECONDS = 24 * 3600
+
+GQL_STATUS_QUERY = """
+query ShaniStreamStatus($logins: [String!]) {
+  users(logins: $logins) {
+    login
+    profileImageURL(width: 300)
+    broadcastSettings { title }
+    stream { type game { name } }
+  }
+}
+"""
+
+class StatusProvider(ABC):
+    """Fragt den Live-Status vieler Twitch-Logins mit einem Request ab.
+
+    fetch() liefert pro Login ein Meta-Dict wie livemeta.build_twitch_meta
+    (bzw. not_found_meta()). Fehlt ein Login im Ergebnis, wird er per HTML geholt.
+    """
+
+    name = "?"
+    max_batch = 100
+
+    @abstractmethod
+    async def fetch(self, logins: list[str]) -> dict[str, dict]:
+        ...
+
+class GqlStatusProvider(StatusProvider):
+    """Twitchs GQL-Endpoint: eine users(logins: ...)-Abfrage für bis zu 100 Kanäle."""
+
+    name = "gql"
+    max_batch = 100
+
+    def __init__(self, url: str, client_id: str):
+        self.url = url
+        self.headers = {"Client-Id": client_id}
+
+    async def fetch(self, logins: list[str]) -> dict[str, dict]:
+        payload = {"operationName": "ShaniStreamStatus", "query": GQL_STATUS_QUERY, "variables": {"logins": logins}}
+        async with webclient.post(self.url, headers=self.headers, json=payload) as resp:
+            if resp.status != 200:
+                logger.warning(f"[twitch-gql] HTTP {resp.status} für {len(logins)} Kanäle")
+                return {}
+            body = await resp.json(content_type=None)
+        if isinstance(body, list):  # Batch-Antwort
+            body = body[0] if body else {}
+        users = ((body or {}).get("data") or {}).get("users")
+        if not isinstance(users, list) or len(users) != len(logins):
+            logger.warning(f"[twitch-gql] Unerwartete Antwort: {str((body or {}).get('errors') or body)[:200]}")
+            return {}
+        # users ist positionsgleich zu logins, unbekannte Logins kommen als null zurück
+        return {login: gql_user_meta(user) for login, user in zip(logins, users)}
+
+def gql_user_meta(user: dict | None) -> dict:
+    if not user:
+        return not_found_meta()
+    stream = user.get("stream") or {}
+    return {
+        "is_live": stream.get("type") == "live",
+        "avatar": user.get("profileImageURL"),
+        "game": (stream.get("game") or {}).get("name"),
+        "title": (user.get("broadcastSettings") or {}).get("title"),
+    }
+
+STATUS_PROVIDERS: dict[str, Callable[[], StatusProvider]] = {
+    "gql": lambda: GqlStatusProvider(TWITCH_GQL_URL, TWITCH_GQL_CLIENT_ID),
+}
+
+def register_status_provider(name: str, factory: Callable[[], StatusProvider]) -> None:
+    STATUS_PROVIDERS[name] = factory
+
+# ============================================================
+# SAMMELABFRAGE (Anfragen bündeln + Vorabruf fälliger Kanäle)
+# ============================================================
+class StatusBatcher:
+    """Bündelt get(login)-Aufrufe zu Sammelabfragen beim Provider.
+
+    Freie Plätze einer Abfrage werden mit Kanälen aufgefüllt, die upcoming()
+    als demnächst fällig meldet; deren Ergebnis wartet im Cache auf ihren Poll.
+    """
+
+    def __init__(self, provider: StatusProvider, upcoming: Callable[[], list[str]]):
+        self.provider = provider
+        self.upcoming = upcoming
+        self._cache: dict[str, tuple[float, dict]] = {}  # login -> (Abrufzeit, Meta)
+        self._waiting: dict[str, list[asyncio.Future]] = {}
+        self._flush_task: asyncio.Task | None = None
+        self.requests = 0
+        self.channels = 0
+        self.prefetched = 0
+        self.cache_hits = 0
+        self.fallbacks = 0
+        self.errors = 0
+
+    async def get(self, login: str) -> dict | None:
+        """Meta für login oder None, wenn der Provider keine Antwort hatte."""
+        cached = self._cache.pop(login, None)
+        if cached and time.monotonic() - cached[0] <= TWITCH_STATUS_PREFETCH_SECONDS:
+            self.cache_hits += 1
+            return cached[1]
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(login, []).append(future)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_soon())
+        return await future
+
+    async def _flush_soon(self) -> None:
+        await asyncio.sleep(STATUS_BATCH_WINDOW_SECONDS)
+        self._flush_task = None
+        waiting, self._waiting = self._waiting, {}
+        try:
+            await self._flush(waiting)
+        finally:
+            # Was keine Antwort bekam, fällt auf HTML zurück
+            for futures in waiting.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(None)
+
+    async def _flush(self, waiting: dict[str, list[asyncio.Future]]) -> None:
+        logins = list(waiting)
+
+        # Letzte Abfrage mit demnächst fälligen Kanälen auffüllen (keine Extra-Requests)
+        size = self.provider.max_batch
+        room = -len(logins) % size
+        if room and TWITCH_STATUS_PREFETCH_SECONDS > 0:
+            now = time.monotonic()
+            extra = [
+                login for login in self.upcoming()
+                if login not in waiting and now - self._cache.get(login, (0.0, None))[0] > TWITCH_STATUS_PREFETCH_SECONDS
+            ]
+            logins += extra[:room]
+
+        for i in range(0, len(logins), size):
+            chunk = logins[i:i + size]
+            results = await self._fetch(chunk)
+            fetched_at = time.monotonic()
+            for login in chunk:
+                meta = results.get(login)
+                if login in waiting:
+                    for future in waiting[login]:
+                        if not future.done():
+                            future.set_result(meta)
+                elif meta is not None:
+                    self._cache[login] = (fetched_at, meta)
+                    self.prefetched += 1
+
+        # Nicht abgeholte Vorab-Ergebnisse verfallen
+        cutoff = time.monotonic() - TWITCH_STATUS_PREFETCH_SECONDS
+        for login in [login for login, (ts, _) in self._cache.items() if ts < cutoff]:
+            del self._cache[login]
+
+    async def _fetch(self, logins: list[str]) -> dict[str, dict]:
+        self.requests += 1
+        try:
+            results = await self.provider.fetch(logins)
+        except webclient.HostUnavailable:
+            return {}
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"[twitch-{self.provider.name}] Sammelabfrage für {len(logins)} Kanäle fehlgeschlagen: {e}")
+            return {}
+        self.channels += len(results)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider.name,
+            "requests": self.requests,
+            "channels": self.channels,
+            "avg_batch": (self.channels / self.requests) if self.requests else 0.0,
+            "prefetched": self.prefetched,
+            "cache_hits": self.cache_hits,
+            "cached": len(self._cache),
+            "fallbacks": self.fallbacks,
+            "errors": self.errors,
+        }
+
+def make_status_batcher(upcoming: Callable[[], list[str]]) -> StatusBatcher | None:
+    """Batcher für TWITCH_STATUS_PROVIDER oder None (= nur HTML-Scraping)."""
+    if TWITCH_STATUS_PROVIDER in ("", "html"):
+        return None
+    factory = STATUS_PROVIDERS.get(TWITCH_STATUS_PROVIDER)
+    if factory is None:
+        logger.warning(f"Unbekannter TWITCH_STATUS_PROVIDER '{TWITCH_STATUS_PROVIDER}' - nutze HTML-Scraping")
+        return None
+    return StatusBatcher(factory(), upcoming)
+
+# ============================================================
+# EXISTENZPRÜFUNG (HTML-Modus)
+# ============================================================
+class ExistenceCheck:
+    """Bestätigt per GQL (user: null), dass ein Login nicht existiert.
+
+    Twitch liefert auch für unbekannte Logins eine 200-Seite; fehlende Marker
+    allein sind kein Beweis, die Seite eines offline Kanals kann genauso aussehen.
+    """
+
+    def __init__(self, provider: StatusProvider):
+        self.provider = provider
+        self._exists: dict[str, float] = {}  # login -> Zeitpunkt der Bestätigung
+        self.checks = 0
+        self.missing = 0
+        self.errors = 0
+
+    async def login_missing(self, login: str) -> bool:
+        confirmed = self._exists.get(login)
+        if confirmed and time.monotonic() - confirmed < TWITCH_EXISTS_TTL_SECONDS:
+            return False
+        self.checks += 1
+        try:
+            meta = (await self.provider.fetch([login])).get(login)
+        except webclient.HostUnavailable:
+            return False
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"[twitch-{self.provider.name}] Existenzprüfung für {login} fehlgeschlagen: {e}")
+            return False
+        if meta is None:  # keine verwertbare Antwort -> nichts behaupten
+            return False
+        if meta.get("not_found"):
+            self.missing += 1
+            return True
+        self._exists[login] = time.monotonic()
+        return False
+
+    def stats(self) -> dict:
+        return {"checks": self.checks, "missing": self.missing, "errors": self.errors, "confirmed": len(self._exists)}
+
+twitch_exists: ExistenceCheck | None = (
+    ExistenceCheck(GqlStatusProvider(TWITCH_GQL_URL, TWITCH_GQL_CLIENT_ID)) if TWITCH_EXISTS_CHECK else None
+)
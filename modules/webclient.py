@@ -0,0 +1,407 @@
+# modules/webclient.py
+import os
+import time
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+from collections import deque
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from modules.scheduler import percentile
+
+logger = logging.getLogger("shani-bot")
+
+# ============================================================
+# HTTP CLIENT (eine Session für alle ausgehenden Abrufe)
+# ============================================================
+HTTP_POOL_SIZE = max(1, int(os.getenv("HTTP_POOL_SIZE", "64")))
+HTTP_DNS_TTL_SECONDS = max(0, int(os.getenv("HTTP_DNS_TTL_SECONDS", "300")))
+HTTP_KEEPALIVE_SECONDS = 30.0
+HTTP_TIMEOUT = aiohttp.ClientTimeout(
+    total=float(os.getenv("HTTP_TIMEOUT_TOTAL", "15")),
+    connect=float(os.getenv("HTTP_TIMEOUT_CONNECT", "5")),
+    sock_read=float(os.getenv("HTTP_TIMEOUT_READ", "10")),
+)
+LATENCY_SAMPLES = 500
+
+# Brotli nur anbieten, wenn aiohttp es auch entpacken kann (optional: pip install Brotli)
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "br, gzip, deflate"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+_session: aiohttp.ClientSession | None = None
+
+# ============================================================
+# HTTP LIMITS (pro Host)
+# ============================================================
+# Höchstens so viele gleichzeitige Requests an denselben Host (twitch.tv, youtube.com)
+HTTP_MAX_PER_HOST = max(1, int(os.getenv("HTTP_MAX_PER_HOST", "4")))
+
+_host_slots: dict[str, asyncio.Semaphore] = {}
+_host_stats: dict[str, dict] = {}
+_host_latency: dict[str, deque[float]] = {}   # was der Aufrufer gesehen hat (inkl. Hedge)
+_attempt_latency: dict[str, deque[float]] = {}  # einzelne Requests, Basis für die Hedge-Schwelle
+
+def _host_of(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+@asynccontextmanager
+async def host_slot(url: str):
+    """Begrenzt gleichzeitige Requests pro Host auf HTTP_MAX_PER_HOST."""
+    host = _host_of(url)
+    sem = _host_slots.get(host)
+    if sem is None:
+        sem = _host_slots[host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+        _host_stats[host] = {
+            "requests": 0, "waited": 0, "in_flight": 0, "peak": 0,
+            "bytes": 0, "errors": 0, "timeouts": 0, "bad_status": 0,
+        }
+        _host_latency[host] = deque(maxlen=LATENCY_SAMPLES)
+        _attempt_latency[host] = deque(maxlen=LATENCY_SAMPLES)
+    stats = _host_stats[host]
+
+    if sem.locked():
+        stats["waited"] += 1
+    async with sem:
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["peak"] = max(stats["peak"], stats["in_flight"])
+        try:
+            yield
+        finally:
+            stats["in_flight"] -= 1
+
+# ============================================================
+# RATE LIMIT + CIRCUIT BREAKER (pro Host)
+# ============================================================
+# Token-Bucket: im Schnitt HTTP_RATE_PER_HOST Requests/Sekunde, kurzzeitig bis HTTP_BURST_PER_HOST
+HTTP_RATE_PER_HOST = max(0.05, float(os.getenv("HTTP_RATE_PER_HOST", "2")))
+HTTP_BURST_PER_HOST = max(1, int(os.getenv("HTTP_BURST_PER_HOST", "5")))
+# So viele Fehler (429/5xx/Timeout) in Folge öffnen den Breaker
+CIRCUIT_FAILURES = max(1, int(os.getenv("CIRCUIT_FAILURES", "5")))
+CIRCUIT_BASE_SECONDS = 30.0
+CIRCUIT_MAX_SECONDS = 900.0
+
+class HostUnavailable(Exception):
+    """Host ist gesperrt (Breaker offen); es wurde kein Request gesendet."""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"{host} gesperrt, nächster Versuch in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self) -> None:
+        while True:
+            if self.try_acquire():
+                return
+            delay = (1 - self.tokens) / self.rate
+            self.waits += 1
+            self.wait_seconds += delay
+            await asyncio.sleep(delay)
+
+class CircuitBreaker:
+    """closed -> (Fehlerserie/429) -> open -> (Wartezeit um) -> half_open -> ein Probe-Request entscheidet."""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = "closed"
+        self.failures = 0
+        self.opened_until = 0.0
+        self.backoff = CIRCUIT_BASE_SECONDS
+        self.probing = False
+        self.opens = 0
+        self.rejected = 0
+        self.retry_after_used = 0
+
+    def before_request(self) -> None:
+        now = time.monotonic()
+        if self.state == "open":
+            if now < self.opened_until:
+                self.rejected += 1
+                raise HostUnavailable(self.host, self.opened_until - now)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self.probing:
+                self.rejected += 1
+                raise HostUnavailable(self.host, 1.0)
+            self.probing = True
+
+    def success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"[http:{self.host}] Breaker wieder geschlossen")
+        self.state = "closed"
+        self.failures = 0
+        self.backoff = CIRCUIT_BASE_SECONDS
+        self.probing = False
+
+    def failure(self, retry_after: float | None = None) -> None:
+        self.failures += 1
+        self.probing = False
+        # 429 mit Retry-After, fehlgeschlagene Probe oder zu viele Fehler in Folge -> sperren
+        if retry_after is None and self.state != "half_open" and self.failures < CIRCUIT_FAILURES:
+            return
+        wait = self.backoff
+        if retry_after is not None:
+            self.retry_after_used += 1
+            wait = max(wait, min(retry_after, CIRCUIT_MAX_SECONDS))
+        self.state = "open"
+        self.opened_until = time.monotonic() + wait
+        self.backoff = min(self.backoff * 2, CIRCUIT_MAX_SECONDS)
+        self.opens += 1
+        logger.warning(f"[http:{self.host}] Breaker offen für {wait:.0f}s (nach {self.failures} Fehlern)")
+
+    def release(self) -> None:
+        # Probe ohne Ergebnis (z.B. abgebrochen) -> nächster Request darf proben
+        self.probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "opens": self.opens,
+            "rejected": self.rejected,
+            "retry_after_used": self.retry_after_used,
+            "open_for": max(0.0, self.opened_until - time.monotonic()) if self.state == "open" else 0.0,
+        }
+
+_buckets: dict[str, TokenBucket] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+
+def _retry_after_seconds(value: str | None) -> float | None:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def breaker_for(host: str) -> CircuitBreaker:
+    breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = _breakers[host] = CircuitBreaker(host)
+    return breaker
+
+# ============================================================
+# HEDGING (zweiter Request gegen Nachzügler)
+# ============================================================
+# Kommen die Header nicht innerhalb dieses Perzentils der letzten Latenzen, wird
+# ein zweiter Request gestartet; es gilt der schnellere. 0 = aus.
+HTTP_HEDGE_PERCENTILE = max(0.0, min(99.9, float(os.getenv("HTTP_HEDGE_PERCENTILE", "0"))))
+# Höchstens dieser Anteil zusätzlicher Requests (über alle Hosts)
+HTTP_HEDGE_BUDGET = max(0.0, float(os.getenv("HTTP_HEDGE_BUDGET", "0.05")))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = 0.05
+
+_hedge_stats = {"requests": 0, "hedges": 0, "hedge_wins": 0, "over_budget": 0, "no_slot": 0}
+
+def _hedge_delay(host: str) -> float | None:
+    if not HTTP_HEDGE_PERCENTILE:
+        return None
+    samples = list(_attempt_latency[host])
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return max(HEDGE_MIN_DELAY_SECONDS, percentile(samples, HTTP_HEDGE_PERCENTILE))
+
+async def _attempt(method: str, url: str, host: str, **kwargs) -> aiohttp.ClientResponse:
+    start = time.perf_counter()
+    resp = await get_session().request(method, url, **kwargs)
+    _attempt_latency[host].append(time.perf_counter() - start)
+    return resp
+
+def _discard(task: asyncio.Task) -> None:
+    # Verlierer eines Hedges: Antwort verwerfen, Fehler sind egal
+    if not task.cancelled() and task.exception() is None:
+        task.result().close()
+
+async def _try_host_slot(host: str) -> bool:
+    """Nimmt einen freien Host-Slot ohne zu warten (False = alle belegt)."""
+    sem = _host_slots[host]
+    if sem.locked():
+        return False
+    await sem.acquire()  # ist frei, kehrt sofort zurück
+    return True
+
+async def _send(method: str, url: str, host: str, **kwargs) -> aiohttp.ClientResponse:
+    """Sendet den Request; hängt er länger als die Hedge-Schwelle, läuft ein zweiter parallel."""
+    _hedge_stats["requests"] += 1
+    delay = _hedge_delay(host)
+    if delay is None:
+        return await _attempt(method, url, host, **kwargs)
+
+    first_start = time.perf_counter()
+    first = asyncio.ensure_future(_attempt(method, url, host, **kwargs))
+    tasks = {first}
+    winner: asyncio.Task | None = None
+    extra_slot = False
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            if _hedge_stats["hedges"] >= HTTP_HEDGE_BUDGET * _hedge_stats["requests"] or not _buckets[host].try_acquire():
+                _hedge_stats["over_budget"] += 1
+                await asyncio.wait(tasks)
+            elif not await _try_host_slot(host):
+                # Sonst wartet der Hedge im Connector (limit_per_host) hinter dem langsamen Request
+                _hedge_stats["no_slot"] += 1
+                await asyncio.wait(tasks)
+            else:
+                extra_slot = True
+                _hedge_stats["hedges"] += 1
+                tasks.add(asyncio.ensure_future(_attempt(method, url, host, **kwargs)))
+
+        pending = set(tasks)
+        while winner is None and pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+        if winner is None:
+            return first.result()  # beide fehlgeschlagen -> Fehler des ersten weiterreichen
+        if winner is not first:
+            _hedge_stats["hedge_wins"] += 1
+        return winner.result()
+    finally:
+        if not first.done():
+            # Abgebrochener Nachzügler: mindestens so lange hätte er gebraucht
+            _attempt_latency[host].append(time.perf_counter() - first_start)
+        # Alles außer dem Gewinner abbrechen bzw. dessen Antwort schließen
+        for task in tasks - {winner}:
+            if not task.done():
+                task.cancel()
+            task.add_done_callback(_discard)
+        if extra_slot:
+            _host_slots[host].release()
+
+def hedge_stats() -> dict:
+    return {
+        **_hedge_stats,
+        "enabled": bool(HTTP_HEDGE_PERCENTILE),
+        "percentile": HTTP_HEDGE_PERCENTILE,
+        "budget": HTTP_HEDGE_BUDGET,
+        "rate": (_hedge_stats["hedges"] / _hedge_stats["requests"]) if _hedge_stats["requests"] else 0.0,
+    }
+
+def get_session() -> aiohttp.ClientSession:
+    """Die gemeinsame Session; wird beim ersten Aufruf im laufenden Loop angelegt."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_MAX_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_TTL_SECONDS,
+            keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=HTTP_TIMEOUT,
+            headers={"Accept-Encoding": ACCEPT_ENCODING},
+        )
+        logger.info(f"HTTP-Client gestartet (Pool {HTTP_POOL_SIZE}, {HTTP_MAX_PER_HOST}/Host, DNS-Cache {HTTP_DNS_TTL_SECONDS}s, {ACCEPT_ENCODING})")
+    return _session
+
+async def close_http() -> None:
+    """Schließt die Session im laufenden Loop (beim Beenden des Bots)."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+@asynccontextmanager
+async def request(method: str, url: str, **kwargs):
+    """Request über die gemeinsame Session, mit Host-Limit und Metriken (Latenz bis Header, Bytes)."""
+    host = _host_of(url)
+    breaker = breaker_for(host)
+    breaker.before_request()  # wirft HostUnavailable, solange der Host gesperrt ist
+    bucket = _buckets.get(host)
+    if bucket is None:
+        bucket = _buckets[host] = TokenBucket(HTTP_RATE_PER_HOST, HTTP_BURST_PER_HOST)
+
+    outcome = None  # "ok" / "failed", sobald der Breaker Bescheid weiß
+    try:
+        await bucket.acquire()
+        async with host_slot(url):
+            stats = _host_stats[host]
+            start = time.perf_counter()
+            try:
+                async with await _send(method, url, host, **kwargs) as resp:
+                    _host_latency[host].append(time.perf_counter() - start)
+                    if resp.status != 200:
+                        stats["bad_status"] += 1
+                    if resp.status == 429 or resp.status >= 500:
+                        breaker.failure(_retry_after_seconds(resp.headers.get("Retry-After")))
+                        outcome = "failed"
+                    else:
+                        breaker.success()
+                        outcome = "ok"
+                    try:
+                        yield resp
+                    finally:
+                        stats["bytes"] += resp.content.total_bytes
+            except asyncio.TimeoutError:
+                stats["timeouts"] += 1
+                # Auch ein Hänger beim Lesen nach den Headern zählt als Fehler
+                if outcome != "failed":
+                    breaker.failure()
+                    outcome = "failed"
+                raise
+            except aiohttp.ClientError:
+                stats["errors"] += 1
+                if outcome != "failed":
+                    breaker.failure()
+                    outcome = "failed"
+                raise
+    finally:
+        if outcome is None:
+            breaker.release()
+
+def get(url: str, headers: dict | None = None):
+    return request("GET", url, headers=headers)
+
+def post(url: str, headers: dict | None = None, json=None):
+    return request("POST", url, headers=headers, json=json)
+
+def host_stats() -> dict[str, dict]:
+    result = {}
+    for host, s in _host_stats.items():
+        latency = list(_host_latency[host])
+        attempts = list(_attempt_latency[host])
+        result[host] = {
+            **s,
+            "latency_avg_ms": (sum(latency) / len(latency) * 1000) if latency else 0.0,
+            # effektiv = was der Aufrufer gesehen hat, einzeln = jeder Request für sich (ohne Hedge)
+            **{f"latency_p{p}_ms": percentile(latency, p) * 1000 for p in (50, 95, 99)},
+            **{f"attempt_p{p}_ms": percentile(attempts, p) * 1000 for p in (50, 95, 99)},
+            "throttled": _buckets[host].waits if host in _buckets else 0,
+            "throttled_seconds": _buckets[host].wait_seconds if host in _buckets else 0.0,
+            "breaker": breaker_for(host).stats(),
+        }
+    return result
@@ -0,0 +1,263 @@
+# modules/webhooks.py
+import os
+import hmac
+import asyncio
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs
+from xml.etree import ElementTree
+
+from aiohttp import web
+
+logger = logging.getLogger("shani-bot")
+
+# ============================================================
+# WEBHOOK CONFIG (Push statt Polling)
+# ============================================================
+# 0 = kein Webhook-Server (nur Polling wie bisher)
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "0"))
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+TWITCH_EVENTSUB_SECRET = os.getenv("TWITCH_EVENTSUB_SECRET", "")
+WEBSUB_SECRET = os.getenv("WEBSUB_SECRET", "")
+# Kanäle, für die Push ankommt, werden nur noch so selten gepollt (Fallback)
+WEBHOOK_FALLBACK_POLL_SECONDS = max(60, int(os.getenv("WEBHOOK_FALLBACK_POLL_SECONDS", "900")))
+# Ohne Push-Event in dieser Zeit gilt ein Kanal wieder als "nur Polling"
+WEBHOOK_COVERAGE_SECONDS = 14 * 86400
+EVENTSUB_MAX_AGE_SECONDS = 600
+WEBHOOK_MAX_BODY_BYTES = 1024 * 1024
+SEEN_MESSAGE_IDS = 1000
+
+ATOM_NS = {"atom": "http://www.w3.org/2005/Atom", "yt": "http://www.youtube.com/xml/schemas/2015"}
+
+# provider -> async callback(channel, is_live); is_live=None heißt "bitte sofort nachprüfen".
+# Der Callback gibt False zurück, wenn der Kanal hier niemandem gehört.
+_push_listeners: dict[str, list] = {"twitch": [], "youtube": []}
+_push_seen: dict[tuple[str, str], float] = {}
+_seen_ids: OrderedDict[str, None] = OrderedDict()
+_runner: web.AppRunner | None = None
+# Laufende Dispatches: der Webhook wird sofort quittiert, die Prüfung läuft danach
+_dispatch_tasks: set[asyncio.Task] = set()
+_stats = {
+    provider: {"received": 0, "accepted": 0, "rejected": 0, "duplicates": 0, "unknown": 0, "verified": 0, "last_ts": 0.0}
+    for provider in ("twitch", "youtube")
+}
+
+def add_push_listener(provider: str, callback) -> None:
+    if callback not in _push_listeners[provider]:
+        _push_listeners[provider].append(callback)
+
+def remove_push_listener(provider: str, callback) -> None:
+    if callback in _push_listeners[provider]:
+        _push_listeners[provider].remove(callback)
+
+def push_covered(provider: str, channel: str) -> bool:
+    """True, wenn für den Kanal zuletzt Push-Events ankamen (Polling nur noch als Fallback)."""
+    if not _runner:
+        return False
+    seen = _push_seen.get((provider, channel))
+    return seen is not None and time.time() - seen < WEBHOOK_COVERAGE_SECONDS
+
+def _mark_covered(provider: str, channel: str) -> None:
+    _push_seen[(provider, channel)] = time.time()
+
+async def _dispatch(provider: str, channel: str, is_live: bool | None) -> bool:
+    handled = False
+    for callback in list(_push_listeners[provider]):
+        try:
+            handled |= bool(await callback(channel, is_live))
+        except Exception as e:
+            logger.error(f"[webhook:{provider}] Listener für {channel} fehlgeschlagen: {e}")
+    if handled:
+        _mark_covered(provider, channel)
+    else:
+        _stats[provider]["unknown"] += 1
+    return handled
+
+def _spawn_dispatch(provider: str, channel: str, is_live: bool | None) -> None:
+    task = asyncio.create_task(_dispatch(provider, channel, is_live))
+    _dispatch_tasks.add(task)
+    task.add_done_callback(_dispatch_tasks.discard)
+
+def _seen_before(message_id: str) -> bool:
+    if message_id in _seen_ids:
+        return True
+    _seen_ids[message_id] = None
+    while len(_seen_ids) > SEEN_MESSAGE_IDS:
+        _seen_ids.popitem(last=False)
+    return False
+
+# ============================================================
+# TWITCH EVENTSUB
+# ============================================================
+def _parse_eventsub_ts(value: str) -> float | None:
+    # RFC3339 mit bis zu 9 Nachkommastellen, fromisoformat kann nur 6
+    try:
+        value = value.strip().replace("Z", "+00:00")
+        if "." in value:
+            head, rest = value.split(".", 1)
+            digits = rest[:len(rest) - len(rest.lstrip("0123456789"))]
+            value = f"{head}.{digits[:6].ljust(6, '0')}{rest[len(digits):]}"
+        ts = datetime.fromisoformat(value)
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return ts.timestamp()
+    except ValueError:
+        return None
+
+def eventsub_signature(secret: str, message_id: str, timestamp: str, body: bytes) -> str:
+    digest = hmac.new(secret.encode(), message_id.encode() + timestamp.encode() + body, hashlib.sha256)
+    return "sha256=" + digest.hexdigest()
+
+async def handle_twitch(request: web.Request) -> web.Response:
+    stats = _stats["twitch"]
+    stats["received"] += 1
+    body = await request.read()
+    message_id = request.headers.get("Twitch-Eventsub-Message-Id", "")
+    timestamp = request.headers.get("Twitch-Eventsub-Message-Timestamp", "")
+    signature = request.headers.get("Twitch-Eventsub-Message-Signature", "")
+    message_type = request.headers.get("Twitch-Eventsub-Message-Type", "")
+
+    if not TWITCH_EVENTSUB_SECRET or not message_id or not hmac.compare_digest(
+        eventsub_signature(TWITCH_EVENTSUB_SECRET, message_id, timestamp, body), signature
+    ):
+        stats["rejected"] += 1
+        return web.Response(status=403)
+    sent = _parse_eventsub_ts(timestamp)
+    if sent is None or abs(time.time() - sent) > EVENTSUB_MAX_AGE_SECONDS:
+        stats["rejected"] += 1
+        return web.Response(status=403)
+    if _seen_before(message_id):
+        stats["duplicates"] += 1
+        return web.Response(status=204)
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        stats["rejected"] += 1
+        return web.Response(status=400)
+
+    if message_type == "webhook_callback_verification":
+        stats["verified"] += 1
+        return web.Response(text=str(payload.get("challenge", "")), content_type="text/plain")
+    if message_type == "revocation":
+        sub = payload.get("subscription") or {}
+        logger.warning(f"[webhook:twitch] EventSub-Abo widerrufen: {sub.get('type')} ({sub.get('status')})")
+        return web.Response(status=204)
+    if message_type != "notification":
+        return web.Response(status=204)
+
+    sub_type = (payload.get("subscription") or {}).get("type")
+    login = ((payload.get("event") or {}).get("broadcaster_user_login") or "").lower()
+    if sub_type in ("stream.online", "stream.offline") and login:
+        stats["accepted"] += 1
+        stats["last_ts"] = time.time()
+        _spawn_dispatch("twitch", login, sub_type == "stream.online")
+    return web.Response(status=204)
+
+# ============================================================
+# YOUTUBE WEBSUB (Atom-Feed)
+# ============================================================
+def _topic_channel_id(topic: str) -> str | None:
+    values = parse_qs(urlsplit(topic).query).get("channel_id")
+    return values[0] if values else None
+
+def websub_signature(secret: str, body: bytes, algo: str = "sha1") -> str:
+    return f"{algo}=" + hmac.new(secret.encode(), body, algo).hexdigest()
+
+def parse_atom_channels(body: bytes) -> set[str]:
+    """Kanal-IDs aller Einträge eines YouTube-Atom-Feeds (gelöschte Einträge zählen nicht)."""
+    root = ElementTree.fromstring(body)
+    return {
+        el.text.strip()
+        for el in root.findall("atom:entry/yt:channelId", ATOM_NS)
+        if el.text
+    }
+
+async def handle_youtube_verify(request: web.Request) -> web.Response:
+    from modules.storage import peek_subscriptions
+    from modules.youtube import yt_canonical_channel
+
+    stats = _stats["youtube"]
+    mode = request.query.get("hub.mode", "")
+    challenge = request.query.get("hub.challenge", "")
+    channel_id = _topic_channel_id(request.query.get("hub.topic", ""))
+    if mode == "unsubscribe" and challenge:
+        return web.Response(text=challenge, content_type="text/plain")
+    known = {yt_canonical_channel(sub["channel"]) for sub in peek_subscriptions(provider="youtube")}
+    if mode != "subscribe" or not challenge or channel_id not in known:
+        stats["rejected"] += 1
+        return web.Response(status=404)
+    stats["verified"] += 1
+    _mark_covered("youtube", channel_id)
+    return web.Response(text=challenge, content_type="text/plain")
+
+async def handle_youtube(request: web.Request) -> web.Response:
+    stats = _stats["youtube"]
+    stats["received"] += 1
+    body = await request.read()
+
+    # Laut WebSub trotz falscher Signatur 2xx antworten, den Inhalt aber verwerfen
+    algo, _, _ = request.headers.get("X-Hub-Signature", "").partition("=")
+    if (
+        not WEBSUB_SECRET or algo not in ("sha1", "sha256")
+        or not hmac.compare_digest(websub_signature(WEBSUB_SECRET, body, algo), request.headers["X-Hub-Signature"])
+    ):
+        stats["rejected"] += 1
+        return web.Response(status=202)
+
+    try:
+        channels = parse_atom_channels(body)
+    except ElementTree.ParseError:
+        stats["rejected"] += 1
+        return web.Response(status=202)
+
+    stats["accepted"] += 1
+    stats["last_ts"] = time.time()
+    for channel_id in channels:
+        _spawn_dispatch("youtube", channel_id, None)
+    return web.Response(status=204)
+
+# ============================================================
+# SERVER
+# ============================================================
+async def start_webhook_server() -> bool:
+    global _runner
+    if _runner or not WEBHOOK_PORT:
+        return False
+    if not TWITCH_EVENTSUB_SECRET:
+        logger.warning("TWITCH_EVENTSUB_SECRET fehlt - Twitch-Webhooks werden abgelehnt")
+    if not WEBSUB_SECRET:
+        logger.warning("WEBSUB_SECRET fehlt - YouTube-Webhooks werden ignoriert")
+
+    app = web.Application(client_max_size=WEBHOOK_MAX_BODY_BYTES)
+    app.router.add_post("/webhooks/twitch", handle_twitch)
+    app.router.add_get("/webhooks/youtube", handle_youtube_verify)
+    app.router.add_post("/webhooks/youtube", handle_youtube)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    _runner = runner
+    logger.info(f"Webhook-Server lauscht auf http://{WEBHOOK_HOST}:{WEBHOOK_PORT}/webhooks/")
+    return True
+
+async def stop_webhook_server() -> None:
+    global _runner
+    if _runner:
+        await _runner.cleanup()
+        _runner = None
+    for task in list(_dispatch_tasks):
+        task.cancel()
+    if _dispatch_tasks:
+        await asyncio.gather(*_dispatch_tasks, return_exceptions=True)
+
+def webhook_stats() -> dict:
+    return {
+        "running": _runner is not None,
+        "address": f"{WEBHOOK_HOST}:{WEBHOOK_PORT}",
+        "covered": sum(1 for key in _push_seen if push_covered(*key)),
+        "providers": {provider: dict(s) for provider, s in _stats.items()},
+    }
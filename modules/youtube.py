@@ -1,13 +1,21 @@
-import re
+import os
 import logging
 import asyncio
-import aiohttp
 import time
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
 from datetime import datetime, timezone
 
+from modules.scheduler import (
+    PollScheduler, ChannelFanout, ConfirmTracker, NegativeCache, WarmupStagger, StartSchedule,
+    LIVE_CONFIRM_SECONDS, NOT_FOUND_SUSPEND_AFTER, SCHEDULE_WINDOW_BEFORE_SECONDS, SCHEDULE_WINDOW_AFTER_SECONDS,
+)
+from modules.adaptive import AdaptivePoller
+from modules.webhooks import add_push_listener, remove_push_listener, push_covered, WEBHOOK_FALLBACK_POLL_SECONDS
+from modules import webclient
+from modules import livemeta
+
 logger = logging.getLogger("shani-bot")
 
 # ============================================================
@@ -15,8 +23,15 @@ logger = logging.getLogger("shani-bot")
 # ============================================================
 YT_DEFAULT_POLL_SECONDS = 300  # Etwas seltener als Twitch, da YouTube restriktiver sein kann
 YT_OFFLINE_GRACE_SECONDS_DEFAULT = 600  # 10 Minuten
+STATUS_MAX_LINES = 20  # Streamer-Zeilen in /youtubelive_status
+STATUS_MAX_CHARS = 2000  # Discord-Limit pro Nachricht
+STATUS_MORE_RESERVE = 40  # Platz für die "… und N weitere"-Zeile
+
+def discord_len(text: str) -> int:
+    """Länge so, wie Discord sie zählt (UTF-16-Einheiten, Emojis zählen doppelt)."""
+    return len(text.encode("utf-16-le")) // 2
 
-# --- YouTube Runtime State ---
+# --- YouTube Runtime State (pro Abo-ID) ---
 yt_live_state: dict[int, bool] = {}
 yt_live_hits: dict[int, int] = {}
 yt_off_hits: dict[int, int] = {}
@@ -32,47 +47,157 @@ def extract_yt_channel(value: str) -> str:
         v = v.split("/")[0]
     return v
 
-async def fetch_yt_page(session: aiohttp.ClientSession, yt_channel: str):
+def yt_channel_key(value: str) -> str:
+    """Normalisierter Kanal-Schlüssel: Handles sind case-insensitiv, UC-IDs nicht."""
+    channel = extract_yt_channel(value)
+    return channel.lower() if channel.startswith("@") else channel
+
+def yt_canonical_channel(value: str) -> str:
+    """Poll-Schlüssel eines Kanals: die aufgelöste UC-ID, solange unbekannt yt_channel_key()."""
+    key = yt_channel_key(value)
+    if key.startswith("@"):
+        return yt_handles.peek(key) or key
+    return key
+
+YT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "Accept-Language": "de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7",
+    "Cache-Control": "no-cache"
+}
+
+def yt_live_url(yt_channel: str) -> str:
     if yt_channel.startswith("@"):
-        url = f"https://www.youtube.com/{yt_channel}/live"
-    else:
-        url = f"https://www.youtube.com/channel/{yt_channel}/live"
-        
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
-        "Accept-Language": "de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7",
-        "Cache-Control": "no-cache"
-    }
+        return f"https://www.youtube.com/{yt_channel}/live"
+    return f"https://www.youtube.com/channel/{yt_channel}/live"
+
+async def fetch_yt_meta(yt_channel: str) -> dict | None:
+    """Holt die Live-Metadaten eines Kanals (None = Seite nicht erreichbar).
+
+    Existiert der Kanal nicht, enthält das Ergebnis not_found=True.
+    """
+    url = yt_live_url(yt_channel)
+    scanner = livemeta.PlayerScanner()
     try:
-        async with session.get(url, headers=headers, timeout=15) as resp:
-            if resp.status == 200:
-                return await resp.text()
-            return None
+        if livemeta.LIVE_FETCH_MODE == "full":
+            status, html_text = await livemeta.fetch_page(url, YT_HEADERS)
+        else:
+            status, html_text = await livemeta.stream_scan(url, YT_HEADERS, scanner), None
+    except webclient.HostUnavailable:
+        return None
     except Exception as e:
-        logger.error(f"fetch_yt_page error for {yt_channel}: {e}")
+        livemeta.count_error()
+        logger.error(f"fetch_yt_meta error for {yt_channel}: {e}")
         return None
 
-def parse_yt_meta(html_text: str) -> dict:
-    meta = {"is_live": False, "title": None, "avatar": None}
-    
-    # Live Indikator
-    if '"isLive":true' in html_text:
-        meta["is_live"] = True
-    
-    # Titel
-    t_match = re.search(r'<meta name="title" content="([^"]+)">', html_text)
-    if t_match:
-        meta["title"] = t_match.group(1)
-    
-    # Avatar (etwas tricky bei YT)
-    a_match = re.search(r'"avatar":\{"thumbnails":\[\{"url":"([^"]+)"', html_text)
-    if a_match:
-        meta["avatar"] = a_match.group(1).replace("\\/", "/")
-        
-    return meta
+    if status in livemeta.NOT_FOUND_STATUSES:
+        return livemeta.not_found_meta()
+    if status != 200:
+        return None
+    if html_text is not None:
+        return livemeta.build_yt_meta(*await livemeta.run_parse(livemeta.scan_yt_page, html_text))
+    return livemeta.build_yt_meta(scanner.found, scanner.player)
+
+# ============================================================
+# HANDLE -> KANAL-ID (einmal auflösen statt Redirect bei jedem Poll)
+# ============================================================
+YT_HANDLE_TTL_SECONDS = max(3600, int(os.getenv("YT_HANDLE_TTL_SECONDS", str(7 * 86400))))
+YT_HANDLE_RETRY_SECONDS = 3600  # nach fehlgeschlagener Auflösung
+YT_HANDLE_REFRESH_CHECK_SECONDS = 3600
+YT_RESOLVE_MAX_BYTES = 512 * 1024
+YT_RESOLVE_SETUP_TIMEOUT = 2.0  # länger darf /setup_youtubelive nicht warten
+
+class HandleResolver:
+    """@handle -> UC-Kanal-ID, persistiert in channel_aliases und nach TTL neu aufgelöst."""
+
+    def __init__(self):
+        self._ids: dict[str, tuple[str, float]] = {}  # @handle -> (UC-ID, aufgelöst um)
+        self._failed: dict[str, float] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.resolved = 0
+        self.failures = 0
+        self.changed = 0
+
+    def load(self, aliases: dict[str, tuple[str, float]]) -> None:
+        self._ids.update(aliases)
+
+    def peek(self, handle: str) -> str | None:
+        entry = self._ids.get(handle)
+        return entry[0] if entry else None
+
+    def should_try(self, handle: str, now: float) -> bool:
+        return now - self._failed.get(handle, 0.0) >= YT_HANDLE_RETRY_SECONDS
+
+    def stale(self, now: float) -> list[str]:
+        return [handle for handle, (_, resolved_at) in self._ids.items() if now - resolved_at >= YT_HANDLE_TTL_SECONDS]
+
+    async def resolve(self, handle: str, timeout: float | None = None) -> str | None:
+        """Löst handle auf (parallele Aufrufe teilen sich einen Request).
+
+        Mit timeout wird nicht länger gewartet; die Auflösung läuft dann im Hintergrund weiter.
+        """
+        task = self._inflight.get(handle)
+        if task is None:
+            task = asyncio.create_task(self._resolve(handle))
+            self._inflight[handle] = task
+            task.add_done_callback(lambda _: self._inflight.pop(handle, None))
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        return task.result() if done else self.peek(handle)
+
+    async def _resolve(self, handle: str) -> str | None:
+        from bot import save_channel_alias
+        scanner = livemeta.MarkerScanner("youtube_id")
+        try:
+            status = await livemeta.stream_scan(f"https://www.youtube.com/{handle}", YT_HEADERS, scanner, YT_RESOLVE_MAX_BYTES)
+        except webclient.HostUnavailable:
+            return self.peek(handle)
+        except Exception as e:
+            status = None
+            logger.warning(f"[youtube:{handle}] Handle nicht auflösbar: {e}")
+
+        channel_id = scanner.found.get("channel_id")
+        now = time.time()
+        if status != 200 or not channel_id:
+            self.failures += 1
+            self._failed[handle] = now
+            return self.peek(handle)
+
+        old = self.peek(handle)
+        if old and old != channel_id:
+            self.changed += 1
+            logger.info(f"[youtube:{handle}] Handle zeigt jetzt auf {channel_id} (vorher {old})")
+        self._ids[handle] = (channel_id, now)
+        self._failed.pop(handle, None)
+        self.resolved += 1
+        try:
+            await save_channel_alias("youtube", handle, channel_id, now)
+        except Exception as e:
+            logger.error(f"[youtube:{handle}] Kanal-ID konnte nicht gespeichert werden: {e}")
+        return channel_id
+
+    async def canonical(self, value: str, timeout: float | None = None) -> str:
+        """Wie yt_canonical_channel(), löst einen unbekannten Handle aber vorher auf."""
+        key = yt_channel_key(value)
+        if key.startswith("@") and not self.peek(key):
+            await self.resolve(key, timeout)
+        return yt_canonical_channel(key)
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "handles": len(self._ids),
+            "stale": len(self.stale(now)),
+            "resolved": self.resolved,
+            "failures": self.failures,
+            "changed": self.changed,
+        }
+
+yt_handles = HandleResolver()
 
 def build_yt_live_embed(yt_channel: str, meta: dict) -> discord.Embed:
-    url = f"https://www.youtube.com/{yt_channel}/live" if yt_channel.startswith("@") else f"https://www.youtube.com/channel/{yt_channel}/live"
+    if meta.get("video_id"):
+        url = f"https://www.youtube.com/watch?v={meta['video_id']}"
+    else:
+        url = f"https://www.youtube.com/{yt_channel}/live" if yt_channel.startswith("@") else f"https://www.youtube.com/channel/{yt_channel}/live"
     e = discord.Embed(
         title=f"🔴 {yt_channel} ist jetzt LIVE auf YouTube!",
         description=f"**Jetzt zuschauen:** {url}",
@@ -81,6 +206,8 @@ def build_yt_live_embed(yt_channel: str, meta: dict) -> discord.Embed:
     )
     if meta.get("title"):
         e.add_field(name="Stream-Titel", value=meta["title"], inline=False)
+    if meta.get("viewers"):
+        e.add_field(name="Zuschauer", value=f"{meta['viewers']:,}".replace(",", "."), inline=True)
     if meta.get("avatar"):
         e.set_thumbnail(url=meta["avatar"])
     e.set_footer(text="Raiders Cache • YouTube Alert")
@@ -98,6 +225,64 @@ def build_yt_offline_embed(yt_channel: str, meta: dict) -> discord.Embed:
     e.set_footer(text="Raiders Cache • YouTube Alert")
     return e
 
+# ============================================================
+# ABOS (mehrere Kanäle pro Guild)
+# ============================================================
+SUB_OVERRIDE_FIELDS = ("announce_channel_id", "ping_role_id", "stable_checks", "poll_seconds", "offline_grace_seconds")
+
+def effective_cfg(cfg: dict, sub: dict) -> dict:
+    """Guild-Config, überlagert mit den Werten eines Abos (NULL im Abo = Guild-Standard)."""
+    eff = dict(cfg)
+    eff["youtube_channel"] = sub["channel"]
+    for field in SUB_OVERRIDE_FIELDS:
+        if sub.get(field) is not None:
+            eff[f"youtube_{field}"] = sub[field]
+    return eff
+
+def sub_is_active(cfg: dict, sub: dict) -> bool:
+    return bool(
+        cfg.get("youtube_enabled") and sub.get("enabled") and not sub.get("suspended_at")
+        and effective_cfg(cfg, sub).get("youtube_announce_channel_id")
+    )
+
+def clear_runtime_state(sub_id: int) -> None:
+    yt_live_state.pop(sub_id, None)
+    yt_live_hits.pop(sub_id, None)
+    yt_off_hits.pop(sub_id, None)
+
+def restore_runtime_state(sub_id: int, state: dict, max_age: float) -> bool:
+    """Übernimmt die gespeicherte Zustandsmaschine eines Abos (nach einem Neustart)."""
+    if sub_id in yt_live_state:
+        return False
+    yt_live_state[sub_id] = bool(state["live_state"])
+    # Angefangene Bestätigungen zählen nur, wenn der letzte Poll nicht zu lange her ist
+    fresh = time.time() - float(state["last_check_ts"] or 0.0) <= max_age
+    yt_live_hits[sub_id] = int(state["live_hits"] or 0) if fresh else 0
+    yt_off_hits[sub_id] = int(state["off_hits"] or 0) if fresh else 0
+    return True
+
+async def primary_subscription(guild_id: int, cfg: dict) -> dict | None:
+    """Das Abo des Haupt-Kanals aus guild_settings, sonst das älteste Abo."""
+    from bot import list_subscriptions
+    subs = await list_subscriptions(guild_id, "youtube")
+    for sub in subs:
+        if sub["channel"] == cfg.get("youtube_channel"):
+            return sub
+    return subs[0] if subs else None
+
+async def set_primary_channel(guild_id: int, channel: str) -> dict:
+    """Ersetzt den Haupt-Kanal der Guild (erbt alle Guild-Standards)."""
+    from bot import get_guild_cfg, update_guild_cfg, find_subscription, add_subscription, remove_subscription
+    cfg = await get_guild_cfg(guild_id)
+    old = cfg.get("youtube_channel")
+    if old and old != channel:
+        old_sub = await find_subscription(guild_id, "youtube", old)
+        if old_sub:
+            await remove_subscription(old_sub["id"])
+            clear_runtime_state(old_sub["id"])
+    await update_guild_cfg(guild_id, youtube_channel=channel)
+    return await add_subscription(guild_id, "youtube", channel, suspended_at=None, suspend_reason=None)
+
 class YoutubeChannelModal(discord.ui.Modal, title="YouTube Kanal festlegen"):
     yt_input = discord.ui.TextInput(
         label="YouTube Handle oder Channel-ID",
@@ -107,8 +292,7 @@ class YoutubeChannelModal(discord.ui.Modal, title="YouTube Kanal festlegen"):
 
     async def on_submit(self, interaction: discord.Interaction):
         channel = extract_yt_channel(self.yt_input.value)
-        from bot import update_guild_cfg
-        await update_guild_cfg(interaction.guild_id, youtube_channel=channel)
+        await set_primary_channel(interaction.guild_id, channel)
         await interaction.response.send_message(f"✅ YouTube-Kanal auf **{channel}** gesetzt.", ephemeral=True)
 
 class YoutubeSettingsModal(discord.ui.Modal, title="YouTube Feineinstellungen"):
@@ -161,8 +345,9 @@ class YoutubeSetupView(discord.ui.View):
 
     @staticmethod
     async def build_setup_embed(guild: discord.Guild):
-        from bot import get_guild_cfg
+        from bot import get_guild_cfg, list_subscriptions
         cfg = await get_guild_cfg(guild.id)
+        subs = await list_subscriptions(guild.id, "youtube")
         
         embed = discord.Embed(
             title="🔴 YouTube-Live Setup",
@@ -183,6 +368,7 @@ class YoutubeSetupView(discord.ui.View):
             status_text = (
                 f"✅ **Aktiviert**\n"
                 f"• Kanal: **{cfg.get('youtube_channel', '—')}**\n"
+                f"• Kanäle gesamt: **{len(subs)}** (weitere per /setup_youtubelive)\n"
                 f"• Announce: {ch.mention if ch else '❌'}\n"
                 f"• Ping: {role.mention if role else '—'}\n"
                 f"• Stable: **{stable}** | Poll: **{poll}s** | Grace: **{grace}m**"
@@ -237,79 +423,317 @@ class YoutubeSetupView(discord.ui.View):
 class YoutubeCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.youtube_loop.start()
+        # Ein Scheduler-Eintrag pro YouTube-Kanal, egal wie viele Abos ihm folgen
+        self.scheduler = PollScheduler("youtube", self.poll_channel, retry_delay=YT_DEFAULT_POLL_SECONDS)
+        self.fanout = ChannelFanout()
+        self.confirm = ConfirmTracker()
+        self.adaptive = AdaptivePoller("youtube")
+        self.negative = NegativeCache()
+        self.warmup = WarmupStagger()
+        self.planned = StartSchedule()
+        self.handles = yt_handles
+        self._bootstrap_task: asyncio.Task | None = None
+        self._refresh_task: asyncio.Task | None = None
+
+    async def cog_load(self):
+        from bot import add_cfg_listener, add_subscription_listener
+        add_cfg_listener(self._on_cfg_change)
+        add_subscription_listener(self._on_sub_change)
+        add_push_listener("youtube", self.on_push)
+        self._bootstrap_task = asyncio.create_task(self._bootstrap())
 
     def cog_unload(self):
-        self.youtube_loop.cancel()
-
-    @tasks.loop(seconds=60)
-    async def youtube_loop(self):
-        if not self.bot.http_session:
+        from bot import remove_cfg_listener, remove_subscription_listener
+        remove_cfg_listener(self._on_cfg_change)
+        remove_subscription_listener(self._on_sub_change)
+        remove_push_listener("youtube", self.on_push)
+        if self._bootstrap_task:
+            self._bootstrap_task.cancel()
+        if self._refresh_task:
+            self._refresh_task.cancel()
+        self.scheduler.stop()
+
+    async def _bootstrap(self):
+        await self.bot.wait_until_ready()
+        from bot import load_live_history, load_channel_aliases
+        self.adaptive.load(await load_live_history("youtube"))
+        yt_handles.load(await load_channel_aliases("youtube"))
+        self.scheduler.start()
+        # Überfällige Kanäle beim ersten Einplanen über ihr Intervall verteilen
+        self.warmup.active = True
+        try:
+            await self.sync_schedule()
+        finally:
+            self.warmup.active = False
+        self._refresh_task = asyncio.create_task(self._refresh_handles())
+
+    # ---------- Scheduling ----------
+    def _schedule_channel(self, channel: str) -> None:
+        """Plant den Kanal zum frühesten fälligen Poll seiner Abos ein."""
+        from bot import peek_poller_state
+        subs = self.fanout.subscribers(channel)
+        if not subs:
+            self.scheduler.cancel(channel)
             return
+        now = time.time()
+        delay = min(
+            float(peek_poller_state(sub_id)["last_check_ts"] or 0.0) + self.fanout.interval(sub_id) - now
+            for sub_id in subs
+        )
+        delay = self.warmup.delay(channel, delay, self.fanout.channel_interval(channel))
+        # Gespeicherter Termin eines geplanten Streams (übersteht Neustarts)
+        if self.planned.get(channel) is None:
+            self.planned.set(channel, max(peek_poller_state(sub_id)["scheduled_start"] or 0.0 for sub_id in subs))
+        start = self.planned.get(channel)
+        if start:
+            delay = min(delay, start - SCHEDULE_WINDOW_BEFORE_SECONDS - now)
+        self.scheduler.schedule(channel, max(0.0, delay))
+
+    def reschedule(self, sub: dict, cfg: dict) -> None:
+        if sub_is_active(cfg, sub):
+            eff = effective_cfg(cfg, sub)
+            poll_seconds = int(eff.get("youtube_poll_seconds") or YT_DEFAULT_POLL_SECONDS)
+            channel = yt_canonical_channel(sub["channel"])
+            old = self.fanout.subscribe(sub["id"], channel, poll_seconds)
+            self._schedule_channel(channel)
+        else:
+            old = self.fanout.unsubscribe(sub["id"])
+        if old:
+            self._schedule_channel(old)
+
+    def _reschedule_handle(self, handle: str) -> None:
+        """Plant die Abos eines Handles neu ein, nachdem er (neu) aufgelöst wurde."""
+        from bot import peek_guild_cfg, peek_subscriptions
+        for sub in peek_subscriptions(provider="youtube"):
+            if yt_channel_key(sub["channel"]) == handle:
+                self.reschedule(sub, peek_guild_cfg(sub["guild_id"]))
+
+    async def _refresh_handles(self) -> None:
+        """Löst Handles nach Ablauf der TTL im Hintergrund neu auf."""
+        from bot import peek_subscriptions
+        while True:
+            await asyncio.sleep(YT_HANDLE_REFRESH_CHECK_SECONDS)
+            try:
+                in_use = {yt_channel_key(sub["channel"]) for sub in peek_subscriptions(provider="youtube")}
+                for handle in yt_handles.stale(time.time()):
+                    if handle not in in_use:
+                        continue
+                    old = yt_handles.peek(handle)
+                    if await yt_handles.resolve(handle) != old:
+                        self._reschedule_handle(handle)
+            except Exception as e:
+                logger.error(f"[youtube] Handle-Auffrischung fehlgeschlagen: {e}")
 
-        from bot import get_guild_cfg, update_guild_cfg
+    def _on_cfg_change(self, guild_id: int, cfg: dict) -> None:
+        from bot import peek_subscriptions
+        for sub in peek_subscriptions(guild_id, "youtube"):
+            self.reschedule(sub, cfg)
 
-        for guild in self.bot.guilds:
+    def _on_sub_change(self, sub: dict, removed: bool) -> None:
+        if sub["provider"] != "youtube":
+            return
+        if removed:
+            old = self.fanout.unsubscribe(sub["id"])
+            if old:
+                self._schedule_channel(old)
+            clear_runtime_state(sub["id"])
+            self.confirm.forget(sub["id"])
+            self._forget_channel(old or yt_canonical_channel(sub["channel"]))
+            return
+        from bot import peek_guild_cfg
+        self.reschedule(sub, peek_guild_cfg(sub["guild_id"]))
+
+    def _forget_channel(self, channel: str) -> None:
+        """Lernstand eines Kanals verwerfen, sobald ihm kein Abo (auch kein pausiertes) mehr folgt."""
+        from bot import peek_subscriptions
+        if not any(yt_canonical_channel(sub["channel"]) == channel for sub in peek_subscriptions(provider="youtube")):
+            self.adaptive.forget(channel)
+
+    async def sync_schedule(self) -> None:
+        """Gleicht die eingeplanten Kanäle mit allen YouTube-Abos ab."""
+        from bot import get_guild_cfg, get_poller_state, list_subscriptions
+
+        subs = await list_subscriptions(provider="youtube")
+        for sub_id in self.fanout.all_subscribers() - {sub["id"] for sub in subs}:
+            old = self.fanout.unsubscribe(sub_id)
+            if old:
+                self._schedule_channel(old)
+        for sub in subs:
+            state = await get_poller_state(sub["id"])
+            cfg = await get_guild_cfg(sub["guild_id"])
+            poll_seconds = int(effective_cfg(cfg, sub).get("youtube_poll_seconds") or YT_DEFAULT_POLL_SECONDS)
+            if restore_runtime_state(sub["id"], state, 2 * poll_seconds):
+                self.warmup.restored += 1
+            self.reschedule(sub, cfg)
+
+    # ---------- Poll ----------
+    async def poll_channel(self, channel: str) -> float | None:
+        """Holt einen Kanal einmal und verteilt das Ergebnis an alle Abos dieses Kanals."""
+        from bot import get_guild_cfg, peek_subscription, set_poller_state, record_live_start
+
+        subs = self.fanout.subscribers(channel)
+        if not subs:
+            return None
+        poll_seconds = self.fanout.channel_interval(channel)
+
+        now = time.time()
+        if channel.startswith("@") and yt_handles.should_try(channel, now):
+            # Noch nicht aufgelöster Handle: auf die UC-ID umziehen, ab dann ohne Redirect
+            if await yt_handles.resolve(channel):
+                self._reschedule_handle(channel)
+                return None
+
+        for sub_id in subs:
+            set_poller_state(sub_id, last_check_ts=now)
+
+        meta = await fetch_yt_meta(channel)
+        if meta is None:
+            return poll_seconds
+        if meta.get("not_found"):
+            return await self.channel_not_found(channel, subs, poll_seconds)
+        self.negative.clear(channel)
+        if self.adaptive.observe(channel, meta["is_live"], now):
             try:
-                cfg = await get_guild_cfg(guild.id)
-                if not cfg.get("youtube_enabled"):
-                    continue
-                if not cfg.get("youtube_channel") or not cfg.get("youtube_announce_channel_id"):
-                    continue
-
-                now = time.time()
-                poll_seconds = int(cfg.get("youtube_poll_seconds", YT_DEFAULT_POLL_SECONDS))
-                last_check = float(cfg.get("youtube_last_check_ts", 0.0))
-                
-                if (now - last_check) < poll_seconds:
-                    continue
-
-                await update_guild_cfg(guild.id, youtube_last_check_ts=now)
-
-                yt_channel = cfg["youtube_channel"]
-                html_text = await fetch_yt_page(self.bot.http_session, yt_channel)
-                if not html_text:
-                    continue
-
-                meta = parse_yt_meta(html_text)
-                live_now = meta["is_live"]
-                prev_live = yt_live_state.get(guild.id, False)
-
-                stable_checks = int(cfg.get("youtube_stable_checks", 2))
-                offline_grace = int(cfg.get("youtube_offline_grace_seconds", YT_OFFLINE_GRACE_SECONDS_DEFAULT))
-
-                if live_now:
-                    yt_live_hits[guild.id] = yt_live_hits.get(guild.id, 0) + 1
-                    yt_off_hits[guild.id] = 0
-                    await update_guild_cfg(guild.id, youtube_last_seen_live_ts=now)
-                else:
-                    yt_off_hits[guild.id] = yt_off_hits.get(guild.id, 0) + 1
-                    yt_live_hits[guild.id] = 0
-
-                announced = bool(cfg.get("youtube_announced_this_stream", False))
-                last_seen = float(cfg.get("youtube_last_seen_live_ts", 0.0))
-
-                # Live gehen
-                if (not announced) and (not prev_live) and live_now and yt_live_hits[guild.id] >= stable_checks:
-                    yt_live_state[guild.id] = True
-                    await self.post_live(guild, cfg, meta)
-                    await update_guild_cfg(guild.id, youtube_announced_this_stream=1)
-                    continue
-
-                if announced and live_now:
-                    yt_live_state[guild.id] = True
-
-                # Offline gehen
-                if announced and prev_live and (not live_now) and yt_off_hits[guild.id] >= stable_checks:
-                    if (now - last_seen) >= offline_grace:
-                        yt_live_state[guild.id] = False
-                        await self.edit_to_offline(guild, cfg, meta)
-                        await update_guild_cfg(guild.id, youtube_announced_this_stream=0)
-
+                await record_live_start("youtube", channel, now)
+            except Exception as e:
+                logger.error(f"[youtube:{channel}] Live-Historie konnte nicht gespeichert werden: {e}")
+        self._track_planned(channel, subs, meta, now)
+
+        confirming = False
+        for sub_id in subs:
+            sub = peek_subscription(sub_id)
+            if not sub:
+                continue
+            guild = self.bot.get_guild(sub["guild_id"])
+            cfg = await get_guild_cfg(sub["guild_id"])
+            if not guild or not sub_is_active(cfg, sub):
+                continue
+            try:
+                confirming |= await self.apply_meta(guild, sub_id, effective_cfg(cfg, sub), meta, now)
             except Exception as e:
-                logger.error(f"Error in youtube_loop for guild {guild.id}: {e}")
+                logger.error(f"[{guild.name}] YouTube update error ({channel}): {e}")
+
+        if confirming and LIVE_CONFIRM_SECONDS > 0:
+            # Zustand gekippt -> schnell nachprüfen statt ein volles Intervall zu warten
+            self.confirm.probes += 1
+            return self.confirm.delay(poll_seconds)
+        live = meta["is_live"] or any(yt_live_state.get(sub_id) for sub_id in subs)
+        if not live:
+            # Angekündigter Stream: bis kurz vorher selten, um den Start herum sehr oft
+            planned = self.planned.next_interval(channel, poll_seconds, now)
+            if planned is not None:
+                return planned
+        interval = self.adaptive.next_interval(channel, poll_seconds, now, live)
+        if not live and push_covered("youtube", channel):
+            # Feed-Push stößt einen sofortigen Poll an, regulär nur noch als Fallback
+            interval = max(interval, WEBHOOK_FALLBACK_POLL_SECONDS)
+        return interval
+
+    def _track_planned(self, channel: str, subs: set[int], meta: dict, now: float) -> None:
+        """Merkt sich die angekündigte Startzeit (pro Abo im Poller-State)."""
+        from bot import peek_poller_state, set_poller_state
+        start = None
+        if meta["is_live"]:
+            self.planned.went_live(channel, now)
+        elif meta.get("is_upcoming") and (meta.get("scheduled_start") or 0) + SCHEDULE_WINDOW_AFTER_SECONDS > now:
+            # Längst verstrichene Termine (Stream nie gestartet) nicht erneut einplanen
+            start = meta["scheduled_start"]
+            self.planned.set(channel, start)
+        else:
+            self.planned.set(channel, None)
+        for sub_id in subs:
+            if peek_poller_state(sub_id)["scheduled_start"] != start:
+                set_poller_state(sub_id, scheduled_start=start)
+
+    async def channel_not_found(self, channel: str, subs: set[int], poll_seconds: float) -> float | None:
+        """Kanal existiert (nicht mehr): Abstand verdoppeln, nach NOT_FOUND_SUSPEND_AFTER Treffern pausieren."""
+        misses = self.negative.miss(channel)
+        if misses < NOT_FOUND_SUSPEND_AFTER:
+            logger.info(f"[youtube:{channel}] Kanal nicht gefunden ({misses}/{NOT_FOUND_SUSPEND_AFTER})")
+            return self.negative.backoff(channel, poll_seconds)
+
+        from bot import get_guild_cfg, peek_subscription, update_subscription
+        logger.warning(f"[youtube:{channel}] {misses}x nicht gefunden - Abos werden pausiert")
+        self.negative.clear(channel)
+        for sub_id in subs:
+            sub = peek_subscription(sub_id)
+            if not sub:
+                continue
+            await update_subscription(sub_id, suspended_at=time.time(), suspend_reason="not_found")
+            self.negative.suspended += 1
+            guild = self.bot.get_guild(sub["guild_id"])
+            if guild:
+                cfg = await get_guild_cfg(sub["guild_id"])
+                await self.post_suspended(guild, effective_cfg(cfg, sub), misses)
+        return None
+
+    async def on_push(self, channel_id: str, is_live: bool | None) -> bool:
+        """WebSub-Push (neuer/geänderter Feed-Eintrag): Kanal sofort abfragen.
+
+        Der Feed sagt nicht, ob der Kanal live ist; das klärt der Poll samt Bestätigung.
+        """
+        channel = yt_channel_key(channel_id)
+        if not self.fanout.subscribers(channel):
+            return False
+        self.scheduler.schedule(channel, 0)
+        return True
+
+    async def apply_meta(self, guild: discord.Guild, sub_id: int, cfg: dict, meta: dict, now: float) -> bool:
+        """Live/Offline-Zustandsmaschine eines Abos für ein Poll-Ergebnis.
+
+        Gibt True zurück, solange ein Zustandswechsel noch auf seine Stable-Checks wartet.
+        """
+        from bot import get_poller_state, set_poller_state
+
+        state = await get_poller_state(sub_id)
+        live_now = meta["is_live"]
+        prev_live = yt_live_state.get(sub_id, False)
 
-    async def post_live(self, guild: discord.Guild, cfg: dict, meta: dict):
+        stable_checks = int(cfg.get("youtube_stable_checks", 2))
+        offline_grace = int(cfg.get("youtube_offline_grace_seconds", YT_OFFLINE_GRACE_SECONDS_DEFAULT))
+
+        if live_now:
+            yt_live_hits[sub_id] = yt_live_hits.get(sub_id, 0) + 1
+            yt_off_hits[sub_id] = 0
+            set_poller_state(sub_id, last_seen_live_ts=now)
+        else:
+            yt_off_hits[sub_id] = yt_off_hits.get(sub_id, 0) + 1
+            yt_live_hits[sub_id] = 0
+        # Zähler mitschreiben, damit ein Neustart angefangene Bestätigungen nicht verliert
+        set_poller_state(sub_id, live_hits=yt_live_hits[sub_id], off_hits=yt_off_hits[sub_id])
+
+        announced = bool(state["announced_this_stream"])
+        last_seen = float(state["last_seen_live_ts"] or 0.0)
+
+        # Bestätigung: Ergebnis weicht vom gemeldeten Zustand ab, Schwelle noch nicht erreicht
+        going_live = (not announced) and (not prev_live) and live_now
+        going_off = announced and prev_live and (not live_now)
+        hits = yt_live_hits[sub_id] if live_now else yt_off_hits[sub_id]
+        pending = (going_live or going_off) and hits < stable_checks
+        poll_seconds = int(cfg.get("youtube_poll_seconds") or YT_DEFAULT_POLL_SECONDS)
+        self.confirm.track(sub_id, pending, going_live or going_off, now, (stable_checks - 1) * poll_seconds)
+
+        # Live gehen
+        if going_live and yt_live_hits[sub_id] >= stable_checks:
+            yt_live_state[sub_id] = True
+            await self.post_live(guild, sub_id, cfg, meta)
+            set_poller_state(sub_id, announced_this_stream=1, live_state=1, live_changed_ts=now)
+            return False
+
+        if announced and live_now and not prev_live:
+            yt_live_state[sub_id] = True
+            set_poller_state(sub_id, live_state=1)
+
+        # Offline gehen
+        if going_off and yt_off_hits[sub_id] >= stable_checks:
+            if (now - last_seen) >= offline_grace:
+                yt_live_state[sub_id] = False
+                await self.edit_to_offline(guild, sub_id, cfg, meta)
+                set_poller_state(sub_id, announced_this_stream=0, live_state=0, live_changed_ts=now)
+
+        return pending
+
+    async def post_live(self, guild: discord.Guild, sub_id: int, cfg: dict, meta: dict):
         channel = guild.get_channel(int(cfg["youtube_announce_channel_id"]))
         if not isinstance(channel, discord.TextChannel):
             return
@@ -322,12 +746,26 @@ class YoutubeCog(commands.Cog):
         embed = build_yt_live_embed(cfg["youtube_channel"], meta)
         msg = await channel.send(content=mention, embed=embed)
         
-        from bot import update_guild_cfg
-        await update_guild_cfg(guild.id, youtube_last_live_message_id=msg.id)
+        from bot import set_poller_state
+        set_poller_state(sub_id, last_live_message_id=msg.id)
 
-    async def edit_to_offline(self, guild: discord.Guild, cfg: dict, meta: dict):
+    async def post_suspended(self, guild: discord.Guild, cfg: dict, misses: int):
+        channel = guild.get_channel(int(cfg.get("youtube_announce_channel_id") or 0))
+        if not isinstance(channel, discord.TextChannel):
+            return
+        try:
+            await channel.send(
+                f"⛔ YouTube-Kanal **{cfg['youtube_channel']}** wurde {misses}× in Folge nicht gefunden – "
+                f"Live-Alerts dafür sind pausiert.\n"
+                f"Handle/ID prüfen und mit `/setup_youtubelive` neu einrichten oder mit `/youtubelive_remove` entfernen."
+            )
+        except Exception as e:
+            logger.warning(f"[{guild.name}] Pausen-Hinweis fehlgeschlagen: {e}")
+
+    async def edit_to_offline(self, guild: discord.Guild, sub_id: int, cfg: dict, meta: dict):
+        from bot import get_poller_state
         channel = guild.get_channel(int(cfg["youtube_announce_channel_id"]))
-        last_id = cfg.get("youtube_last_live_message_id")
+        last_id = (await get_poller_state(sub_id))["last_live_message_id"]
         if not channel or not last_id: return
 
         try:
@@ -336,7 +774,7 @@ class YoutubeCog(commands.Cog):
         except:
             pass
 
-    @app_commands.command(name="setup_youtubelive", description="YouTube Live Alerts (Scraping-basiert).")
+    @app_commands.command(name="setup_youtubelive", description="YouTube Live Alerts (Scraping-basiert). Mehrfach ausführen = mehrere Kanäle.")
     @app_commands.checks.has_permissions(manage_guild=True)
     @app_commands.describe(
         handle_or_id="z.B. @tagesschau oder UC...",
@@ -357,49 +795,121 @@ class YoutubeCog(commands.Cog):
         offline_grace_minutes: app_commands.Range[int, 0, 120] = 10
     ):
         channel = extract_yt_channel(handle_or_id)
-        from bot import update_guild_cfg
-        await update_guild_cfg(
-            interaction.guild_id,
-            youtube_enabled=1,
-            youtube_channel=channel,
-            youtube_announce_channel_id=announce_channel.id,
-            youtube_ping_role_id=ping_role.id if ping_role else None,
-            youtube_stable_checks=max(1, int(stable_checks)),
-            youtube_poll_seconds=max(60, int(poll_seconds)),
-            youtube_offline_grace_seconds=max(0, int(offline_grace_minutes) * 60),
-            youtube_announced_this_stream=0,
-            youtube_last_check_ts=0.0,
-            youtube_last_seen_live_ts=0.0
+        from bot import (
+            get_guild_cfg, update_guild_cfg, reset_poller_state,
+            list_subscriptions, find_subscription, add_subscription, MAX_SUBSCRIPTIONS_PER_GUILD
         )
+        gid = int(interaction.guild_id)
+        cfg = await get_guild_cfg(gid)
+
+        existing = await find_subscription(gid, "youtube", channel)
+        subs = await list_subscriptions(gid, "youtube")
+        if not existing:
+            # Gleicher Kanal in anderer Schreibweise (@handle vs. UC-ID) -> bestehendes Abo aktualisieren
+            canonical = await yt_handles.canonical(channel, timeout=YT_RESOLVE_SETUP_TIMEOUT)
+            existing = next((s for s in subs if yt_canonical_channel(s["channel"]) == canonical), None)
+            if existing:
+                channel = existing["channel"]
+        if not existing and len(subs) >= MAX_SUBSCRIPTIONS_PER_GUILD:
+            await interaction.response.send_message(
+                f"❌ Maximal **{MAX_SUBSCRIPTIONS_PER_GUILD}** YouTube-Kanäle pro Server. Entferne erst einen mit /youtubelive_remove.",
+                ephemeral=True
+            )
+            return
+
+        settings = {
+            "announce_channel_id": announce_channel.id,
+            "ping_role_id": ping_role.id if ping_role else None,
+            "stable_checks": max(1, int(stable_checks)),
+            "poll_seconds": max(60, int(poll_seconds)),
+            "offline_grace_seconds": max(0, int(offline_grace_minutes) * 60),
+        }
+        is_primary = not cfg.get("youtube_channel") or cfg.get("youtube_channel") == channel
+        if is_primary:
+            # Haupt-Kanal: Werte sind die Guild-Standards (wie bisher, auch im Setup-Panel änderbar)
+            await update_guild_cfg(gid, youtube_enabled=1, youtube_channel=channel, **{f"youtube_{k}": v for k, v in settings.items()})
+            sub = await add_subscription(gid, "youtube", channel, enabled=1, suspended_at=None, suspend_reason=None,
+                                         **{k: None for k in settings})
+        else:
+            await update_guild_cfg(gid, youtube_enabled=1)
+            sub = await add_subscription(gid, "youtube", channel, enabled=1, suspended_at=None, suspend_reason=None, **settings)
+
+        await reset_poller_state(sub["id"])
+        clear_runtime_state(sub["id"])
+        self.reschedule(sub, await get_guild_cfg(gid))
         await interaction.response.send_message(
-            f"✅ YouTube Live-Alerts aktiviert.\n"
-            f"📺 YouTube: **{channel}**\n"
+            f"✅ YouTube Live-Alerts {'aktualisiert' if existing else 'aktiviert'}.\n"
+            f"📺 YouTube: **{channel}**{' (Haupt-Kanal)' if is_primary else ''}\n"
             f"📢 Kanal: {announce_channel.mention}\n"
-            f"🔇 Stabil: **{stable_checks}** | ⏲️ Poll: **{poll_seconds}s** | 🧊 Offline-Grace: **{offline_grace_minutes} min**",
+            f"🔇 Stabil: **{stable_checks}** | ⏲️ Poll: **{poll_seconds}s** | 🧊 Offline-Grace: **{offline_grace_minutes} min**\n"
+            f"➕ Weitere Kanäle: Befehl einfach mit einem anderen Kanal erneut ausführen.",
             ephemeral=True
         )
 
+    @app_commands.command(name="youtubelive_remove", description="Entfernt einen einzelnen YouTube-Kanal.")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @app_commands.describe(handle_or_id="z.B. @tagesschau oder UC...")
+    async def youtubelive_remove(self, interaction: discord.Interaction, handle_or_id: str):
+        from bot import get_guild_cfg, clear_guild_cfg_fields, find_subscription, remove_subscription, peek_subscriptions
+        gid = int(interaction.guild_id)
+        channel = extract_yt_channel(handle_or_id)
+        sub = await find_subscription(gid, "youtube", channel)
+        if not sub:
+            canonical = yt_canonical_channel(channel)
+            sub = next((s for s in peek_subscriptions(gid, "youtube") if yt_canonical_channel(s["channel"]) == canonical), None)
+            if sub:
+                channel = sub["channel"]
+        if not sub:
+            await interaction.response.send_message(f"ℹ️ **{channel}** wird hier nicht verfolgt.", ephemeral=True)
+            return
+
+        await remove_subscription(sub["id"])
+        if (await get_guild_cfg(gid)).get("youtube_channel") == channel:
+            await clear_guild_cfg_fields(gid, ["youtube_channel"])
+        await interaction.response.send_message(f"🗑️ **{channel}** entfernt.", ephemeral=True)
+
     @app_commands.command(name="youtubelive_status", description="Zeigt den YouTube-Live Status.")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def youtubelive_status(self, interaction: discord.Interaction):
-        from bot import get_guild_cfg
+        from bot import get_guild_cfg, list_subscriptions, peek_poller_state
         cfg = await get_guild_cfg(interaction.guild_id)
-        if not cfg or not cfg.get("youtube_enabled"):
+        subs = await list_subscriptions(interaction.guild_id, "youtube")
+        if not cfg or not cfg.get("youtube_enabled") or not subs:
             await interaction.response.send_message("ℹ️ YouTube-Alerts sind deaktiviert.", ephemeral=True)
             return
-        
-        announce_ch = interaction.guild.get_channel(int(cfg.get("youtube_announce_channel_id", 0)))
-        role = interaction.guild.get_role(int(cfg["youtube_ping_role_id"])) if cfg.get("youtube_ping_role_id") else None
 
-        await interaction.response.send_message(
-            f"✅ YouTube Status:\n"
-            f"📺 Kanal: **{cfg.get('youtube_channel')}**\n"
-            f"📢 Kanal: {announce_ch.mention if announce_ch else 'FEHLT'}\n"
-            f"🏷️ Ping: **{role.name if role else '—'}**\n"
-            f"🔇 Stable: **{cfg.get('youtube_stable_checks', 2)}** | ⏲️ Poll: **{cfg.get('youtube_poll_seconds', 300)}s** | 🧊 Offline-Grace: **{int(cfg.get('youtube_offline_grace_seconds', 600))//60} min**\n"
-            f"🔴 Live (intern): **{'LIVE' if yt_live_state.get(interaction.guild_id) else 'OFFLINE'}**",
-            ephemeral=True
+        role = interaction.guild.get_role(int(cfg["youtube_ping_role_id"])) if cfg.get("youtube_ping_role_id") else None
+        header = (
+            f"✅ YouTube Status ({len(subs)} Kanäle):\n"
+            f"🏷️ Standard-Ping: **{role.name if role else '—'}**\n"
+            f"🔇 Standard: Stable **{cfg.get('youtube_stable_checks', 2)}** | Poll **{cfg.get('youtube_poll_seconds', 300)}s** | Offline-Grace **{int(cfg.get('youtube_offline_grace_seconds', 600))//60} min**\n"
         )
+        # Zeilen nach Länge begrenzen, nicht nur nach Anzahl (sonst HTTP 400 über 2000 Zeichen)
+        budget = STATUS_MAX_CHARS - discord_len(header) - STATUS_MORE_RESERVE
+        lines = []
+        for sub in subs[:STATUS_MAX_LINES]:
+            eff = effective_cfg(cfg, sub)
+            announce_ch = interaction.guild.get_channel(int(eff.get("youtube_announce_channel_id") or 0))
+            live = "🔴 LIVE" if yt_live_state.get(sub["id"]) else "⚫ OFFLINE"
+            changed = peek_poller_state(sub["id"])["live_changed_ts"]
+            if changed:
+                live += f" seit <t:{int(changed)}:R>"
+            if sub.get("suspended_at"):
+                live = "⛔ PAUSIERT (Kanal nicht gefunden)"
+            elif not yt_live_state.get(sub["id"]) and self.planned.get(yt_canonical_channel(sub["channel"])):
+                live += f" | 🗓️ geplant <t:{int(self.planned.get(yt_canonical_channel(sub['channel'])))}:R>"
+            line = (
+                f"📺 **{sub['channel']}** → {announce_ch.mention if announce_ch else 'FEHLT'} | "
+                f"⏲️ {eff.get('youtube_poll_seconds', 300)}s | {live}"
+            )
+            budget -= discord_len(line) + 1
+            if budget < 0:
+                break
+            lines.append(line)
+        if len(subs) > len(lines):
+            lines.append(f"… und **{len(subs) - len(lines)}** weitere")
+
+        await interaction.response.send_message(header + "\n".join(lines), ephemeral=True)
 
     @app_commands.command(name="youtubelive_disable", description="Deaktiviert YouTube-Alerts.")
     @app_commands.checks.has_permissions(manage_guild=True)
@@ -413,7 +923,8 @@ class YoutubeCog(commands.Cog):
     async def youtubelive_test(self, interaction: discord.Interaction):
         from bot import get_guild_cfg
         cfg = await get_guild_cfg(interaction.guild_id)
-        if not cfg.get("youtube_enabled"):
+        sub = await primary_subscription(interaction.guild_id, cfg)
+        if not cfg.get("youtube_enabled") or not sub:
             await interaction.response.send_message("ℹ️ Erst /setup_youtubelive ausführen.", ephemeral=True)
             return
 
@@ -421,7 +932,7 @@ class YoutubeCog(commands.Cog):
             "title": "Test-Stream (nur Bot-Test)",
             "avatar": None
         }
-        await self.post_live(interaction.guild, cfg, meta)
+        await self.post_live(interaction.guild, sub["id"], effective_cfg(cfg, sub), meta)
         await interaction.response.send_message("🧪 YouTube-Test gesendet.", ephemeral=True)
 
     @app_commands.command(name="youtubeoffline_test", description="Testet YouTube OFFLINE-Edit.")
@@ -429,12 +940,13 @@ class YoutubeCog(commands.Cog):
     async def youtubeoffline_test(self, interaction: discord.Interaction):
         from bot import get_guild_cfg
         cfg = await get_guild_cfg(interaction.guild_id)
-        if not cfg.get("youtube_enabled"):
+        sub = await primary_subscription(interaction.guild_id, cfg)
+        if not cfg.get("youtube_enabled") or not sub:
             await interaction.response.send_message("ℹ️ Erst /setup_youtubelive ausführen.", ephemeral=True)
             return
 
         meta = {"avatar": None}
-        await self.edit_to_offline(interaction.guild, cfg, meta)
+        await self.edit_to_offline(interaction.guild, sub["id"], effective_cfg(cfg, sub), meta)
         await interaction.response.send_message("🧪 YouTube OFFLINE-Edit versucht.", ephemeral=True)
 
 async def setup(bot: commands.Bot):
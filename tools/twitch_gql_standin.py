@@ -0,0 +1,65 @@
+"""Lokaler Ersatz für Twitchs GQL-Endpoint (Sammelabfrage des Live-Status), z.B. für CI.
+
+Aufruf aus dem Projekt-Root:
+    python tools/twitch_gql_standin.py --live shordje,foo --missing gibtsnicht
+und im Bot:
+    TWITCH_STATUS_PROVIDER=gql TWITCH_GQL_URL=http://127.0.0.1:8790/gql
+
+Alle anderen Logins gelten als existierend und offline. Mit --fail-every N
+antwortet jeder N-te Request mit 503 (HTML-Fallback testen).
+"""
+import sys
+import json
+import argparse
+
+from aiohttp import web
+
+def user_payload(login: str, live: set[str]) -> dict:
+    return {
+        "login": login,
+        "profileImageURL": f"https://static-cdn.example.invalid/{login}-profile_image-300x300.png",
+        "broadcastSettings": {"title": f"{login} testet den Bot"},
+        "stream": {"type": "live", "game": {"name": "Just Chatting"}} if login in live else None,
+    }
+
+def split_logins(value: str) -> set[str]:
+    return {v.strip().lower() for v in value.split(",") if v.strip()}
+
+def build_app(live: set[str], missing: set[str], fail_every: int) -> web.Application:
+    counter = {"requests": 0}
+
+    async def handle_gql(request: web.Request) -> web.Response:
+        counter["requests"] += 1
+        if not request.headers.get("Client-Id"):
+            return web.json_response({"error": "Bad Request", "message": "Client-Id header required"}, status=400)
+        if fail_every and counter["requests"] % fail_every == 0:
+            return web.Response(status=503)
+
+        body = json.loads(await request.read())
+        operations = body if isinstance(body, list) else [body]
+        answers = []
+        for op in operations:
+            logins = [login.lower() for login in ((op.get("variables") or {}).get("logins") or [])]
+            users = [None if login in missing else user_payload(login, live) for login in logins]
+            answers.append({"data": {"users": users}, "extensions": {"operationName": op.get("operationName")}})
+        print(f"#{counter['requests']}: {sum(len(a['data']['users']) for a in answers)} Logins abgefragt")
+        return web.json_response(answers if isinstance(body, list) else answers[0])
+
+    app = web.Application()
+    app.router.add_post("/gql", handle_gql)
+    return app
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--live", default="", help="Kommagetrennte Logins, die live sind")
+    parser.add_argument("--missing", default="", help="Kommagetrennte Logins, die es nicht gibt")
+    parser.add_argument("--fail-every", type=int, default=0)
+    args = parser.parse_args()
+
+    web.run_app(build_app(split_logins(args.live), split_logins(args.missing), args.fail_every), host=args.host, port=args.port)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Lokaler Ersatz für Twitch EventSub / YouTube WebSub: schickt Beispiel-Events an den Webhook-Server des Bots.
+
+Aufruf aus dem Projekt-Root (Secrets und Port kommen aus der .env):
+    python tools/webhook_hub.py twitch-verify
+    python tools/webhook_hub.py twitch-online shordje
+    python tools/webhook_hub.py twitch-offline shordje
+    python tools/webhook_hub.py youtube-verify UCxxxxxxxxxxxxxxxxxxxxxx
+    python tools/webhook_hub.py youtube-feed UCxxxxxxxxxxxxxxxxxxxxxx [--video-id abc123]
+
+Mit --bad-signature wird absichtlich falsch signiert (muss abgelehnt werden).
+"""
+import os
+import sys
+import json
+import uuid
+import asyncio
+import argparse
+from datetime import datetime, timezone
+
+import aiohttp
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+from modules.webhooks import eventsub_signature, websub_signature  # noqa: E402
+
+# ============================================================
+# BEISPIEL-PAYLOADS
+# ============================================================
+def eventsub_payload(message_type: str, login: str) -> dict:
+    sub_type = "stream.online" if message_type == "online" else "stream.offline"
+    subscription = {
+        "id": str(uuid.uuid4()),
+        "status": "enabled" if message_type != "verify" else "webhook_callback_verification_pending",
+        "type": sub_type,
+        "version": "1",
+        "condition": {"broadcaster_user_id": "12345"},
+        "transport": {"method": "webhook", "callback": "https://example.invalid/webhooks/twitch"},
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if message_type == "verify":
+        return {"challenge": uuid.uuid4().hex, "subscription": subscription}
+    event = {"broadcaster_user_id": "12345", "broadcaster_user_login": login, "broadcaster_user_name": login}
+    if message_type == "online":
+        event.update({"id": "9001", "type": "live", "started_at": datetime.now(timezone.utc).isoformat()})
+    return {"subscription": subscription, "event": event}
+
+def atom_feed(channel_id: str, video_id: str) -> str:
+    now = datetime.now(timezone.utc).isoformat()
+    return f"""<?xml version='1.0' encoding='UTF-8'?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <link rel="hub" href="https://pubsubhubbub.appspot.com"/>
+  <link rel="self" href="https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"/>
+  <title>YouTube video feed</title>
+  <updated>{now}</updated>
+  <entry>
+    <id>yt:video:{video_id}</id>
+    <yt:videoId>{video_id}</yt:videoId>
+    <yt:channelId>{channel_id}</yt:channelId>
+    <title>Test-Stream</title>
+    <link rel="alternate" href="https://www.youtube.com/watch?v={video_id}"/>
+    <author><name>Test</name><uri>https://www.youtube.com/channel/{channel_id}</uri></author>
+    <published>{now}</published>
+    <updated>{now}</updated>
+  </entry>
+</feed>
+"""
+
+# ============================================================
+# SENDEN
+# ============================================================
+async def send_twitch(session: aiohttp.ClientSession, base: str, kind: str, login: str, bad: bool) -> None:
+    payload = eventsub_payload(kind, login)
+    body = json.dumps(payload).encode()
+    message_id = str(uuid.uuid4())
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f000Z")
+    secret = os.getenv("TWITCH_EVENTSUB_SECRET", "")
+    signature = eventsub_signature(secret + ("x" if bad else ""), message_id, timestamp, body)
+    headers = {
+        "Content-Type": "application/json",
+        "Twitch-Eventsub-Message-Id": message_id,
+        "Twitch-Eventsub-Message-Timestamp": timestamp,
+        "Twitch-Eventsub-Message-Signature": signature,
+        "Twitch-Eventsub-Message-Type": "webhook_callback_verification" if kind == "verify" else "notification",
+        "Twitch-Eventsub-Subscription-Type": payload["subscription"]["type"],
+    }
+    async with session.post(f"{base}/webhooks/twitch", data=body, headers=headers) as resp:
+        text = await resp.text()
+        print(f"POST /webhooks/twitch ({kind}) -> {resp.status} {text!r}")
+        if kind == "verify" and resp.status == 200 and text != payload["challenge"]:
+            print("  Challenge stimmt nicht!")
+
+async def send_youtube_verify(session: aiohttp.ClientSession, base: str, channel_id: str) -> None:
+    challenge = uuid.uuid4().hex
+    params = {
+        "hub.mode": "subscribe",
+        "hub.topic": f"https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}",
+        "hub.challenge": challenge,
+        "hub.lease_seconds": "432000",
+    }
+    async with session.get(f"{base}/webhooks/youtube", params=params) as resp:
+        text = await resp.text()
+        print(f"GET /webhooks/youtube (subscribe) -> {resp.status} {'Challenge OK' if text == challenge else repr(text)}")
+
+async def send_youtube_feed(session: aiohttp.ClientSession, base: str, channel_id: str, video_id: str, bad: bool) -> None:
+    body = atom_feed(channel_id, video_id).encode()
+    secret = os.getenv("WEBSUB_SECRET", "")
+    headers = {
+        "Content-Type": "application/atom+xml",
+        "X-Hub-Signature": websub_signature(secret + ("x" if bad else ""), body),
+    }
+    async with session.post(f"{base}/webhooks/youtube", data=body, headers=headers) as resp:
+        print(f"POST /webhooks/youtube (feed) -> {resp.status}")
+
+async def run(args: argparse.Namespace) -> None:
+    base = args.url.rstrip("/")
+    async with aiohttp.ClientSession() as session:
+        if args.command.startswith("twitch-"):
+            await send_twitch(session, base, args.command.split("-", 1)[1], (args.channel or "").lower(), args.bad_signature)
+        elif args.command == "youtube-verify":
+            await send_youtube_verify(session, base, args.channel)
+        else:
+            await send_youtube_feed(session, base, args.channel, args.video_id, args.bad_signature)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["twitch-verify", "twitch-online", "twitch-offline", "youtube-verify", "youtube-feed"])
+    parser.add_argument("channel", nargs="?", help="Twitch-Login bzw. YouTube-Kanal-ID (UC...)")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{os.getenv('WEBHOOK_PORT') or 8080}")
+    parser.add_argument("--video-id", default="dQw4w9WgXcQ")
+    parser.add_argument("--bad-signature", action="store_true")
+    args = parser.parse_args()
+    if args.command != "twitch-verify" and not args.channel:
+        parser.error("Kanal fehlt")
+    asyncio.run(run(args))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())